@@ -0,0 +1,132 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+
+import timeit
+
+import numpy as np
+
+from ep import jit
+from ep.base import clear_eigensystem_cache
+from ep.dissipation import Gamma_Gauss
+from ep.helpers import c_eig
+from ep.optomech import OptoMech
+from ep.waveguide import Dirichlet, DirichletPositionDependentLossReduced
+
+
+MODELS = {
+    'Dirichlet': (Dirichlet, {'N': 2.5,
+                              'L': 100,
+                              'eta': 0.3,
+                              'x_R0': 0.1,
+                              'y_R0': 0.85,
+                              'loop_type': 'Bell'}),
+    'DirichletPositionDependentLossReduced': (
+        DirichletPositionDependentLossReduced, {'N': 2.05,
+                                                'L': 25,
+                                                'eta': 1.0,
+                                                'eta0': 1.0,
+                                                'x_R0': 0.1,
+                                                'y_R0': 0.85,
+                                                'loop_type': 'Bell',
+                                                'init_state_method': 'energy',
+                                                'switch_losses_on_off': True,
+                                                'sigma': 1e-3}),
+    'OptoMech': (OptoMech, {'T': 20,
+                            'R': 0.05,
+                            'gamma': 2.0,
+                            'x_R0': 0.1,
+                            'y_R0': 0.1})
+}
+
+
+def best_of(f, repeat=3):
+    """Return the best wall time of repeat calls of f (after a first call
+    which triggers the compilation)."""
+    f()
+    return min(timeit.repeat(f, number=1, repeat=repeat))
+
+
+def best_of_numpy(f, repeat=3):
+    """Return the best wall time of f with the JIT kernels disabled."""
+    has_jit = jit.HAS_JIT
+    jit.HAS_JIT = False
+    try:
+        return best_of(f, repeat)
+    finally:
+        jit.HAS_JIT = has_jit
+
+
+def benchmark_model(name, repeat=3):
+    """Compare the integrator backends dopri5 (default), rk4 and jit and the
+    eigensolvers for a single model."""
+
+    model, kwargs = MODELS[name]
+    print name
+    print "-"*len(name)
+
+    M = model(**kwargs)
+    reference = M.solve().Psi[-1]
+
+    def solve():
+        # time the eigensystem as well instead of cache hits
+        clear_eigensystem_cache()
+        return M.solve()
+
+    for integrator in ('default', 'rk4', 'jit'):
+        M = model(integrator=integrator, **kwargs)
+        t = best_of(solve, repeat)
+        Psi = M.solve().Psi[-1]
+        err = np.abs(Psi - reference).max()/np.abs(reference).max()
+        print "{0:>10}: {1:10.4f} s  (rel. deviation {2:.1e})".format(
+            integrator, t, err)
+
+    H = M.H_stack(M.t)
+    t_loop = best_of(lambda: [c_eig(Hn, left=True) for Hn in H], repeat)
+    t_numpy = best_of_numpy(lambda: c_eig(H, left=True), repeat)
+    t_jit = best_of(lambda: c_eig(H, left=True), repeat)
+    print ("{0:>10}: {1:10.4f} s  (stack: {2:.4f} s, "
+           "jit: {3:.4f} s)").format("c_eig", t_loop, t_numpy, t_jit)
+    print
+
+
+def benchmark_gamma_gauss(N=1000, repeat=3):
+    """Time the Gaussian loss matrix elements."""
+
+    M = Dirichlet(N=2.05, L=25)
+    G = Gamma_Gauss(k=M.k, kF=M.kF, kr=M.kr, W=M.W)
+    x0, y0 = np.random.rand(2, N)
+
+    def f():
+        return [[G.get_matrix_element(n, m, x, y) for n in (1, 2)
+                 for m in (1, 2)] for x, y in zip(x0, y0)]
+
+    def f_stack():
+        return G.get_matrix(x0, y0)
+
+    t_numpy = best_of_numpy(f, repeat)
+    t_jit = best_of(f, repeat)
+    t_stack = best_of_numpy(f_stack, repeat)
+    print ("Gamma_Gauss matrix elements: {0:.2e} s per matrix "
+           "(jit: {1:.2e} s, get_matrix stack: {2:.2e} s)").format(t_numpy/N, t_jit/N,
+                                                        t_stack/N)
+    print
+
+
+def main(repeat=3):
+    """Benchmark the JIT-compiled kernels against the NumPy
+    implementations."""
+
+    print "numba available:", jit.HAS_JIT
+    print
+
+    for name in ('Dirichlet', 'DirichletPositionDependentLossReduced',
+                 'OptoMech'):
+        benchmark_model(name, repeat=repeat)
+
+    benchmark_gamma_gauss(repeat=repeat)
+
+
+if __name__ == '__main__':
+    import argh
+    argh.dispatch_command(main)
@@ -10,6 +10,8 @@ from scipy.interpolate import splprep, splev
 
 import argh
 
+from ep.branch_cuts import trace_branch_cuts
+from ep.locate import locate_EP
 from ep.waveguide import DirichletReduced
 from ep.waveguide import DirichletPositionDependentLossReduced
 from ep.plot import get_colors, get_defaults
@@ -47,6 +49,12 @@ def plot_spectrum(fig=None, ax1=None, ax2=None, pos_dep=False,
     z_diff = z[..., 0] - z[..., 1]
     Z0 = np.sqrt(z_diff.real**2 + (z_diff.imag)**2)
 
+    # refine the minimum of the eigenvalue splitting by Newton's method
+    idx = np.argmin(Z0)
+    x_EP, y_EP = locate_EP(D, *[u.ravel()[idx] for u in (x, y)])
+    print "x_EP", x_EP
+    print "y_EP", y_EP
+
     if pos_dep:
         vmax_real = 2.0
         vmax_imag = 8.0
@@ -91,11 +99,6 @@ def plot_spectrum(fig=None, ax1=None, ax2=None, pos_dep=False,
         cb.ax.tick_params(labelsize=10)
         cb.solids.set_edgecolor('face')
 
-    idx = np.argmin(Z0)
-    x_EP, y_EP = [u.ravel()[idx] for u in (x, y)]
-    print "x_EP", x_EP
-    print "y_EP", y_EP
-
     dot_kwargs = dict(ms=6.0, mec='w', clip_on=False, zorder=10)
     for ax in (ax1, ax2):
         ax.plot(delta, eps, "w-", zorder=10)
@@ -124,52 +127,20 @@ def plot_spectrum(fig=None, ax1=None, ax2=None, pos_dep=False,
         ax.yaxis.set_major_formatter(FormatStrFormatter("%.2f"))
         ax.xaxis.set_major_formatter(FormatStrFormatter("%.1f"))
 
-    if pos_dep:
-        # eps^1 scaling
-        # datay = [y_EP, -0.278, -0.234, -0.188, -0.140, -0.072, -0.048, -0.024, -0.007, 0.000, 0.0]
-        # datax = [x_EP,  0.033,  0.034,  0.034,  0.033,  0.028,  0.025,  0.021,  0.015, 0.008, -0.1]
-        # eps^2 scaling
-        data = np.asarray([
-            [-0.242, 0.046],
-            [-0.175, 0.049],
-            [-0.121, 0.049],
-            [-0.070, 0.047],
-            [-0.035, 0.041],
-            [-0.016, 0.032],
-            [-0.010, 0.021],
-            [-0.003, 0.001],
-            [0.000, -0.009],
-            ])
-        datay, datax = data.T
-
-        if interpolate:
-            tck, _ = splprep([datay, datax], s=0.0001, k=3)
-            datay, datax = splev(np.linspace(0, 1, 10), tck)
-            np.savetxt("interpolate_coordinates.dat", np.vstack([datay, datax]).T,
-                       fmt="[%.3f,%.3f],", delimiter=",", header="[", footer="]",
-                       comments='')
-        ax1.plot(datay, datax, "w--", ms=1, lw=0.5, dashes=[4, 3])
-        # eps^1 scaling
-        # datay = [y_EP, -0.352, -0.416, -0.506, -0.596, -0.650, -0.684, -0.736, -0.791, -0.827, -0.901, -0.972, -1.058, -1.145]
-        # datax = [x_EP,  0.030,  0.026,  0.018,  0.011,  0.007,  0.005,  0.002,  0.000,  0.000,  0.000,  0.003,  0.008,  0.015]
-        # eps^2 scaling
-        data = np.asarray([
-            [-0.240, 0.046],
-            [-0.390, 0.032],
-            [-0.513, 0.021],
-            [-0.603, 0.013],
-            [-0.675, 0.007],
-            [-0.766, 0.002],
-            [-0.853, -0.001],
-            [-0.954, 0.003],
-            [-1.024, 0.006],
-            [-1.096, 0.011],
-            ]).T
-        datay, datax = data
-        ax2.plot(datay, datax, "w--", ms=1, lw=0.5, dashes=[4, 3])
-    else:
-        ax1.plot([0, D.y_EP], [-10, D.x_EP], "w--", lw=0.5, dashes=[4, 3])
-        ax2.plot([0, D.y_EP], [10, D.x_EP], "w--", lw=0.5, dashes=[4, 3])
+    # trace the lines Re(E_0 - E_1) = 0 and Im(E_0 - E_1) = 0 from the EP
+    bounds = (eps_min, eps_max, delta_min, delta_max)
+    re_cut, im_cut = trace_branch_cuts(D, x_EP, y_EP, bounds=bounds)
+    datax, datay = re_cut.T
+
+    if pos_dep and interpolate:
+        tck, _ = splprep([datay, datax], s=0.0001, k=3)
+        datay, datax = splev(np.linspace(0, 1, 10), tck)
+        np.savetxt("interpolate_coordinates.dat", np.vstack([datay, datax]).T,
+                   fmt="[%.3f,%.3f],", delimiter=",", header="[", footer="]",
+                   comments='')
+    ax1.plot(datay, datax, "w--", ms=1, lw=0.5, dashes=[4, 3])
+    datax, datay = im_cut.T
+    ax2.plot(datay, datax, "w--", ms=1, lw=0.5, dashes=[4, 3])
 
     ax1.set_ylabel(r'Amplitude $\sigma$')
     fig.text(0.45, 0.0, r'Detuning $\delta$', va='center')
@@ -222,16 +193,17 @@ def build_composite_plot(eps_min=-0.01, eps_max=0.11, eps_N=101, delta_N=101,
     plt.tight_layout()
     plt.subplots_adjust(wspace=0.2)
 
+    event_coordinates = []
     if show:
         if interactive:
-            event_coordinates = []
+            # manual correction on top of the traced branch cuts
             on_pick_lambda = lambda e: on_pick(e, event_coordinates, ax4)
             f.canvas.mpl_connect('button_press_event', on_pick_lambda)
         plt.show()
     else:
         plt.savefig("branch_cuts.pdf", bbox_inches='tight')
 
-    if interactive:
+    if interactive and event_coordinates:
         np.savetxt("interactive_coordinates.dat", np.asarray(event_coordinates),
                    fmt="[%.3f,%.3f],", delimiter=",", header="[", footer="]",
                    comments='')
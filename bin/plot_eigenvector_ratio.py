@@ -10,6 +10,7 @@ from scipy.interpolate import splprep, splev
 
 import argh
 
+from ep.locate import locate_EP
 from ep.waveguide import DirichletReduced
 from ep.waveguide import DirichletPositionDependentLossReduced
 from ep.plot import get_colors, get_defaults
@@ -53,6 +54,12 @@ def plot_spectrum(fig=None, ax1=None, ax2=None, pos_dep=False,
     z_diff_0 = z[..., 0, 0]/z[..., 1, 0]
     z_diff_1 = z[..., 0, 1]/z[..., 1, 1]
 
+    # refine the minimum of the eigenvalue splitting by Newton's method
+    idx = np.argmin(Z0)
+    x_EP, y_EP = locate_EP(D, *[u.ravel()[idx] for u in (x, y)])
+    print "x_EP", x_EP
+    print "y_EP", y_EP
+
 
     if pos_dep:
         vmax_real = 4.0
@@ -83,11 +90,6 @@ def plot_spectrum(fig=None, ax1=None, ax2=None, pos_dep=False,
         cb.ax.tick_params(labelsize=10)
         cb.solids.set_edgecolor('face')
 
-    idx = np.argmin(Z0)
-    x_EP, y_EP = [u.ravel()[idx] for u in (x, y)]
-    print "x_EP", x_EP
-    print "y_EP", y_EP
-
     dot_kwargs = dict(ms=6.0, mec='w', clip_on=False, zorder=10)
     for ax in (ax1, ax2):
         ax.plot(delta, eps, "w-", zorder=10)
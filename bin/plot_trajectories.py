@@ -11,7 +11,6 @@ import numpy as np
 import argh
 from PIL import Image
 
-from ep.helpers import map_trajectory
 import ep.plot
 from ep.waveguide import DirichletReduced, DirichletPositionDependentLossReduced
 
@@ -19,6 +18,9 @@ from ep.waveguide import DirichletReduced, DirichletPositionDependentLossReduced
 ep.plot.get_defaults()
 colors, parula, _ = ep.plot.get_colors()
 
+# model, SolveResult and the quantities used for plotting
+WG = namedtuple('WG', 'D S x c0 c1 E0 E1 adiabatic nstep')
+
 legend_kwargs = {'frameon': False,
         #'labelspacing': -0.25,
         #'columnspacing': 0.,
@@ -120,24 +122,23 @@ def get_real_spectrum(ax1=None, ax2=None, wg_list=None, ms=5.0, mew=1.5,
     ax1.plot(x, WGam.E0.real, "-", color=colors[0]) #, label=r"Re $E_1$")
     ax1.plot(x, WGam.E1.real, "-", color=colors[1]) #, label=r"Re $E_2$")
     if projection:
-        ax1.plot(x[::nstep], map_trajectory(WGam.c0, WGam.c1,
-                WGam.E0.real, WGam.E1.real)[::nstep], "k^",
+        ax1.plot(x[::nstep], WGam.S.map_trajectory(np.real)[::nstep], "k^",
                 ms=ms)
-        ax1.plot(x[nstep/2::nstep], map_trajectory(WGbm.c0, WGbm.c1,
-                WGam.E0.real, WGam.E1.real)[nstep/2::nstep], "ks",
-                ms=ms, mew=mew, fillstyle=fs)
+        ax1.plot(x[nstep/2::nstep],
+                 WGbm.S.map_trajectory(np.real)[nstep/2::nstep], "ks",
+                 ms=ms, mew=mew, fillstyle=fs)
     ax1.set_ylabel(r"Real spectrum", labelpad=0)
 
     if ax2:
         ax2.plot(L - x, WGap.E0.real, "-", color=colors[1])
         ax2.plot(L - x, WGap.E1.real, "-", color=colors[0])
         if projection:
-            ax2.plot((L - x)[::nstep], map_trajectory(WGap.c0, WGap.c1,
-                    WGap.E0.real, WGap.E1.real)[::nstep], "ks",
-                    ms=ms, mew=mew, fillstyle=fs)
-            ax2.plot((L - x)[nstep/2::nstep], map_trajectory(WGbp.c0, WGbp.c1,
-                    WGap.E0.real, WGap.E1.real)[nstep/2::nstep], "k^",
-                    ms=ms)
+            ax2.plot((L - x)[::nstep],
+                     WGap.S.map_trajectory(np.real)[::nstep], "ks",
+                     ms=ms, mew=mew, fillstyle=fs)
+            ax2.plot((L - x)[nstep/2::nstep],
+                     WGbp.S.map_trajectory(np.real)[nstep/2::nstep], "k^",
+                     ms=ms)
 
     _, delta = WGam.D.get_cycle_parameters()
     k1 = WGam.D.k0
@@ -221,11 +222,9 @@ def get_real_spectrum_new(ax1=None, ax2=None, wg_list=None, ms=5.0, mew=1.5,
     ax1.plot(x, WGam.E0.real, "k-", lw=lw)
     ax1.plot(x, WGam.E1.real, "k-", lw=lw)
     if projection:
-        ax1.plot(x, map_trajectory(WGam.c0, WGam.c1,
-                WGam.E0.real, WGam.E1.real), "--", color=colors[0],
+        ax1.plot(x, WGam.S.map_trajectory(np.real), "--", color=colors[0],
                 ms=ms)
-        ax1.plot(x, map_trajectory(WGbm.c0, WGbm.c1,
-                WGam.E0.real, WGam.E1.real), "--", color=colors[1],
+        ax1.plot(x, WGbm.S.map_trajectory(np.real), "--", color=colors[1],
                 ms=ms, mew=mew, fillstyle=fs)
     ax1.set_ylabel(r"Real spectrum")
     # ax1.get_yaxis().set_tick_params(pad=5)
@@ -234,11 +233,9 @@ def get_real_spectrum_new(ax1=None, ax2=None, wg_list=None, ms=5.0, mew=1.5,
         ax2.plot(L - x, WGap.E0.real, "k-", lw=lw)
         ax2.plot(L - x, WGap.E1.real, "k-", lw=lw)
         if projection:
-            ax2.plot((L - x), map_trajectory(WGap.c0, WGap.c1,
-                    WGap.E0.real, WGap.E1.real), "--", color=colors[1],
+            ax2.plot((L - x), WGap.S.map_trajectory(np.real), "--", color=colors[1],
                     ms=ms, mew=mew, fillstyle=fs)
-            ax2.plot((L - x), map_trajectory(WGbp.c0, WGbp.c1,
-                    WGap.E0.real, WGap.E1.real), "--", color=colors[0],
+            ax2.plot((L - x), WGbp.S.map_trajectory(np.real), "--", color=colors[0],
                     ms=ms)
 
     for ax in (ax1, ax2):
@@ -563,19 +560,21 @@ def plot_uniform():
     wg_list = [DirichletReduced(**wg_kwargs) for wg_kwargs in wg_kwarg_list]
     WGam, WGbm, WGap, WGbp = wg_list
 
+    results = []
     for w in wg_list:
-        w.solve_ODE()
+        results.append(w.solve())
         print "...done."
 
-    WG = namedtuple('WG', 'D x c0 c1 E0 E1 adiabatic nstep')
-    adiabatic = WGam.Psi_adiabatic[:, 0]**(-1)
-    if np.all(np.isnan(adiabatic)):
+    # rescale by the adiabatic prediction only if it was requested
+    if WGam.calc_adiabatic_state:
+        adiabatic = results[0].Psi_adiabatic[:, 0]**(-1)
+    else:
         adiabatic = 1.
     nstep = WGam.tN/10
 
-    wg_list = [WG(wg, wg.t, wg.phi_a, wg.phi_b,
-                  wg.eVals[:, 0], wg.eVals[:, 1],
-                  adiabatic, nstep) for wg in wg_list]
+    wg_list = [WG(wg, r, r.t, r.phi_a, r.phi_b,
+                  r.eVals[:, 0], r.eVals[:, 1],
+                  adiabatic, nstep) for wg, r in zip(wg_list, results)]
 
     plot_dynamics(wg_list,
                   figname="uniform_reduced_trajectory.pdf",
@@ -628,19 +627,21 @@ def plot_position_dependent():
     wg_list = [DirichletPositionDependentLossReduced(**kw) for kw in wg_kwarg_list]
     WGam, WGbm, WGap, WGbp = wg_list
 
+    results = []
     for w in wg_list:
-        w.solve_ODE()
+        results.append(w.solve())
         print "...done."
 
-    WG = namedtuple('WG', 'D x c0 c1 E0 E1 adiabatic nstep')
-    adiabatic = WGam.Psi_adiabatic[:, 0]**(-1)
-    if np.all(np.isnan(adiabatic)):
+    # rescale by the adiabatic prediction only if it was requested
+    if WGam.calc_adiabatic_state:
+        adiabatic = results[0].Psi_adiabatic[:, 0]**(-1)
+    else:
         adiabatic = 1.
     nstep = WGam.tN/10
 
-    wg_list = [WG(wg, wg.t, wg.phi_a, wg.phi_b,
-                  wg.eVals[:, 0], wg.eVals[:, 1],
-                  adiabatic, nstep) for wg in wg_list]
+    wg_list = [WG(wg, r, r.t, r.phi_a, r.phi_b,
+                  r.eVals[:, 0], r.eVals[:, 1],
+                  adiabatic, nstep) for wg, r in zip(wg_list, results)]
 
     plot_dynamics(wg_list,
                   figname="pos_dep_reduced_trajectory.pdf",
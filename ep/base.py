@@ -1,23 +1,74 @@
 #!/usr/bin/env python2.7
 
 from __future__ import division
+from collections import OrderedDict
+import hashlib
+import threading
+
 import numpy as np
 from numpy import pi
-from scipy.integrate import complex_ode
 
 from ep.helpers import c_eig, c_trapz, c_cumtrapz, map_trajectory
+from ep.integrators import integrate
+from ep.result import SolveResult
+from ep.sampling import adaptive_sample_H
+
+
+# least recently used cache of instantaneous eigensystems, shared by all
+# model instances (see Base.calc_c_eigensystem); a size of 0 disables it. All
+# accesses are guarded by _EIGENSYSTEM_CACHE_LOCK, such that models can be
+# solved concurrently in threads
+EIGENSYSTEM_CACHE = OrderedDict()
+EIGENSYSTEM_CACHE_SIZE = 8
+_EIGENSYSTEM_CACHE_LOCK = threading.Lock()
+
+# maximum relative deviation of the path and the Hamiltonians of a cache hit
+_EIGENSYSTEM_CACHE_RTOL = 1e-12
+
+# attributes which do not enter the Hamiltonian along the path
+_EIGENSYSTEM_CACHE_EXCLUDE = ('init_state', 'init_state_method', 'verbose',
+                              'calc_adiabatic_state', 'integrator',
+                              'integrator_kwargs', 'integrator_info',
+                              '_tqd_already_calculated', 't', 'eVec0',
+                              'phi_a', 'phi_b')
+
+
+# per-timestep arrays which are only allocated on first access, such that
+# model instances which are only used to evaluate H are cheap to construct:
+# name -> number of trailing axes of length _n_states of the (tN,...)
+# complex256 buffer
+_BUFFERS = {'Psi': 1,
+            'eVals': 1,
+            'eVecs_r': 2,
+            'eVecs_l': 2,
+            'Psi_adiabatic': 1,
+            'theta_adiabatic': 1}
+
+
+def clear_eigensystem_cache():
+    """Remove all entries from the eigensystem cache."""
+    with _EIGENSYSTEM_CACHE_LOCK:
+        EIGENSYSTEM_CACHE.clear()
 
 
 class Base:
     """Base class."""
 
+    # whether H accepts array arguments and returns stacks of shape (...,2,2)
+    _vectorized_H = False
+
+    # dimension of the Hamiltonian
+    _n_states = 2
+
     def __init__(self, T=100, tN=50, x_R0=0.05, y_R0=0.4, loop_type="Circle",
                  loop_direction='-', init_state='a', init_state_method='gain',
-                 init_phase=0.0, calc_adiabatic_state=False, verbose=False):
+                 init_phase=0.0, calc_adiabatic_state=False, verbose=False,
+                 integrator='default', integrator_kwargs=None):
         """Exceptional Point (EP) base class.
 
         The dynamics of a 2-level system are determined via a Runge-Kutta
-        method of order (4) 5 due to Dormand and Prince.
+        method of order (4) 5 due to Dormand and Prince (default) or any
+        other backend registered in ep.integrators.
 
             Parameters:
             -----------
@@ -29,7 +80,7 @@ class Base:
                     x-coordinate of the loop parametrization.
                 y_R0 : float, optional
                     y-coordinate of the loop parametrization.
-                init_state : str, optional
+                init_state : str, int or ndarray, optional
                     Determines initial state for the system's evolution:
                        'a': populate gain state |a>
                        'b': populate loss state |b>
@@ -37,6 +88,8 @@ class Base:
                                 2^(-1/2)*(|a> + |b>)
                        'd': superposition of gain and loss state:
                                 2^(-1/2)*(|a> - |b>)
+                         n: populate the n-th (sorted) eigenstate
+                       vec: explicit initial vector
                 init_state_method: str, optional ('gain'|'energy')
                     Determines which method to use for sorting the eigensystem.
                 loop_type : str, optional
@@ -51,6 +104,13 @@ class Base:
                     considerably).
                 verbose: bool, optional
                     Whether to return additional output.
+                integrator: str, optional
+                    Integrator preset ('fast'|'default'|'reference'|'stiff')
+                    or backend name ('dopri5'|'dop853'|'bdf'|'expm'|'rk4'|
+                    'rk45').
+                integrator_kwargs: dict, optional
+                    Backend options (rtol, atol, nsub, ...) overriding the
+                    preset values.
         """
         self.T = T
 
@@ -60,10 +120,11 @@ class Base:
         self.loop_direction = loop_direction
 
         # number of timesteps in ODE-integration
-        self.tN = tN * T
+        self.tN = int(round(tN * T))
 
-        # time-array and step-size
-        self.t, self.dt = np.linspace(0, T, self.tN, retstep=True)
+        # step-size of the time-array self.t (allocated on first access, see
+        # __getattr__)
+        self.dt = T/(self.tN - 1) if self.tN > 1 else np.nan
 
         # loop frequency
         self.w = 2.*pi/T
@@ -74,22 +135,37 @@ class Base:
         self.x_R0, self.y_R0 = x_R0, y_R0
         self.init_phase = init_phase
 
-        # wavefunction |Psi(t)>
-        self.Psi = np.zeros((self.tN, 2), dtype=np.complex256)
-
-        # instantaneous eigenvalues E_a, E_b and corresponding eigenvectors
-        # |phi_a> and |phi_b>
-        self.eVals = np.zeros((self.tN, 2), dtype=np.complex256)
-        self.eVecs_r = np.zeros((self.tN, 2, 2), dtype=np.complex256)
-        self.eVecs_l = np.zeros((self.tN, 2, 2), dtype=np.complex256)
-
-        # adiabatic coefficient and adiabatic phase
-        self.Psi_adiabatic = np.zeros((self.tN, 2), dtype=np.complex256)
-        self.theta_adiabatic = np.zeros((self.tN, 2), dtype=np.complex256)
+        # the wavefunction |Psi(t)>, the instantaneous eigenvalues E_a, E_b
+        # and corresponding eigenvectors |phi_a> and |phi_b>, and the
+        # adiabatic coefficients and phases are allocated on first access
+        # (see __getattr__)
 
         self.calc_adiabatic_state = calc_adiabatic_state
         self.verbose = verbose
 
+        # ODE integrator settings
+        self.integrator = integrator
+        if integrator_kwargs is None:
+            integrator_kwargs = {}
+        self.integrator_kwargs = integrator_kwargs
+        self.integrator_info = None
+
+    def __getattr__(self, name):
+        """Allocate the time-array t and the buffers in _BUFFERS on first
+        access."""
+
+        if name == 't':
+            value = np.linspace(0, self.T, self.tN)
+        elif name in _BUFFERS:
+            shape = (self.tN,) + (self._n_states,)*_BUFFERS[name]
+            value = np.zeros(shape, dtype=np.complex256)
+        else:
+            raise AttributeError(name)
+
+        self.__dict__[name] = value
+
+        return value
+
     def get_cycle_parameters(self, t):
         """get_cycle_parameters method is overwritten by inheriting classes."""
         pass
@@ -98,6 +174,79 @@ class Base:
         """Hamiltonian H is overwritten by inheriting classes."""
         pass
 
+    def H_stack(self, t, x=None, y=None):
+        """Return the Hamiltonian evaluated on arrays of times t (and
+        parameters x, y) as a stack of matrices.
+
+        Inheriting classes with a vectorized Hamiltonian are evaluated in a
+        single call, otherwise H is evaluated element by element.
+
+            Parameters:
+            -----------
+                t: float or ndarray
+                    Times at which to evaluate the Hamiltonian.
+                x, y: float or ndarray (optional)
+                    Parameters (x, y), broadcastable against t.
+
+            Returns:
+            --------
+                H: (...,2,2) ndarray
+        """
+
+        if x is None and y is None:
+            args = (np.asarray(t),)
+        else:
+            args = np.broadcast_arrays(t, x, y)
+
+        if self._vectorized_H:
+            H = self.H(*args)
+            return np.broadcast_to(H, args[0].shape + H.shape[-2:])
+
+        if not args[0].size:
+            return np.empty(args[0].shape + (self._n_states,)*2,
+                            dtype=complex)
+
+        H = None
+        for idx in np.ndindex(*args[0].shape):
+            Hn = self.H(*[a[idx] for a in args])
+            if H is None:
+                H = np.empty(args[0].shape + Hn.shape, dtype=complex)
+            H[idx] = Hn
+
+        return H
+
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the derivatives (dH/dx, dH/dy) of the Hamiltonian with
+        respect to the parameters (x, y).
+
+        Inheriting classes provide the analytic derivatives where H depends
+        on (x, y) in closed form; otherwise, central differences of H_stack
+        with step h are used.
+
+            Parameters:
+            -----------
+                t: float or ndarray
+                    Times at which to evaluate the derivatives.
+                x, y: float or ndarray (optional)
+                    Parameters (x, y), broadcastable against t. If None,
+                    (x, y) are obtained from get_cycle_parameters at time t.
+                h: float
+                    Step of the central differences.
+
+            Returns:
+            --------
+                H_x, H_y: (...,M,M) ndarray
+        """
+
+        if x is None and y is None:
+            x, y = self.get_cycle_parameters(t)
+        t, x, y = np.broadcast_arrays(t, x, y)
+
+        H = self.H_stack(np.stack([t]*4), np.stack([x + h, x - h, x, x]),
+                         np.stack([y, y, y + h, y - h]))
+
+        return (H[0] - H[1])/(2.*h), (H[2] - H[3])/(2.*h)
+
     def sample_H(self, xmin=None, xmax=None, xN=None, ymin=None, ymax=None,
                  yN=None, verbose=False):
         """Sample local eigenvalue geometry of Hamiltonian H.
@@ -200,6 +349,23 @@ class Base:
 
         return X, Y, Z
 
+    def adaptive_sample_H(self, xmin, xmax, ymin, ymax, **kwargs):
+        """Sample the local eigenvalue geometry of Hamiltonian H on an
+        adaptively refined quadtree, which resolves the EP and the branch
+        cuts with far fewer points than sample_H (see
+        ep.sampling.adaptive_sample_H and ep.sampling.resample_on_grid).
+
+            Returns:
+            --------
+                x, y: (P,) ndarray
+                    Sampling points.
+                Z: (P,2) ndarray
+                    Eigenvalues at the sampling points.
+                triangles: (T,3) ndarray
+                    Triangulation of the sampling points.
+        """
+
+        return adaptive_sample_H(self, xmin, xmax, ymin, ymax, **kwargs)
 
     def plot_3D_spectrum(self, xmin=None, xmax=None, xN=None, ymin=None,
                          ymax=None, yN=None, trajectory=False, tube_radius=1e-2,
@@ -318,18 +484,105 @@ class Base:
                                              np.imag(E[i, j, 0])))
         return X, Y, Z, F
 
-    def get_c_eigensystem(self):
-        """Calculate the instantaneous eigenvalues and eigenvectors for
-        all times t=0,...,T and remove any discontinuities."""
+    def calc_c_eigensystem(self):
+        """Return the instantaneous eigenvalues and eigenvectors for all
+        times t=0,...,T with any discontinuities removed.
+
+        In contrast to get_c_eigensystem, the model instance is not
+        modified.
+
+        Eigensystems are cached for models with identical parameters (see
+        EIGENSYSTEM_CACHE). A cached eigensystem is only reused if the path
+        (x(t), y(t)) and the Hamiltonians at all times t agree with the
+        cached ones (up to a relative deviation of _EIGENSYSTEM_CACHE_RTOL).
+
+            Returns:
+            --------
+                eVals: (N,2) ndarray
+                eVecs_l: (N,2,2) ndarray
+                eVecs_r: (N,2,2) ndarray
+        """
+
+        H = np.asarray(self.H_stack(self.t))
+
+        if EIGENSYSTEM_CACHE_SIZE <= 0:
+            return self._calc_c_eigensystem(H)
+
+        key = self._get_eigensystem_key()
+        path = np.asarray(self.get_cycle_parameters(self.t), dtype=float)
+
+        with _EIGENSYSTEM_CACHE_LOCK:
+            entry = EIGENSYSTEM_CACHE.pop(key, None)
+            if entry is not None:
+                EIGENSYSTEM_CACHE[key] = entry
+
+        if entry is not None:
+            path_cached, H_cached, eigensystem = entry
+
+            if (_is_close(path, path_cached) and
+                    _is_close(H, H_cached)):
+                return [np.array(e) for e in eigensystem]
+
+        eigensystem = self._calc_c_eigensystem(H)
+
+        with _EIGENSYSTEM_CACHE_LOCK:
+            EIGENSYSTEM_CACHE.pop(key, None)
+            EIGENSYSTEM_CACHE[key] = (path, H, eigensystem)
+            while len(EIGENSYSTEM_CACHE) > EIGENSYSTEM_CACHE_SIZE:
+                EIGENSYSTEM_CACHE.popitem(last=False)
+
+        return [np.array(e) for e in eigensystem]
+
+    def _get_eigensystem_key(self):
+        """Return a hashable key of the model parameters; arrays enter by
+        their shape and a digest of their data, other objects (e.g.,
+        functions) are ignored."""
+
+        params = []
+        for k, v in vars(self).items():
+            if k in _EIGENSYSTEM_CACHE_EXCLUDE or k in _BUFFERS:
+                continue
+            if np.isscalar(v) or v is None:
+                params.append((k, v))
+            elif isinstance(v, (np.ndarray, list, tuple)):
+                try:
+                    a = np.ascontiguousarray(v)
+                except ValueError:
+                    continue
+                if a.dtype != object:
+                    params.append((k, (a.shape, a.dtype.str,
+                                       hashlib.sha1(a.tobytes()).hexdigest())))
+
+        return (self.__class__, tuple(sorted(params)))
+
+    def _calc_c_eigensystem(self, H=None):
+        """Calculate the instantaneous eigenvalues and eigenvectors for all
+        times t=0,...,T and remove any discontinuities.
+
+        The eigensystem is stored in extended precision (complex256) like the
+        other buffers of the model: for symmetric loops, the gain integrals of
+        both states can be degenerate (see _is_gain_state_swapped), and the
+        labelling of the states a and b is then determined by the roundoff
+        of the extended-precision integrals.
+
+            Parameters:
+            -----------
+                H: (N,2,2) ndarray, optional
+                    Hamiltonians at the times t (defaults to
+                    H_stack(self.t)).
+        """
+
+        if H is None:
+            H = self.H_stack(self.t)
 
         # allocate temporary vectors
-        eVals = np.zeros_like(self.eVals)
-        eVecs_r = np.zeros_like(self.eVecs_r)
-        eVecs_l = np.zeros_like(self.eVecs_l)
+        eVals = np.zeros((len(self.t), 2), dtype=np.complex256)
+        eVecs_r = np.zeros((len(self.t), 2, 2), dtype=np.complex256)
+        eVecs_l = np.zeros((len(self.t), 2, 2), dtype=np.complex256)
 
         # get eigenvalues and (left and right) eigenvectors at t=tn
-        for n, tn in enumerate(self.t):
-            eVals[n, :], eVecs_l[n, :, :], eVecs_r[n, :, :] = c_eig(self.H(tn),
+        for n, Hn in enumerate(H):
+            eVals[n, :], eVecs_l[n, :, :], eVecs_r[n, :, :] = c_eig(Hn,
                                                                     left=True)
 
         # check for discontinuities of first eigenvalue
@@ -366,9 +619,31 @@ class Base:
 
         #print np.einsum('ijk,ijk -> ik', eVecs_l, eVecs_r)
 
-        self.eVals = eVals
-        self.eVecs_l = eVecs_l
-        self.eVecs_r = eVecs_r
+        return eVals, eVecs_l, eVecs_r
+
+    def get_c_eigensystem(self):
+        """Calculate the instantaneous eigenvalues and eigenvectors for
+        all times t=0,...,T and remove any discontinuities."""
+
+        self.eVals, self.eVecs_l, self.eVecs_r = self.calc_c_eigensystem()
+
+    def sort_c_eigensystem(self, eVals, eVecs_l, eVecs_r):
+        """Return the eigensystem sorted according to the init_state_method
+        ('gain'|'energy'), see _find_gain_state and
+        _find_lower_energy_state."""
+
+        if self.init_state_method == 'gain':
+            swap = _is_gain_state_swapped(eVals, self.dt)
+        elif self.init_state_method == 'energy':
+            swap = _is_lower_energy_state_swapped(eVals)
+        else:
+            swap = False
+
+        if swap:
+            eVals, eVecs_l, eVecs_r = [e[..., ::-1] for e in
+                                       eVals, eVecs_l, eVecs_r]
+
+        return eVals, eVecs_l, eVecs_r
 
     def _get_adiabatic_state(self):
         """Calculate the adiabatic prediction exp(1j*theta).
@@ -383,7 +658,7 @@ class Base:
                 adiabatic prediction: float
         """
 
-        for i in (0, 1):
+        for i in range(self._n_states):
             E = self.eVals[:, i]
             self.theta_adiabatic[:, i] = -c_cumtrapz(E, dx=self.dt)
             self.Psi_adiabatic[:, i] = np.exp(1j*self.theta_adiabatic[:, i])
@@ -397,13 +672,7 @@ class Base:
         interchanged.
         """
 
-        # calculate time-integral of both eigenvalues
-        intE0, intE1  = [ c_trapz(self.eVals[:,n],
-                                  dx=self.dt) for n in (0,1) ]
-
-        # change order of energy eigenvalues and eigenvectors if
-        # imag(integral_E0) is smaller than imag(integral_E1)
-        if np.imag(intE0) < np.imag(intE1):
+        if _is_gain_state_swapped(self.eVals, self.dt):
             self.eVals[:,:] = self.eVals[:,::-1]
             self.eVecs_r[:,:,:] = self.eVecs_r[:,:,::-1]
             self.eVecs_l[:,:,:] = self.eVecs_l[:,:,::-1]
@@ -413,7 +682,7 @@ class Base:
         the first state |0> corresponds to Re(E_0) < Re(E_1) of the second
         state |1> at time t=0."""
 
-        if self.eVals[0, 0].real > self.eVals[0, 1].real:
+        if _is_lower_energy_state_swapped(self.eVals):
             for e in self.eVals, self.eVecs_r, self.eVecs_l:
                 e[..., :] = e[..., ::-1]
 
@@ -428,31 +697,61 @@ class Base:
                 eVec0_r: (2,) ndarray
         """
 
-        if self.init_state == 'a':
-            eVec0_r = self.eVecs_r[0,:,0]
+        return _get_init_state_vector(self.eVecs_r, self.init_state)
+
+    def solve(self, init_state=None, H=None):
+        """Solve the Schroedinger equation on the discretized time-grid.
+
+        In contrast to solve_ODE, the model instance is not modified, i.e.,
+        the same instance can be solved concurrently, e.g., for different
+        initial states (note that the scipy backends dopri5, dop853 and bdf
+        are not thread-safe; use processes or the fixed-step backends).
+
+            Parameters:
+            -----------
+                init_state: str, int or ndarray, optional
+                    Initial state ('a'|'b'|'c'|'d', eigenstate index or
+                    vector); defaults to the init_state attribute.
+                H: callable, optional
+                    Hamiltonian H(t); defaults to the H method.
+
+            Returns:
+            --------
+                result: SolveResult
+        """
+
+        if init_state is None:
+            init_state = self.init_state
 
-        elif self.init_state == 'b':
-            eVec0_r = self.eVecs_r[0,:,1]
+        if H is None:
+            H = self.H
+            H_stack = self.H_stack
+        else:
+            H_stack = None
 
-        elif self.init_state == 'c':
-            eVec0_r = self.eVecs_r[0,:,0] + self.eVecs_r[0,:,1]
-            eVec0_l = self.eVecs_l[0,:,0] + self.eVecs_l[0,:,1]
-            norm = lambda vl, vr: np.sqrt(vl.dot(vr))
-            # print norm(eVec0_l, eVec0_r)
-            # print norm(eVec0_r.conj(), eVec0_r)
-            eVec0_r /= norm(eVec0_r.conj(), eVec0_r)
+        # set initial conditions
+        eVals, eVecs_l, eVecs_r = self.sort_c_eigensystem(
+            *self.calc_c_eigensystem())
+        eVec0 = _get_init_state_vector(eVecs_r, init_state)
 
-        elif self.init_state == 'd':
-            phase = np.exp(1j*pi)
-            eVec0_r = self.eVecs_r[0,:,0] + phase*self.eVecs_r[0,:,1]
-            norm = lambda vl, vr: np.sqrt(vl.dot(vr))
-            eVec0_r /= norm(eVec0_r.conj(), eVec0_r)
+        # solve Schroedinger equation (SE)
+        Psi, integrator_info = integrate(
+            H, self.t, eVec0, integrator=self.integrator,
+            H_stack=H_stack, **self.integrator_kwargs)
 
-        return eVec0_r
+        return SolveResult(self.t, Psi, eVals, eVecs_l, eVecs_r,
+                           init_state=init_state,
+                           loop_direction=self.loop_direction,
+                           integrator_info=integrator_info)
 
     def solve_ODE(self, H=None):
         """Iteratively solve the ODE dy/dt = f(t,y) on a discretized time-grid.
 
+        The wavefunction, eigensystem and projections are stored as
+        attributes of the model instance (see also the solve method, which
+        returns a SolveResult instead). The integrator backend and the
+        tolerances used are recorded in the integrator_info attribute.
+
             Returns:
             --------
                     t:  (N,)  ndarray
@@ -463,49 +762,87 @@ class Base:
                         Overlap <phi_b|psi>.
         """
 
-        if H is None:
-            H = self.H
+        result = self.solve(H=H)
 
-        # set initial conditions
-        self.get_c_eigensystem()        # calculate eigensystem for all times
-        if self.init_state_method == 'gain':
-            self._find_gain_state()
-        elif self.init_state_method == 'energy':
-            self._find_lower_energy_state()
-        self.eVec0 = self._get_init_state()
-
-        # create ode object to solve Schroedinger equation (SE)
-        ode_kwargs = {'rtol': 1e-9,
-                      'atol': 1e-9}
-        SE = complex_ode(lambda t, phi: -1j*H(t).dot(phi))
-        SE.set_integrator('dopri5', **ode_kwargs)
-        SE.set_initial_value(self.eVec0, t=0.0)
-
-        # iterate SE
-        for n, tn in enumerate(self.t):
-            if SE.successful():
-                self.Psi[n,:] = SE.y
-                SE.integrate(SE.t + self.dt)
-            else:
-                raise Exception("ODE convergence error!")
+        self.eVals, self.eVecs_l, self.eVecs_r = [
+            np.array(e) for e in (result.eVals, result.eVecs_l,
+                                  result.eVecs_r)]
+        self.eVec0 = np.array(result.Psi[0])
+        self.Psi[:, :] = result.Psi
+        self.integrator_info = result.integrator_info
 
         if self.calc_adiabatic_state:
-            self._get_adiabatic_state()
+            self.theta_adiabatic[:, :] = result.theta_adiabatic
+            self.Psi_adiabatic[:, :] = result.Psi_adiabatic
 
-        # replace projection of states by dot product via Einstein sum
-        projection = np.einsum('ijk,ij -> ik',
-                               self.eVecs_l, self.Psi)
-        # use alternative means to obtain coefficients:
-        #  (c1, c2) = X^-1^T psi
-        # from scipy.linalg import inv
-        # projection = [np.einsum('jk,j -> k', inv(self.eVecs_r[n,:]).T, self.Psi[n,:])
-        #                for n, _ in enumerate(self.t)]
-        # projection = np.asarray(projection)
-
-        self.phi_a, self.phi_b = [projection[:,n] for n in (0,1)]
+        self.phi_a, self.phi_b = [np.array(p) for p in (result.phi_a,
+                                                        result.phi_b)]
 
         return self.t, self.phi_a, self.phi_b
 
 
+def _is_close(a, b, rtol=_EIGENSYSTEM_CACHE_RTOL):
+    """Return True if the arrays a and b have the same shape and agree up to
+    a deviation of rtol relative to the maximum of b."""
+
+    if np.shape(a) != np.shape(b):
+        return False
+
+    return bool(np.all(np.abs(a - b) <= rtol*np.abs(b).max()))
+
+
+def _is_gain_state_swapped(eVals, dt):
+    """Return True if imag(int_0,T E_0 dt) is smaller than
+    imag(int_0,T E_1 dt)."""
+
+    # calculate time-integral of both eigenvalues
+    intE0, intE1 = [c_trapz(eVals[:, n], dx=dt) for n in (0, 1)]
+
+    return np.imag(intE0) < np.imag(intE1)
+
+
+def _is_lower_energy_state_swapped(eVals):
+    """Return True if Re(E_0) > Re(E_1) at time t=0."""
+
+    return eVals[0, 0].real > eVals[0, 1].real
+
+
+def _get_init_state_vector(eVecs_r, init_state):
+    """Return the initial state vector |phi_i(0)> with i = a, b or c/d (=
+    linear combinations of a and b), the n-th eigenstate |phi_n(0)> for an
+    integer n or an explicitly given vector."""
+
+    if isinstance(init_state, (int, np.integer)):
+        eVec0_r = eVecs_r[0,:,init_state]
+
+    elif np.ndim(init_state) == 1:
+        eVec0_r = np.array(init_state, dtype=complex)
+
+    elif init_state == 'a':
+        eVec0_r = eVecs_r[0,:,0]
+
+    elif init_state == 'b':
+        eVec0_r = eVecs_r[0,:,1]
+
+    elif init_state == 'c':
+        eVec0_r = eVecs_r[0,:,0] + eVecs_r[0,:,1]
+        norm = lambda vl, vr: np.sqrt(vl.dot(vr))
+        # print norm(eVec0_l, eVec0_r)
+        # print norm(eVec0_r.conj(), eVec0_r)
+        eVec0_r /= norm(eVec0_r.conj(), eVec0_r)
+
+    elif init_state == 'd':
+        phase = np.exp(1j*pi)
+        eVec0_r = eVecs_r[0,:,0] + phase*eVecs_r[0,:,1]
+        norm = lambda vl, vr: np.sqrt(vl.dot(vr))
+        eVec0_r /= norm(eVec0_r.conj(), eVec0_r)
+
+    else:
+        raise Exception(("Error: init_state {0} "
+                         "does not exist!").format(init_state))
+
+    return eVec0_r
+
+
 if __name__ == '__main__':
     pass
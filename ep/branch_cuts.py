@@ -0,0 +1,171 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.locate import get_discriminant
+
+
+def _get_gradient(model, x, y, t, h):
+    """Return Im D(x, y) and its gradient from central differences."""
+
+    D = get_discriminant(model, x + np.array([0, h, -h, 0, 0]),
+                         y + np.array([0, 0, 0, h, -h]), t)
+
+    return D[0], np.array([D[1] - D[2], D[3] - D[4]]).imag/(2.*h)
+
+
+def trace_level_line(model, x0, y0, direction, t=0.0, ds=1e-3, ds_min=1e-8,
+                     ds_max=1e-2, max_angle=0.1, h=1e-8, tol=1e-13,
+                     maxiter=8, maxsteps=10000, max_length=None,
+                     bounds=None):
+    """Follow the level line Im D(x, y) = 0 of the discriminant from the
+    point (x0, y0) by predictor-corrector continuation.
+
+    In each step, the point is extrapolated along the tangent of the level
+    line and projected back onto it by Newton's method perpendicular to the
+    tangent. The step size is reduced if the corrector fails or if the
+    tangent turns by more than max_angle, and increased otherwise. The
+    tracing stops when the line leaves the bounds, exceeds max_length or
+    passes another root of D (an EP), where Re D changes sign.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y).
+            x0, y0: float
+                Starting point on the level line, e.g., an EP.
+            direction: (2,) array_like
+                Initial direction; the tangent with positive projection
+                onto it is followed.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+            ds, ds_min, ds_max: float
+                Initial, minimum and maximum step.
+            max_angle: float
+                Maximum angle between consecutive tangents.
+            h: float
+                Step of the finite differences.
+            tol: float
+                Tolerance of the corrector.
+            maxiter: int
+                Maximum number of corrector iterations per step.
+            maxsteps: int
+                Maximum number of steps.
+            max_length: float, optional
+                Maximum length of the line.
+            bounds: (xmin, xmax, ymin, ymax), optional
+                Domain of the line.
+
+        Returns:
+        --------
+            xy: (K,2) ndarray
+                Coordinates of the level line.
+            D: (K,) ndarray
+                Discriminant along the line.
+    """
+
+    z = np.array([x0, y0], dtype=float)
+    D, g = _get_gradient(model, z[0], z[1], t, h)
+    tau = np.array([-g[1], g[0]])/np.hypot(*g)
+    if np.dot(tau, direction) < 0:
+        tau = -tau
+
+    points, values = [z], [D]
+    length = 0.
+
+    for n in range(maxsteps):
+        while True:
+            z_pred = z + ds*tau
+            z_new = z_pred.copy()
+            dz = np.full(2, np.inf)
+            for k in range(maxiter):
+                D_new, g = _get_gradient(model, z_new[0], z_new[1], t, h)
+                A = np.array([g, tau])
+                b = np.array([D_new.imag, np.dot(tau, z_new - z_pred)])
+                try:
+                    dz = -np.linalg.solve(A, b)
+                except np.linalg.LinAlgError:
+                    break
+                z_new = z_new + dz
+                if np.hypot(*dz) <= tol*(1. + np.hypot(*z_new)):
+                    break
+
+            tau_new = np.array([-g[1], g[0]])/np.hypot(*g)
+            if np.dot(tau_new, tau) < 0:
+                tau_new = -tau_new
+            converged = (np.isfinite(z_new).all() and
+                         np.hypot(*dz) <= tol*(1. + np.hypot(*z_new)))
+            smooth = np.dot(tau_new, tau) >= np.cos(max_angle)
+            if converged and smooth:
+                break
+            ds *= 0.5
+            if ds < ds_min:
+                return np.asarray(points), np.asarray(values)
+
+        if k <= 2:
+            ds = min(1.5*ds, ds_max)
+
+        length += np.hypot(*(z_new - z))
+        z, tau = z_new, tau_new
+        D = get_discriminant(model, z[0], z[1], t)
+        points.append(z)
+        values.append(D)
+
+        # another EP: Re D changes sign on the line Im D = 0
+        if len(values) > 2 and D.real*values[-2].real < 0:
+            break
+
+        if bounds is not None:
+            xmin, xmax, ymin, ymax = bounds
+            if not (xmin <= z[0] <= xmax and ymin <= z[1] <= ymax):
+                break
+        if max_length is not None and length >= max_length:
+            break
+
+    return np.asarray(points), np.asarray(values)
+
+
+def trace_branch_cuts(model, x_EP, y_EP, **kwargs):
+    """Trace the lines Re(E_0 - E_1) = 0 and Im(E_0 - E_1) = 0 which emanate
+    from the EP (x_EP, y_EP) of a 2x2 model.
+
+    With E_0 - E_1 = sqrt(D), both are parts of the level line Im D = 0:
+    Re(E_0 - E_1) vanishes where Re D < 0 and Im(E_0 - E_1) vanishes where
+    Re D > 0. The level line passes through the EP (D = 0) and is followed
+    in both directions by trace_level_line, such that the cost scales with
+    the length of the lines instead of the area of a sampling grid.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y).
+            x_EP, y_EP: float
+                Position of the EP (see ep.locate.locate_EP).
+            kwargs:
+                Options of trace_level_line (e.g., bounds, ds, max_length).
+
+        Returns:
+        --------
+            re_cut, im_cut: (K,2) ndarray
+                Coordinates (x, y) of the lines Re(E_0 - E_1) = 0 and
+                Im(E_0 - E_1) = 0, starting at the EP.
+    """
+
+    t = kwargs.get('t', 0.0)
+    h = kwargs.get('h', 1e-8)
+    _, g = _get_gradient(model, x_EP, y_EP, t, h)
+    tau = np.array([-g[1], g[0]])
+
+    cuts = {}
+    for direction in (tau, -tau):
+        xy, D = trace_level_line(model, x_EP, y_EP, direction, **kwargs)
+        # the sign of Re D does not change between EPs
+        sign = np.sign(np.median(D[1:].real)) if len(D) > 1 else 0.
+        cuts['re' if sign < 0 else 'im'] = xy
+
+    return cuts.get('re'), cuts.get('im')
+
+
+if __name__ == '__main__':
+    pass
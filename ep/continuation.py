@@ -0,0 +1,182 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.locate import get_discriminant, locate_EP
+
+
+def get_path_parameters(path, s):
+    """Return the model parameters at the position s of a linear parameter
+    path.
+
+        Parameters:
+        -----------
+            path: dict
+                Parameter name -> (start, end), e.g., {'theta': (0., 1.)}.
+            s: float or ndarray
+                Position on the path, s = 0 (start),...,1 (end).
+
+        Returns:
+        --------
+            params: dict
+                Parameter name -> value(s).
+    """
+
+    return dict((k, a + s*(b - a)) for k, (a, b) in path.items())
+
+
+def continue_EP(model_class, path, x0=None, y0=None, t=0.0, ds=1e-2,
+                ds_min=1e-7, ds_max=5e-2, h=1e-7, tol=1e-12, maxiter=8,
+                maxsteps=2000, **model_kwargs):
+    """Trace an exceptional point (x_EP, y_EP) along a path of model
+    parameters by pseudo-arclength continuation.
+
+    The EP curve is the solution set of (Re D, Im D) = 0 in (x, y, s), with
+    the discriminant D (see ep.locate.get_discriminant) and the position s
+    on the parameter path. In each step, the curve is extrapolated along the
+    null vector of the 2x3 Jacobian of (Re D, Im D) (predictor) and
+    projected back onto the curve by Newton's method perpendicular to it
+    (corrector). The step size is increased after fast and decreased after
+    slow or failed corrections.
+
+    Since the curve is parametrized by its arclength sigma, it can be
+    followed through turning points at which ds/dsigma changes sign, i.e.,
+    where two EPs of the model annihilate (or are created) as s increases;
+    the continuation then proceeds along the partner EP.
+
+        Parameters:
+        -----------
+            model_class: Base subclass
+                Model exposing H(t, x, y), e.g., DirichletReduced.
+            path: dict
+                Parameter name -> (start, end) of the swept model parameters,
+                e.g., {'theta': (0., 1.)} or {'eta': (0.5, 1.), 'eta0': (0.5,
+                1.)}.
+            x0, y0: float, optional
+                Seed of the EP at the start of the path (defaults to the
+                model attributes x_EP, y_EP).
+            t: float
+                Time at which to evaluate the Hamiltonian.
+            ds, ds_min, ds_max: float
+                Initial, minimum and maximum arclength step.
+            h: float
+                Step of the finite differences.
+            tol: float
+                Relative tolerance of the corrector.
+            maxiter: int
+                Maximum number of corrector iterations per step.
+            maxsteps: int
+                Maximum number of continuation steps.
+            model_kwargs:
+                Fixed model parameters.
+
+        Returns:
+        --------
+            s, x, y: (K,) ndarray
+                Path positions and EP coordinates along the curve.
+            turning_points: list of int
+                Indices of the curve after which ds/dsigma changes sign.
+            status: str
+                'end' (s = 1 reached), 'start' (the curve returned to s = 0)
+                or 'failed' (the corrector did not converge at ds_min).
+    """
+
+    def get_model(s):
+        kwargs = dict(model_kwargs)
+        kwargs.update(get_path_parameters(path, s))
+        return model_class(**kwargs)
+
+    def get_F(z):
+        D = get_discriminant(get_model(z[2]), z[0], z[1], t)
+        return np.array([D.real, D.imag])
+
+    def get_J(z):
+        model = get_model(z[2])
+        D = get_discriminant(model, z[0] + np.array([h, -h, 0, 0]),
+                             z[1] + np.array([0, 0, h, -h]), t)
+        D_s = (get_discriminant(get_model(z[2] + h), z[0], z[1], t) -
+               get_discriminant(get_model(z[2] - h), z[0], z[1], t))
+        J = np.array([D[0] - D[1], D[2] - D[3], D_s])/(2.*h)
+        return np.array([J.real, J.imag])
+
+    def is_converged(dz, z):
+        return np.linalg.norm(dz) <= tol*(1. + np.linalg.norm(z))
+
+    def get_tangent(J, previous):
+        tau = np.cross(J[0], J[1])
+        tau /= np.linalg.norm(tau)
+        if np.dot(tau, previous) < 0:
+            tau = -tau
+        return tau
+
+    x0, y0 = locate_EP(get_model(0.), x0, y0, t=t, h=h)
+    if np.isnan(x0):
+        raise Exception("Error: no EP found at the start of the path!")
+
+    z = np.array([x0, y0, 0.])
+    curve = [z]
+    turning_points = []
+    tau = get_tangent(get_J(z), np.array([0., 0., 1.]))
+    status = 'failed'
+
+    for n in range(maxsteps):
+        # predictor-corrector step with step size control
+        while True:
+            z_pred = z + ds*tau
+            z_new = z_pred.copy()
+            dz = np.full(3, np.inf)
+            for k in range(maxiter):
+                A = np.vstack((get_J(z_new), tau))
+                b = np.append(get_F(z_new), np.dot(tau, z_new - z_pred))
+                try:
+                    dz = -np.linalg.solve(A, b)
+                except np.linalg.LinAlgError:
+                    break
+                z_new = z_new + dz
+                if is_converged(dz, z_new):
+                    break
+            if np.isfinite(z_new).all() and is_converged(dz, z_new):
+                break
+            ds *= 0.5
+            if ds < ds_min:
+                return _finish(curve, turning_points, 'failed')
+
+        if k <= 2:
+            ds = min(1.5*ds, ds_max)
+        elif k >= 5:
+            ds *= 0.7
+
+        tau_new = get_tangent(get_J(z_new), tau)
+        if tau_new[2]*tau[2] < 0:
+            turning_points.append(len(curve) - 1)
+        z, tau = z_new, tau_new
+
+        # end of the path: solve for the EP at s = 0 or 1 exactly
+        if not 0. <= z[2] <= 1.:
+            s_end = 1. if z[2] > 1. else 0.
+            model = get_model(s_end)
+            z_prev = curve[-1]
+            f = (s_end - z_prev[2])/(z[2] - z_prev[2])
+            x_end, y_end = locate_EP(model, *(z_prev + f*(z - z_prev))[:2],
+                                     t=t, h=h)
+            if not np.isnan(x_end):
+                curve.append(np.array([x_end, y_end, s_end]))
+            status = 'end' if s_end == 1. else 'start'
+            break
+
+        curve.append(z)
+
+    return _finish(curve, turning_points, status)
+
+
+def _finish(curve, turning_points, status):
+    """Return the continuation results as arrays."""
+
+    x, y, s = np.asarray(curve).T
+
+    return s, x, y, turning_points, status
+
+
+if __name__ == '__main__':
+    pass
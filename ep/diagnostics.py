@@ -0,0 +1,195 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.helpers import c_eig
+
+
+def get_phase_rigidity(eVecs_l, eVecs_r):
+    """Return the phase rigidity
+
+        r_n = |<l_n|r_n>|/(||l_n|| ||r_n||)
+
+    of the eigenstates n, which is 1 for orthogonal eigenvectors and
+    vanishes at an EP.
+
+        Parameters:
+        -----------
+            eVecs_l, eVecs_r: (...,M,M) ndarray
+                Left and right eigenvectors as returned by c_eig, i.e., the
+                eigenvector n is eVecs[..., :, n].
+
+        Returns:
+        --------
+            r: (...,M) ndarray
+    """
+
+    overlap = np.abs(np.einsum('...in,...in->...n', eVecs_l, eVecs_r))
+    norm_l = np.linalg.norm(eVecs_l, axis=-2)
+    norm_r = np.linalg.norm(eVecs_r, axis=-2)
+
+    return overlap/(norm_l*norm_r)
+
+
+def get_petermann_factor(eVecs_l, eVecs_r):
+    """Return the Petermann factors K_n = 1/r_n^2 of the eigenstates n, with
+    the phase rigidity r_n (see get_phase_rigidity), which diverge at an EP.
+
+        Parameters:
+        -----------
+            eVecs_l, eVecs_r: (...,M,M) ndarray
+
+        Returns:
+        --------
+            K: (...,M) ndarray
+    """
+
+    return 1./get_phase_rigidity(eVecs_l, eVecs_r)**2
+
+
+def get_eigenvalue_derivatives(eVecs_l, eVecs_r, dH):
+    """Return the Hellmann-Feynman derivatives of the eigenvalues,
+
+        dE_n = <l_n|dH|r_n>/<l_n|r_n>,
+
+    for the derivative dH of the Hamiltonian with respect to a parameter.
+
+        Parameters:
+        -----------
+            eVecs_l, eVecs_r: (...,M,M) ndarray
+            dH: (...,M,M) ndarray
+                Derivative of the Hamiltonian, e.g., from Base.dH.
+
+        Returns:
+        --------
+            dE: (...,M) ndarray
+    """
+
+    return (np.einsum('...in,...ij,...jn->...n', eVecs_l, dH, eVecs_r) /
+            np.einsum('...in,...in->...n', eVecs_l, eVecs_r))
+
+
+def get_coupling_matrix(eVals, eVecs_l, eVecs_r, dH):
+    """Return the non-adiabatic coupling matrix
+
+        C_mn = <l_m|d r_n> = <l_m|dH|r_n>/((E_n - E_m) <l_m|r_m>),  m != n,
+
+    for the derivative dH of the Hamiltonian with respect to a parameter
+    (or the time); the diagonal is set to zero.
+
+        Parameters:
+        -----------
+            eVals: (...,M) ndarray
+            eVecs_l, eVecs_r: (...,M,M) ndarray
+            dH: (...,M,M) ndarray
+
+        Returns:
+        --------
+            C: (...,M,M) ndarray
+    """
+
+    M = eVals.shape[-1]
+    dH_lr = np.einsum('...im,...ij,...jn->...mn', eVecs_l, dH, eVecs_r)
+    norm = np.einsum('...im,...im->...m', eVecs_l, eVecs_r)
+    dE = eVals[..., None, :] - eVals[..., :, None]
+    dE[..., np.arange(M), np.arange(M)] = 1.
+
+    C = dH_lr/(dE*norm[..., :, None])
+    C[..., np.arange(M), np.arange(M)] = 0.
+
+    return C
+
+
+def sample_diagnostics(model, x, y, t=0.0):
+    """Return the eigenvalues, phase rigidities, Petermann factors and the
+    eigenvalue derivatives with respect to (x, y) at the parameters (x, y).
+
+    The eigensystems of all parameters are obtained in a single batched
+    call of c_eig, and the derivatives follow from the parameter
+    derivatives of the Hamiltonian (see Base.dH). The eigenstates are
+    sorted by decreasing real part of the eigenvalues (see
+    ep.sampling.get_eigenvalues).
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y) and dH(t, x, y).
+            x, y: float or ndarray
+                Parameters (x, y) of broadcastable shapes, e.g., meshgrids.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+
+        Returns:
+        --------
+            E: (...,M) ndarray
+                Eigenvalues.
+            r: (...,M) ndarray
+                Phase rigidities.
+            K: (...,M) ndarray
+                Petermann factors.
+            dE_x, dE_y: (...,M) ndarray
+                Derivatives of the eigenvalues with respect to x and y.
+    """
+
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(y, dtype=float))
+    t = np.full(x.shape, t)
+
+    E, eVecs_l, eVecs_r = c_eig(model.H_stack(t, x, y), left=True)
+    order = np.argsort(-E.real, axis=-1, kind='mergesort')
+    E = np.take_along_axis(E, order, axis=-1)
+    eVecs_l, eVecs_r = [np.take_along_axis(v, order[..., None, :], axis=-1)
+                        for v in eVecs_l, eVecs_r]
+
+    H_x, H_y = model.dH(t, x, y)
+    r = get_phase_rigidity(eVecs_l, eVecs_r)
+    dE_x, dE_y = [get_eigenvalue_derivatives(eVecs_l, eVecs_r, dH)
+                  for dH in H_x, H_y]
+
+    return E, r, 1./r**2, dE_x, dE_y
+
+
+def get_trajectory_diagnostics(model):
+    """Return the phase rigidities, Petermann factors and non-adiabatic
+    couplings of the instantaneous eigenstates along the trajectory
+    (x(t), y(t)), t = model.t.
+
+    The time derivative of the Hamiltonian is obtained from the chain rule,
+    dH/dt = dH/dx x'(t) + dH/dy y'(t), with the parameter derivatives of
+    Base.dH and the velocities of get_cycle_parameters; an additional
+    explicit time dependence of H (e.g., for tqd) is not included.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+
+        Returns:
+        --------
+            r: (N,M) ndarray
+                Phase rigidities.
+            K: (N,M) ndarray
+                Petermann factors.
+            C: (N,M,M) ndarray
+                Non-adiabatic couplings C_mn = <l_m|d/dt r_n> (see
+                get_coupling_matrix) of the continuous branches of
+                calc_c_eigensystem.
+    """
+
+    t = model.t
+    eVals, eVecs_l, eVecs_r = model.calc_c_eigensystem()
+
+    x, y = [np.asarray(u, dtype=float)
+            for u in model.get_cycle_parameters(t)]
+    x_dot, y_dot = [np.gradient(u, t) for u in x, y]
+    H_x, H_y = model.dH(t, x, y)
+    H_t = H_x*x_dot[:, None, None] + H_y*y_dot[:, None, None]
+
+    r = get_phase_rigidity(eVecs_l, eVecs_r)
+    C = get_coupling_matrix(eVals, eVecs_l, eVecs_r, H_t)
+
+    return r, 1./r**2, C
+
+
+if __name__ == '__main__':
+    pass
@@ -3,10 +3,11 @@
 from __future__ import division
 import numpy as np
 from numpy import pi
-from scipy.integrate import dblquad
 from scipy.interpolate import RectBivariateSpline
 from scipy.special import erf, erfc
 
+from ep import jit
+
 
 class Gamma(object):
     """Position dependent loss class."""
@@ -27,44 +28,113 @@ class Gamma(object):
 
 
 class Gamma_From_Grid(Gamma):
-    """Position dependent loss class which reads a .npz mesh."""
+    """Position dependent loss class which reads a .npz mesh.
+
+    The loss matrix elements
 
-    def __init__(self, x0, potential_file=None, **gamma_kwargs):
+        Gamma_nm(x0) = 1/(pi*W)*kF*kr/sqrt(k(n)*k(m)) *
+                       int_x0^(x0 + 2pi/kr) dx int_0^W dy P(x,y) *
+                       exp(i*(k(n) - k(m))*x) * sin(n*pi/W*y)*sin(m*pi/W*y)
+
+    are integrated directly on the mesh of the potential with the
+    trapezoidal rule: the y integrals are evaluated for all x in one matrix
+    product and the x integrals of all unit cells are differences of a
+    single cumulative integral.
+    """
+
+    def __init__(self, x0, potential_file=None, modes=(1, 2), **gamma_kwargs):
         Gamma.__init__(self, **gamma_kwargs)
         self.potential_file = potential_file
         self.x0 = x0
+        self.modes = modes
         (self.x, self.y, self.X,
          self.Y, self.P, self.P_interpolate) = self._load_potential()
 
     def _load_potential(self):
         P_npz = np.load(self.potential_file)
-        X, Y, P = [P_npz[s].T for s in 'X', 'Y', 'P']
+        X, Y = [P_npz[s].T for s in 'X', 'Y']
         x, y = [np.unique(i) for i in X, Y]
 
+        P = P_npz['P']
+        if P.ndim == 1:
+            # potential vector of ep.potential.write_potential, i.e., the
+            # (y,x) mesh flattened in Fortran order
+            P = P.reshape((len(y), len(x)), order='F')
+        P = P.T
+
         # greens_code counts from top
-        P = np.flipud(P)
+        P = P[:, ::-1]
+
+        return x, y, X, Y, P, RectBivariateSpline(x, y, P)
 
-        return x, y, X, Y, P, RectBivariateSpline(y, x)
+    def _get_cell_integrals(self, n, m, x0):
+        """Return the matrix elements for broadcastable mode indices n, m and
+        unit cells starting at x0, shape x0.shape + np.broadcast(n, m).shape.
+        """
+
+        k = self.k
+        W = self.W
+        x, y = self.x, self.y
+        n, m = np.broadcast_arrays(np.asarray(n), np.asarray(m))
+
+        # y integration for all x with trapezoidal weights wy, (nx,...)
+        # where ... is the shape of the mode indices
+        shape = (-1,) + (1,)*n.ndim
+        wy = np.empty_like(y)
+        wy[1:-1] = 0.5*(y[2:] - y[:-2])
+        wy[0], wy[-1] = 0.5*(y[1] - y[0]), 0.5*(y[-1] - y[-2])
+        Y = y.reshape(shape)
+        sin_nm = np.sin(n*pi/W*Y)*np.sin(m*pi/W*Y)
+        Fy = np.tensordot(self.P, wy.reshape(shape)*sin_nm, axes=(1, 0))
+
+        # cumulative x integration
+        f = np.exp(1j*(k(n) - k(m))*x.reshape(shape)) * Fy
+        F = np.zeros_like(f)
+        F[1:] = np.cumsum(0.5*(f[1:] + f[:-1])*np.diff(x).reshape(shape),
+                          axis=0)
+
+        # integrals over the unit cells [x0, x0 + 2pi/kr], where the
+        # potential vanishes outside of the mesh
+        def F_at(xi):
+            xi = np.clip(xi, x[0], x[-1])
+            idx = np.clip(np.searchsorted(x, xi) - 1, 0, len(x) - 2)
+            s = (xi - x[idx])/(x[idx+1] - x[idx])
+            s = s.reshape(s.shape + (1,)*n.ndim)
+            return (1. - s)*F[idx] + s*F[idx+1]
+
+        x0 = np.asarray(x0, dtype=float)
+        integral = F_at(x0 + 2.*np.pi/self.kr) - F_at(x0)
+
+        prefactor = 1./(np.pi*W) * self.kF * self.kr
+        prefactor /= np.sqrt(k(n)*k(m))
+
+        return prefactor*integral
 
     def get_matrix_element(self, n, m):
+        """Return the matrix element Gamma_nm of the unit cell starting at
+        self.x0."""
+        return self._get_cell_integrals(n, m, self.x0)
 
-        def coeff(x, y):
-            coeff_x = np.exp(1j*(self.k(n)-self.k(m))*x)
-            coeff_y = np.sin(n*np.pi/self.W*y)*np.sin(m*np.pi/self.W*y)
-            heaviside = 0.5*(np.sign(self.x[-1] - x) + 1.)
-            return coeff_x*coeff_y*heaviside
+    def get_matrix(self, x0=None):
+        """Return the loss matrices of the unit cells [x0, x0 + 2pi/kr].
 
-        integral = dblquad(lambda x, y: self.P_interpolate(y, x)*coeff(x, y),
-                           self.x0, self.x0 + 2.*np.pi/self.kr,
-                           lambda x: 0, lambda x: self.W)
+            Parameters:
+            -----------
+                x0: float or ndarray, optional
+                    Start of the unit cells. If None, all unit cells of the
+                    mesh are evaluated.
 
-        prefactor = 1./(np.pi*self.W) * self.kF * self.kr
-        prefactor /= np.sqrt(self.k(n)*self.k(m))
+            Returns:
+            --------
+                Gamma: (...,M,M) ndarray with M = len(self.modes)
+        """
+        if x0 is None:
+            x0 = np.arange(self.x[0], self.x[-1], 2.*np.pi/self.kr)
 
-        return prefactor*integral
+        n = np.asarray(self.modes)[:, None]
+        m = np.asarray(self.modes)[None, :]
 
-    def get_matrix(self):
-        pass
+        return self._get_cell_integrals(n, m, x0)
 
 
 class Gamma_Gauss(Gamma):
@@ -75,7 +145,20 @@ class Gamma_Gauss(Gamma):
     """
 
     def __init__(self, sigmax=1.e-2, sigmay=1.e-2, integrate_R2=True,
-                 test_integrals=False, **gamma_kwargs):
+                 test_integrals=False, modes=(1, 2), **gamma_kwargs):
+        """Parameters:
+           -----------
+                sigmax, sigmay: float
+                    Widths of the Gaussian loss profiles.
+                integrate_R2: bool
+                    Whether to integrate the profiles over R^2 instead of
+                    the unit cell.
+                test_integrals: bool
+                    Whether to compare the integrals with alternative
+                    expressions.
+                modes: sequence of int
+                    Open transverse modes n of the loss matrix Gamma_nm.
+        """
         Gamma.__init__(self, **gamma_kwargs)
         self.sigmax = sigmax
         self.sigmay = sigmay
@@ -83,6 +166,33 @@ class Gamma_Gauss(Gamma):
         self.test_integrals = test_integrals
         self.integrate_R2 = integrate_R2
 
+        self.modes = modes
+        self._get_mode_tables()
+
+    def _get_mode_tables(self):
+        """Precompute the mode pair dependent coefficients of the loss
+        matrix."""
+
+        k = self.k
+        W = self.W
+
+        n = np.asarray(self.modes)[:, None]
+        m = np.asarray(self.modes)[None, :]
+        with np.errstate(invalid='ignore'):
+            kn, km = [np.asarray(k(u), dtype=float) for u in (n, m)]
+        if not np.all(kn > 0):
+            raise Exception(("Error: modes {0} are not "
+                             "all open!").format(self.modes))
+
+        self.n, self.m = n, m
+        self.dk = kn - km
+        self.prefactor = 1./(np.pi*W) * self.kF * self.kr / np.sqrt(kn*km)
+
+        # Gaussian factors of the integrals over R^2
+        self.gx = np.exp(-0.5*self.dk**2*self.sigmax**2)
+        self.gy_minus = np.exp(-0.5*((n - m)*pi/W)**2*self.sigmay**2)
+        self.gy_plus = np.exp(-0.5*((n + m)*pi/W)**2*self.sigmay**2)
+
     def get_matrix_element(self, n, m, x0=0, y0=0):
         k = self.k
         kF = self.kF
@@ -93,7 +203,19 @@ class Gamma_Gauss(Gamma):
         sigmax = self.sigmax
         sigmay = self.sigmay
 
-        if self.integrate_R2:
+        # the compiled kernel evaluates a single mode pair (n, m)
+        if (self.integrate_R2 and jit.HAS_JIT and
+                np.ndim(n) == 0 and np.ndim(m) == 0):
+            x0, y0 = np.broadcast_arrays(*[np.asarray(u).real
+                                           for u in (x0, y0)])
+            shape = x0.shape
+            x0, y0 = [np.ascontiguousarray(u, dtype=float).ravel()
+                      for u in (x0, y0)]
+            IxIy = np.empty(x0.shape, dtype=complex)
+            jit.gamma_gauss_kernel(k(n), k(m), n, m, x0, y0, sigmax, sigmay,
+                                   W, IxIy)
+            Ix, Iy = 1., IxIy[0] if not shape else IxIy.reshape(shape)
+        elif self.integrate_R2:
             Ix = np.exp(1)**((1/2)*(k(m)+(-1)*k(n))*((1j*2)*x0+sigmax**2*((-1)*k(m)+k(n))))
             Iy = (1/4)*np.exp(1)**((-1/2)*W**(-2)*(m+n)*np.pi*((m+n) \
                 *np.pi*sigmay**2+(1j*2)*W*y0))*((-1)+(-1)*np.exp(1)**((1j*2)*W**( \
@@ -106,9 +228,10 @@ class Gamma_Gauss(Gamma):
             argx1 = (T0 - x0 + 1j*(k(n)-k(m))*sigmax**2)
             argx2 = (   - x0 + 1j*(k(n)-k(m))*sigmax**2)
 
-            # TODO: why do we need a complex() cast here?
+            # cast to complex such that erf is evaluated in the complex plane
             argx = [argx1, argx2]
-            argx1, argx2 = [ complex(a)/(np.sqrt(2.)*sigmax) for a in argx ]
+            argx1, argx2 = [np.asarray(a, dtype=complex)/(np.sqrt(2.)*sigmax)
+                            for a in argx]
 
             Ix = np.exp(expargx) * np.sqrt(np.pi/2.) * sigmax *  (erf(argx1) - erf(argx2))
 
@@ -136,7 +259,9 @@ class Gamma_Gauss(Gamma):
 
             argy = [argy1, argy2, argy3, argy4, argy5, argy6, argy7, argy8]
             (argy1, argy2, argy3, argy4,
-             argy5, argy6, argy7, argy8) = [ complex(a)/(np.sqrt(2.)*sigmay) for a in argy ]
+             argy5, argy6, argy7, argy8) = [np.asarray(a, dtype=complex) /
+                                            (np.sqrt(2.)*sigmay)
+                                            for a in argy]
 
             Iy = 0.25*np.exp(expargy0) * np.sqrt(np.pi/2.) * sigmay * (-2. +
                     np.exp(expargy1) * (erf(argy1) + erf(argy2)) +
@@ -177,9 +302,35 @@ class Gamma_Gauss(Gamma):
         return Gamma
 
     def get_matrix(self, x0, y0):
-        Gamma = [self.get_matrix_element(n, m, x0=x0, y0=y0) for n in (1, 2)
-                                                              for m in (1, 2)]
-        return np.asarray(Gamma).reshape(2,-1)
+        """Return the loss matrix Gamma_nm (n, m in self.modes) of Gaussian
+        loss profiles at the positions (x0, y0).
+
+            Parameters:
+            -----------
+                x0, y0: float or ndarray
+                    Positions of the Gaussian loss profiles.
+
+            Returns:
+            --------
+                Gamma: (M,M) ndarray or (...,M,M) ndarray for array
+                    arguments, with M = len(self.modes)
+        """
+        x0, y0 = [np.asarray(u)[..., None, None]
+                  for u in np.broadcast_arrays(x0, y0)]
+
+        if self.integrate_R2 and not self.test_integrals:
+            # closed form of get_matrix_element for integrate_R2=True
+            a = pi/self.W
+            n, m = self.n, self.m
+            Ix = self.gx * np.exp(-1j*self.dk*x0)
+            Iy = 0.5*(self.gy_minus*np.cos((n - m)*a*y0) -
+                      self.gy_plus*np.cos((n + m)*a*y0))
+            Gamma = self.prefactor * Ix * Iy
+        else:
+            Gamma = self.get_matrix_element(self.n, self.m, x0=x0, y0=y0)
+            Gamma = np.broadcast_to(Gamma, x0.shape[:-2] + self.dk.shape)
+
+        return np.asarray(Gamma, dtype=complex)
 
 
 
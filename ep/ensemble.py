@@ -0,0 +1,284 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.base import _get_init_state_vector
+from ep.helpers import c_eig
+from ep.integrators import get_magnus4_propagators
+from ep.segments import multiply_propagators
+
+
+def get_correlated_noise(t, n_members, correlation_length, seed=None):
+    """Return realizations of stationary Gaussian noise with unit variance
+    and the correlation function exp(-(t - t')^2/(2*correlation_length^2))
+    on the equidistant grid t.
+
+    White noise is convolved with a Gaussian kernel via FFTs, where the
+    grid is padded to avoid periodic correlations.
+
+        Parameters:
+        -----------
+            t: (N,) ndarray
+                Equidistant grid.
+            n_members: int
+                Number of realizations.
+            correlation_length: float
+                Correlation length; for 0 the noise is white.
+            seed: int, optional
+                Seed of the random number generator.
+
+        Returns:
+        --------
+            xi: (n_members,N) ndarray
+    """
+
+    rng = np.random.RandomState(seed)
+    N = len(t)
+
+    if correlation_length <= 0:
+        return rng.standard_normal((n_members, N))
+
+    h = t[1] - t[0]
+    width = int(np.ceil(4.*correlation_length/h))
+    # padded length with small prime factors for the FFTs
+    n_fft = 2**int(np.ceil(np.log2(N + 2*width)))
+
+    w = rng.standard_normal((n_members, n_fft))
+    k = np.exp(-(np.arange(-width, width + 1)*h/correlation_length)**2)
+    k /= np.sqrt(np.sum(k**2))
+    kernel = np.zeros(n_fft)
+    kernel[:width + 1] = k[width:]
+    kernel[-width:] = k[:width]
+
+    xi = np.fft.irfft(np.fft.rfft(w, axis=-1)*np.fft.rfft(kernel), n_fft,
+                      axis=-1)
+
+    return xi[:, :N]
+
+
+def _interpolate(t_grid, xi, t):
+    """Linearly interpolate the realizations xi (n_members,N) on the
+    equidistant grid t_grid at the times t."""
+
+    h = t_grid[1] - t_grid[0]
+    s = np.clip((t - t_grid[0])/h, 0, len(t_grid) - 1)
+    n = np.minimum(s.astype(int), len(t_grid) - 2)
+    w = s - n
+
+    return xi[:, n]*(1. - w) + xi[:, n + 1]*w
+
+
+def solve_ensemble(model, n_members=500, sigma_x=0.0, sigma_y=0.0,
+                   sigma_amplitude=0.0, correlation_length=None, seed=None,
+                   nsub=1, chunk_size=256, noise=None):
+    """Propagate an ensemble of noisy realizations of the cycle parameters
+    and return the projections onto the final eigenstates.
+
+    Each member evolves in the Hamiltonian H(t, x_k(t), y_k(t)) with
+
+        x_k(t) = x(t)*(1 + sigma_amplitude*xi_a(t)) + sigma_x*xi_x(t),
+        y_k(t) = y(t) + sigma_y*xi_y(t),
+
+    where (x(t), y(t)) is the path of the model (e.g., (eps, delta) of the
+    waveguide boundary, whose amplitude eps is subject to the jitter xi_a)
+    and xi are correlated noise realizations (see get_correlated_noise).
+
+    All members are propagated simultaneously with fourth-order Magnus
+    steps on the time grid of the model (see
+    ep.integrators.get_magnus4_propagators): the Hamiltonians of all members
+    are evaluated in one call of H_stack per chunk of time steps, and the
+    step propagators are multiplied pairwise (see
+    ep.segments.multiply_propagators). The initial state is the state
+    init_state of the noise-free model, and the final state is projected
+    onto the left eigenvectors of the noisy Hamiltonian at t = T, which are
+    assigned to the noise-free branches by their eigenvalues.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model with a vectorized Hamiltonian H(t, x, y).
+            n_members: int
+                Number of realizations.
+            sigma_x, sigma_y: float
+                Standard deviations of the additive noise of x and y.
+            sigma_amplitude: float
+                Standard deviation of the relative noise of x.
+            correlation_length: float, optional
+                Correlation length of the noise (defaults to T/20).
+            seed: int, optional
+                Seed of the random number generator.
+            nsub: int
+                Number of Magnus substeps per time step.
+            chunk_size: int
+                Number of time steps evaluated at once.
+            noise: (3,n_members,N) ndarray, optional
+                Noise realizations (xi_x, xi_y, xi_a) on an equidistant grid
+                of [0, T] which replace the generated ones.
+
+        Returns:
+        --------
+            phi_a, phi_b: (n_members,) ndarray
+                Overlaps <phi_a|psi(T)> and <phi_b|psi(T)>.
+            R: (n_members,) ndarray
+                Flip errors |phi_a/phi_b| (see SolveResult.flip_error).
+    """
+
+    t = model.t
+    T = t[-1]
+
+    if noise is None:
+        noise = _get_noise(t, n_members, correlation_length, nsub, seed)
+    noise = np.asarray(noise)
+    n_members = noise.shape[1]
+    t_noise = np.linspace(0, T, noise.shape[-1])
+
+    def get_parameters(tq):
+        x, y = [np.asarray(u, dtype=float)
+                for u in model.get_cycle_parameters(tq)]
+        xi_x, xi_y, xi_a = [_interpolate(t_noise, xi, tq) for xi in noise]
+        return (x*(1. + sigma_amplitude*xi_a) + sigma_x*xi_x,
+                y + sigma_y*xi_y)
+
+    def H_stack(tq):
+        # time axis first, shape (len(tq),n_members,M,M)
+        x, y = get_parameters(tq)
+        return model.H_stack(tq[:, None], x.T, y.T)
+
+    # initial state of the noise-free model
+    eVals, eVecs_l, eVecs_r = model.sort_c_eigensystem(
+        *model.calc_c_eigensystem())
+    psi = np.asarray(_get_init_state_vector(eVecs_r, model.init_state),
+                     dtype=complex)
+    psi = np.tile(psi, (n_members, 1))
+
+    for n in range(0, len(t) - 1, chunk_size):
+        t_chunk = t[n:n + chunk_size + 1]
+        U = multiply_propagators(get_magnus4_propagators(H_stack, t_chunk,
+                                                         nsub=nsub))
+        psi = np.einsum('...ij,...j->...i', U, psi)
+
+    # final eigenbasis, assigned to the noise-free branches
+    E_T, eVecs_l_T, _ = c_eig(H_stack(np.array([T]))[0], left=True)
+    order = _assign_branches(E_T, eVals[-1])
+    E_T = np.take_along_axis(E_T, order, axis=-1)
+    eVecs_l_T = np.take_along_axis(eVecs_l_T, order[:, None, :], axis=-1)
+
+    projection = np.einsum('...in,...i->...n', eVecs_l_T, psi)
+    phi_a, phi_b = projection[:, 0], projection[:, 1]
+
+    return phi_a, phi_b, np.abs(phi_a/phi_b)
+
+
+def _get_noise(t, n_members, correlation_length, nsub, seed):
+    """Return the noise realizations (xi_x, xi_y, xi_a) with shape
+    (3,n_members,N) on an equidistant grid of [0, T] which resolves both
+    the time steps and the correlation length (defaults to T/20)."""
+
+    T = t[-1]
+    if correlation_length is None:
+        correlation_length = 0.05*T
+
+    h = (t[1] - t[0])/nsub
+    if correlation_length > 0:
+        h = min(h, 0.25*correlation_length)
+    t_noise = np.linspace(0, T, int(np.ceil(T/h)) + 1)
+
+    seeds = [None]*3 if seed is None else [seed, seed + 1, seed + 2]
+
+    return np.stack([get_correlated_noise(t_noise, n_members,
+                                          correlation_length, seed=s)
+                     for s in seeds])
+
+
+def _assign_branches(E, E0):
+    """Return the permutations of the eigenvalues E (n_members,M) which
+    are closest to the reference eigenvalues E0 (M,)."""
+
+    M = E.shape[-1]
+    if M == 2:
+        swap = (np.abs(E[:, 0] - E0[1]) + np.abs(E[:, 1] - E0[0]) <
+                np.abs(E[:, 0] - E0[0]) + np.abs(E[:, 1] - E0[1]))
+        order = np.where(swap[:, None], [1, 0], [0, 1])
+    else:
+        order = np.abs(E[:, None, :] - E0[None, :, None]).argmin(axis=-1)
+
+    return order
+
+
+def get_ensemble_statistics(values, q=(0.05, 0.5, 0.95)):
+    """Return the mean and the quantiles of an ensemble quantity, e.g., of
+    the flip errors returned by solve_ensemble.
+
+        Parameters:
+        -----------
+            values: (n_members,) ndarray
+            q: tuple of float
+                Quantiles.
+
+        Returns:
+        --------
+            mean: float
+            quantiles: (len(q),) ndarray
+    """
+
+    values = np.asarray(values)
+
+    return values.mean(), np.percentile(values, 100.*np.asarray(q))
+
+
+def get_ensemble_diodicity(model_class, n_members=500, seed=None,
+                           q=(0.05, 0.5, 0.95), sigma_x=0.0, sigma_y=0.0,
+                           sigma_amplitude=0.0, correlation_length=None,
+                           nsub=1, **model_kwargs):
+    """Return the flip errors and diodicities of an ensemble of noisy
+    devices which are traversed in both loop directions (see
+    ep.result.get_diodicity).
+
+    The noise represents fabrication imperfections of the device, i.e.,
+    the realization xi(t) of the loop direction '-' is traversed backwards,
+    xi(T - t), in the loop direction '+'.
+
+        Parameters:
+        -----------
+            model_class: Base subclass
+                Model with a vectorized Hamiltonian, e.g., Dirichlet.
+            n_members: int
+                Number of realizations.
+            seed: int, optional
+                Seed of the random number generator.
+            q: tuple of float
+                Quantiles of the statistics.
+            sigma_x, sigma_y, sigma_amplitude, correlation_length, nsub:
+                Noise and integration parameters (see solve_ensemble).
+            model_kwargs:
+                Model parameters (except loop_direction).
+
+        Returns:
+        --------
+            R0, R1, D: (n_members,) ndarray
+                Flip errors of the loop directions '-' and '+' and the
+                diodicities R0/R1.
+            statistics: dict
+                'R0', 'R1', 'D' -> (mean, quantiles) (see
+                get_ensemble_statistics).
+    """
+
+    models = [model_class(loop_direction=d, **model_kwargs) for d in '-+']
+    noise = _get_noise(models[0].t, n_members, correlation_length, nsub,
+                       seed)
+
+    kwargs = dict(sigma_x=sigma_x, sigma_y=sigma_y,
+                  sigma_amplitude=sigma_amplitude, nsub=nsub)
+    _, _, R0 = solve_ensemble(models[0], noise=noise, **kwargs)
+    _, _, R1 = solve_ensemble(models[1], noise=noise[..., ::-1], **kwargs)
+    D = R0/R1
+
+    statistics = dict((name, get_ensemble_statistics(v, q))
+                      for name, v in (('R0', R0), ('R1', R1), ('D', D)))
+
+    return R0, R1, D, statistics
+
+
+if __name__ == '__main__':
+    pass
@@ -5,6 +5,8 @@ from numpy import pi
 from scipy.linalg import eig
 from scipy.integrate import trapz, cumtrapz
 
+from ep import jit
+
 
 class FileOperations():
     """Simple  class to handle the output of class parameters to stdout and
@@ -45,18 +47,23 @@ def c_eig(H, left=False, **kwargs):
 
         Parameters:
         -----------
-            H:  (2,2) ndarray
-                Hamiltonian matrix
+            H:  (M,M) or (...,M,M) ndarray
+                Hamiltonian matrix or stack of Hamiltonian matrices
             left: bool (default: False)
                 Whether to calculate left eigenvectors as well
 
         Returns:
         --------
-          eigenvalues:  (2,)   ndarray
-          left eigenvectors:  (2,2)  ndarray
-          right eigenvectors: (2,2)  ndarray
+          eigenvalues:  (...,M,)   ndarray
+          left eigenvectors:  (...,M,M)  ndarray
+          right eigenvectors: (...,M,M)  ndarray
     """
 
+    if np.ndim(H) > 2:
+        if np.shape(H)[-1] != 2:
+            return _c_eig_stack_general(H, left=left)
+        return _c_eig_stack(H, left=left)
+
     # get eigenvalues and eigenvalues of matrix H
     # multiple possibilities:
     # 1) from option left=True
@@ -84,7 +91,7 @@ def c_eig(H, left=False, **kwargs):
     def c_norm(vl, vr):
         return np.sqrt(vl.dot(vr))
 
-    for n in (0, 1):
+    for n in range(len(eVals)):
         # here one has freedom to have N = N_r * N_l, i.e., with
         # N_n = rho_n * exp(i*phi_n):
         #   rho = rho_r * rho_l and
@@ -109,6 +116,190 @@ def c_eig(H, left=False, **kwargs):
         return eVals, eVecs_r
 
 
+def _c_eig_stack(H, left=False):
+    """Vectorized version of c_eig for stacks of matrices H with shape
+    (...,2,2), using method 3) of c_eig, i.e., X_L = inv(X_R).T.
+
+    The eigensystem of the 2x2 matrices is evaluated in closed form,
+    E = m +- s with m = tr(H)/2 and s = sqrt(((H00 - H11)/2)**2 + H01*H10).
+    """
+
+    H = np.asarray(H, dtype=complex)
+
+    if jit.HAS_JIT:
+        shape = H.shape[:-2]
+        H = np.ascontiguousarray(H.reshape((-1, 2, 2)))
+        eVals = np.empty(H.shape[:-1], dtype=complex)
+        eVecs_l, eVecs_r = [np.empty_like(H) for n in (0, 1)]
+        jit.eig_kernel(H, eVals, eVecs_l, eVecs_r)
+        eVals = eVals.reshape(shape + (2,))
+        eVecs_l, eVecs_r = [e.reshape(shape + (2, 2))
+                            for e in (eVecs_l, eVecs_r)]
+        if left:
+            return eVals, eVecs_l, eVecs_r
+        else:
+            return eVals, eVecs_r
+
+    a, b = H[..., 0, 0], H[..., 0, 1]
+    c, d = H[..., 1, 0], H[..., 1, 1]
+
+    m = 0.5*(a + d)
+    s = np.sqrt((0.5*(a - d))**2 + b*c)
+    eVals = np.stack((m + s, m - s), axis=-1)
+
+    # (H - E)|v> = 0 is solved by (b, E - a) and (E - d, c); take the
+    # candidate with the larger norm to avoid cancellations
+    E = eVals
+    v1 = np.stack((np.broadcast_to(b[..., None], E.shape), E - a[..., None]),
+                  axis=-2)
+    v2 = np.stack((E - d[..., None], np.broadcast_to(c[..., None], E.shape)),
+                  axis=-2)
+    n1, n2 = [np.sqrt((abs(v)**2).sum(axis=-2, keepdims=True))
+              for v in (v1, v2)]
+    eVecs_r = np.where(n1 >= n2, v1/np.where(n1 > 0, n1, 1.),
+                       v2/np.where(n2 > 0, n2, 1.))
+
+    # diagonal matrices with a = d (e.g., H = 0) have no nonzero candidate
+    trivial = (n1 == 0) & (n2 == 0)
+    if trivial.any():
+        eye = np.broadcast_to(np.eye(2), eVecs_r.shape)
+        eVecs_r = np.where(trivial, eye, eVecs_r)
+
+    if not left:
+        return eVals, eVecs_r
+
+    # the columns of inv(X_R).T fulfill <psi_l|phi_r> = 1 with the Euclidian
+    # norm of the right eigenvectors left intact
+    r00, r01 = eVecs_r[..., 0, 0], eVecs_r[..., 0, 1]
+    r10, r11 = eVecs_r[..., 1, 0], eVecs_r[..., 1, 1]
+    det = r00*r11 - r01*r10
+    # exceptional point: the left eigenvectors diverge and are set to nan
+    # (as in ep.jit.eig_kernel)
+    singular = det == 0
+    det = np.where(singular, 1., det)
+    eVecs_l = np.empty_like(eVecs_r)
+    eVecs_l[..., 0, 0] = r11/det
+    eVecs_l[..., 1, 0] = -r01/det
+    eVecs_l[..., 0, 1] = -r10/det
+    eVecs_l[..., 1, 1] = r00/det
+    eVecs_l[singular] = np.nan
+
+    return eVals, eVecs_l, eVecs_r
+
+
+def _c_eig_stack_general(H, left=False):
+    """Vectorized version of c_eig for stacks of matrices H with shape
+    (...,M,M) and M > 2, using method 3) of c_eig, i.e., X_L = inv(X_R).T,
+    with the batched LAPACK routines of numpy.linalg."""
+
+    H = np.asarray(H, dtype=complex)
+
+    # numpy.linalg.eig returns right eigenvectors with unit Euclidian norm
+    eVals, eVecs_r = np.linalg.eig(H)
+
+    if not left:
+        return eVals, eVecs_r
+
+    eVecs_l = np.linalg.inv(eVecs_r).swapaxes(-1, -2)
+
+    return eVals, eVecs_l, eVecs_r
+
+
+def c_matrix(H11, H12, H21, H22):
+    """Assemble a complex 2x2 matrix from its elements.
+
+    The elements may be scalars or arrays of broadcastable shape, in which
+    case a stack of matrices is returned that can be fed into the vectorized
+    integrators and eigensolvers.
+
+        Parameters:
+        -----------
+            H11, H12, H21, H22: float, complex or ndarray
+                Matrix elements.
+
+        Returns:
+        --------
+            H: (...,2,2) ndarray
+    """
+
+    H11, H12, H21, H22 = np.broadcast_arrays(H11, H12, H21, H22)
+
+    H = np.empty(H11.shape + (2, 2), dtype=complex)
+    H[..., 0, 0] = H11
+    H[..., 0, 1] = H12
+    H[..., 1, 0] = H21
+    H[..., 1, 1] = H22
+
+    return H
+
+
+def c_expm(A):
+    """Return the matrix exponential exp(A) for a stack of complex MxM
+    matrices A.
+
+    For M = 2, the closed form
+
+        exp(A) = exp(m) * (cosh(s)*1 + sinh(s)/s * (A - m*1)),
+
+    with m = tr(A)/2 and s^2 = -det(A - m*1), is used, which stays finite at
+    exceptional points where A is not diagonalizable. For M > 2, see
+    _c_expm_taylor.
+
+        Parameters:
+        -----------
+            A: (...,M,M) ndarray
+
+        Returns:
+        --------
+            expA: (...,M,M) ndarray
+    """
+
+    A = np.asarray(A, dtype=complex)
+
+    if A.shape[-1] != 2:
+        return _c_expm_taylor(A)
+
+    m = 0.5*(A[..., 0, 0] + A[..., 1, 1])
+    B = A - m[..., None, None]*np.eye(2)
+    s = np.sqrt(B[..., 0, 0]**2 + B[..., 0, 1]*B[..., 1, 0])
+
+    # sinh(s)/s is even in s; use its Taylor series close to s = 0
+    small = np.abs(s) < 1e-4
+    s_safe = np.where(small, 1.0, s)
+    sinhc = np.where(small, 1. + s**2/6. + s**4/120., np.sinh(s_safe)/s_safe)
+
+    expA = np.cosh(s)[..., None, None]*np.eye(2) + sinhc[..., None, None]*B
+    expA *= np.exp(m)[..., None, None]
+
+    return expA
+
+
+def _c_expm_taylor(A, order=14):
+    """Matrix exponential of a stack of MxM matrices by scaling and squaring.
+
+    Each matrix is scaled by 2^-s such that its 1-norm is below 1/2, the
+    Taylor series of the given order is summed (with a truncation error below
+    1e-17) and the result is squared s times. Unlike eigendecomposition, this
+    stays accurate close to exceptional points.
+    """
+
+    norm = np.abs(A).sum(axis=-2).max(axis=-1)
+    s = np.maximum(0, np.ceil(np.log2(np.maximum(norm, 1e-300)/0.5)))
+    s = s.astype(int)
+    A = A / (2.**s)[..., None, None]
+
+    eye = np.eye(A.shape[-1])
+    expA = eye + A/order
+    for k in range(order - 1, 0, -1):
+        expA = eye + np.matmul(A, expA)/k
+
+    for k in range(s.max() if s.size else 0):
+        square = (s > k)[..., None, None]
+        expA = np.where(square, np.matmul(expA, expA), expA)
+
+    return expA
+
+
 def c_trapz(f, dx, **kwargs):
     """Wrapper for scipy.integrate.trapz that allows to integrate complex-valued
     arrays.
@@ -0,0 +1,466 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import inspect
+
+import numpy as np
+from scipy.integrate import complex_ode, ode
+
+from ep.helpers import c_expm
+from ep import jit
+
+
+# registry of integrator backends: name -> integrate(H, t, psi0, **kwargs)
+INTEGRATORS = {}
+
+# named accuracy/speed presets
+PRESETS = {
+    'fast': {'backend': 'dopri5',
+             'rtol': 1e-6,
+             'atol': 1e-6},
+    'default': {'backend': 'dopri5',
+                'rtol': 1e-9,
+                'atol': 1e-9},
+    'reference': {'backend': 'dop853',
+                  'rtol': 1e-12,
+                  'atol': 1e-12},
+    'stiff': {'backend': 'bdf',
+              'rtol': 1e-9,
+              'atol': 1e-9}
+}
+
+
+def register_integrator(name):
+    """Decorator to add an integrator backend to the registry.
+
+    A backend is a function integrate(H, t, psi0, H_stack=None, **kwargs)
+    which returns the solution Psi with shape (len(t),) + psi0.shape on the
+    time grid t.
+    """
+    def decorator(f):
+        INTEGRATORS[name] = f
+        return f
+    return decorator
+
+
+def get_integrator(integrator='default', **kwargs):
+    """Resolve a preset or backend name.
+
+        Parameters:
+        -----------
+            integrator: str
+                Preset name ('fast'|'default'|'reference'|'stiff') or backend
+                name ('dopri5'|'dop853'|'bdf'|'expm'|'magnus4'|'rk4'|'rk45'|
+                'jit').
+            kwargs:
+                Backend options (e.g., rtol, atol, nsub) which override the
+                preset values.
+
+        Returns:
+        --------
+            info: dict
+                Backend name, preset name and backend options; options which
+                are neither set by the preset nor by kwargs are filled in with
+                the defaults of the backend (see _get_backend_defaults).
+    """
+
+    if integrator in PRESETS:
+        info = PRESETS[integrator].copy()
+        info['preset'] = integrator
+    elif integrator in INTEGRATORS:
+        info = {'backend': integrator,
+                'preset': None}
+    else:
+        raise Exception(("Error: integrator {0} does not "
+                         "exist!").format(integrator))
+    info.update(kwargs)
+
+    for k, v in _get_backend_defaults(info['backend']).items():
+        info.setdefault(k, v)
+
+    return info
+
+
+def _get_backend_defaults(backend):
+    """Return the default options (e.g., rtol, atol, nsub) of a backend."""
+
+    args, _, _, defaults = inspect.getargspec(INTEGRATORS[backend])
+    options = dict(zip(args[len(args) - len(defaults or ()):], defaults or ()))
+    options.pop('H_stack', None)
+
+    return options
+
+
+def integrate(H, t, psi0, integrator='default', H_stack=None, **kwargs):
+    """Solve the Schroedinger equation i d/dt psi = H(t) psi on the time
+    grid t.
+
+        Parameters:
+        -----------
+            H: callable
+                Hamiltonian H(t) at a (scalar) time t.
+            t: (N,) ndarray
+                Time grid on which the solution is returned.
+            psi0: (2,) ndarray
+                Initial state at time t[0].
+            integrator: str
+                Preset or backend name (see get_integrator).
+            H_stack: callable, optional
+                Vectorized Hamiltonian which returns a stack of matrices for
+                an array of times (used by the fixed-step backends).
+            kwargs:
+                Backend options overriding the preset values.
+
+        Returns:
+        --------
+            Psi: (N,2) ndarray
+                Solution on the time grid.
+            info: dict
+                Backend name, preset and tolerances used.
+    """
+
+    info = get_integrator(integrator, **kwargs)
+    options = dict((k, v) for k, v in info.items()
+                   if k not in ('backend', 'preset'))
+
+    backend = INTEGRATORS[info['backend']]
+    Psi = backend(H, t, psi0, H_stack=H_stack, **options)
+
+    return Psi, info
+
+
+def _get_H_stack(H, H_stack):
+    """Return a vectorized version of H if none is supplied."""
+
+    if H_stack is not None:
+        return H_stack
+
+    def H_loop(t):
+        return np.asarray([H(tn) for tn in t])
+
+    return H_loop
+
+
+def _integrate_scipy_ode(SE, t, psi0):
+    """Iterate a scipy ode object on the time grid t."""
+
+    Psi = np.zeros((len(t),) + np.shape(psi0), dtype=complex)
+    SE.set_initial_value(psi0, t=t[0])
+
+    for n, tn in enumerate(t):
+        if SE.successful():
+            if n > 0:
+                SE.integrate(tn)
+            Psi[n, :] = SE.y
+        else:
+            raise Exception("ODE convergence error!")
+
+    return Psi
+
+
+@register_integrator('dopri5')
+def integrate_dopri5(H, t, psi0, H_stack=None, rtol=1e-9, atol=1e-9,
+                     **kwargs):
+    """Runge-Kutta method of order (4) 5 due to Dormand and Prince."""
+
+    SE = complex_ode(lambda t, phi: -1j*H(t).dot(phi))
+    SE.set_integrator('dopri5', rtol=rtol, atol=atol, **kwargs)
+
+    return _integrate_scipy_ode(SE, t, psi0)
+
+
+@register_integrator('dop853')
+def integrate_dop853(H, t, psi0, H_stack=None, rtol=1e-12, atol=1e-12,
+                     **kwargs):
+    """Runge-Kutta method of order 8(5,3) due to Dormand and Prince."""
+
+    SE = complex_ode(lambda t, phi: -1j*H(t).dot(phi))
+    SE.set_integrator('dop853', rtol=rtol, atol=atol, **kwargs)
+
+    return _integrate_scipy_ode(SE, t, psi0)
+
+
+@register_integrator('bdf')
+def integrate_bdf(H, t, psi0, H_stack=None, rtol=1e-9, atol=1e-9,
+                  **kwargs):
+    """Implicit backward differentiation formula (VODE) for stiff losses.
+
+    The exact Jacobian -1j*H(t) is supplied to the Newton iteration.
+    """
+
+    SE = ode(lambda t, phi: -1j*H(t).dot(phi),
+             lambda t, phi: -1j*H(t))
+    SE.set_integrator('zvode', method='bdf', with_jacobian=True,
+                      rtol=rtol, atol=atol, **kwargs)
+
+    return _integrate_scipy_ode(SE, t, psi0)
+
+
+@register_integrator('expm')
+def integrate_expm(H, t, psi0, H_stack=None, nsub=1, **kwargs):
+    """Exponential midpoint propagator
+
+        psi(t + h) = exp(-1j*h*H(t + h/2)) psi(t)
+
+    with nsub substeps per time step of the grid t.  The Hamiltonians at
+    all midpoints are evaluated in a single vectorized call.
+    """
+
+    H_stack = _get_H_stack(H, H_stack)
+
+    h = np.diff(t)/nsub
+    t_mid = (t[:-1, None] + (np.arange(nsub) + 0.5)*h[:, None]).ravel()
+    h = np.repeat(h, nsub)
+
+    H_mid = H_stack(t_mid)
+    h = h.reshape(h.shape + (1,)*(H_mid.ndim - 1))
+    U = c_expm(-1j*h*H_mid)
+
+    psi = np.asarray(psi0, dtype=complex)
+    Psi = np.zeros((len(t),) + np.broadcast(psi, U[0][..., 0]).shape,
+                   dtype=complex)
+    Psi[0] = psi
+
+    for n in range(len(t_mid)):
+        psi = np.einsum('...ij,...j -> ...i', U[n], psi)
+        if (n + 1) % nsub == 0:
+            Psi[(n + 1)//nsub] = psi
+
+    return Psi
+
+
+def get_magnus4_propagators(H_stack, t, nsub=1):
+    """Return the fourth-order Magnus propagators exp(Omega) of all nsub
+    substeps of the time grid t (see integrate_magnus4).
+
+        Parameters:
+        -----------
+            H_stack: callable
+                Vectorized Hamiltonian which returns a stack of matrices for
+                an array of times.
+            t: (N,) ndarray
+                Time grid.
+            nsub: int
+                Number of substeps per time step.
+
+        Returns:
+        --------
+            U: ((N-1)*nsub,...,M,M) ndarray
+    """
+
+    h = np.diff(t)/nsub
+    t_steps = (t[:-1, None] + np.arange(nsub)*h[:, None]).ravel()
+    h = np.repeat(h, nsub)
+
+    c = np.sqrt(3.)/6.
+    nsteps = len(t_steps)
+    H_nodes = H_stack(np.concatenate((t_steps + (0.5 - c)*h,
+                                      t_steps + (0.5 + c)*h)))
+    H1, H2 = H_nodes[:nsteps], H_nodes[nsteps:]
+
+    h = h.reshape(h.shape + (1,)*(H_nodes.ndim - 1))
+    commutator = np.matmul(H1, H2) - np.matmul(H2, H1)
+
+    return c_expm(-0.5j*h*(H1 + H2) + np.sqrt(3.)/12.*h**2*commutator)
+
+
+@register_integrator('magnus4')
+def integrate_magnus4(H, t, psi0, H_stack=None, nsub=1, **kwargs):
+    """Fourth-order Magnus propagator
+
+        psi(t + h) = exp(Omega) psi(t),
+        Omega = -1j*h/2*(H1 + H2) + sqrt(3)/12*h**2*[H1, H2],
+
+    with H1, H2 the Hamiltonians at the Gauss-Legendre nodes
+    t + (1/2 -+ sqrt(3)/6)*h and nsub substeps per time step of the grid t.
+    The Hamiltonians at all nodes are evaluated in a single vectorized call
+    and the propagators of all steps are computed at once, such that only
+    matrix-vector products remain in the stepping loop. Unlike the explicit
+    Runge-Kutta methods, the propagator is stable for steps longer than the
+    inverse level spacing, e.g., for the M-mode waveguides of
+    ep.multimode.
+    """
+
+    U = get_magnus4_propagators(_get_H_stack(H, H_stack), t, nsub=nsub)
+    nsteps = len(U)
+
+    psi = np.asarray(psi0, dtype=complex)
+    Psi = np.zeros((len(t),) + np.broadcast(psi, U[0][..., 0]).shape,
+                   dtype=complex)
+    Psi[0] = psi
+
+    for n in range(nsteps):
+        psi = np.einsum('...ij,...j -> ...i', U[n], psi)
+        if (n + 1) % nsub == 0:
+            Psi[(n + 1)//nsub] = psi
+
+    return Psi
+
+
+@register_integrator('rk4')
+def integrate_rk4(H, t, psi0, H_stack=None, nsub=4, **kwargs):
+    """Classical fixed-step Runge-Kutta method of order 4 with nsub
+    substeps per time step of the grid t.
+
+    The Hamiltonians at all stage times are evaluated in a single
+    vectorized call.  If H_stack returns stacks of shape (N,...,2,2), a batch
+    of initial states psi0 with shape (...,2) is propagated simultaneously.
+    """
+
+    H_stack = _get_H_stack(H, H_stack)
+
+    h = np.diff(t)/nsub
+    t_steps = (t[:-1, None] + np.arange(nsub)*h[:, None]).ravel()
+    h = np.repeat(h, nsub)
+
+    # stage times t, t + h/2 and t + h
+    t_stages = np.concatenate((t_steps, t_steps + 0.5*h, [t[-1]]))
+    H_stages = H_stack(t_stages)
+    nsteps = len(t_steps)
+    H0 = H_stages[:nsteps]
+    H1 = H_stages[nsteps:2*nsteps]
+    H2 = np.concatenate((H0[1:], H_stages[-1:]))
+
+    def f(Hn, psi):
+        return -1j*np.einsum('...ij,...j -> ...i', Hn, psi)
+
+    psi = np.asarray(psi0, dtype=complex)
+    Psi = np.zeros((len(t),) + np.broadcast(psi, H0[0][..., 0]).shape,
+                   dtype=complex)
+    Psi[0] = psi
+
+    for n in range(nsteps):
+        k1 = f(H0[n], psi)
+        k2 = f(H1[n], psi + 0.5*h[n]*k1)
+        k3 = f(H1[n], psi + 0.5*h[n]*k2)
+        k4 = f(H2[n], psi + h[n]*k3)
+        psi = psi + h[n]/6.*(k1 + 2.*k2 + 2.*k3 + k4)
+        if (n + 1) % nsub == 0:
+            Psi[(n + 1)//nsub] = psi
+
+    return Psi
+
+
+# Butcher tableau of the Dormand-Prince method: nodes c, stage coefficients
+# A, weights b of the 5th-order solution and the error weights e = b - b*
+# of the embedded 4th-order solution (the last stage is evaluated at the
+# accepted solution and reused in the next step)
+_DOPRI5_C = np.array([0., 1./5., 3./10., 4./5., 8./9., 1., 1.])
+_DOPRI5_A = [[],
+             [1./5.],
+             [3./40., 9./40.],
+             [44./45., -56./15., 32./9.],
+             [19372./6561., -25360./2187., 64448./6561., -212./729.],
+             [9017./3168., -355./33., 46732./5247., 49./176., -5103./18656.],
+             [35./384., 0., 500./1113., 125./192., -2187./6784., 11./84.]]
+_DOPRI5_B = np.array(_DOPRI5_A[-1] + [0.])
+_DOPRI5_E = _DOPRI5_B - np.array([5179./57600., 0., 7571./16695., 393./640.,
+                                  -92097./339200., 187./2100., 1./40.])
+
+
+@register_integrator('rk45')
+def integrate_rk45(H, t, psi0, H_stack=None, rtol=1e-9, atol=1e-9,
+                   max_steps=1000000, **kwargs):
+    """Adaptive Runge-Kutta method of order (4) 5 due to Dormand and Prince
+    with vectorized stages.
+
+    The Hamiltonians at the stage times of a step are evaluated in a single
+    vectorized call.  If H_stack returns stacks of shape (N,...,2,2), a batch
+    of initial states psi0 with shape (...,2) is propagated simultaneously
+    with a common step size, which is controlled by the maximum error of the
+    batch.  The steps end on the grid points t.
+    """
+
+    H_stack = _get_H_stack(H, H_stack)
+
+    def f(Hn, psi):
+        return -1j*np.einsum('...ij,...j -> ...i', Hn, psi)
+
+    H0 = H_stack(t[:1])[0]
+    psi = np.asarray(psi0, dtype=complex)
+    psi = np.array(np.broadcast_to(psi, np.broadcast(psi, H0[..., 0]).shape))
+    Psi = np.zeros((len(t),) + psi.shape, dtype=complex)
+    Psi[0] = psi
+
+    k = [f(H0, psi)] + [None]*6
+
+    # initial step from the scaled norms of psi and its derivative
+    scale = atol + rtol*np.abs(psi)
+    d0, d1 = [np.abs(u/scale).max() for u in psi, k[0]]
+    h = 0.01*d0/d1 if min(d0, d1) > 1e-5 else 1e-6
+    h = min(h, np.abs(t[-1] - t[0]))
+
+    tn = t[0]
+    nsteps = 0
+    for n in range(len(t) - 1):
+        while tn < t[n+1]:
+            nsteps += 1
+            if nsteps > max_steps:
+                raise Exception("ODE convergence error!")
+
+            # step truncated at the grid point
+            hs = min(h, t[n+1] - tn)
+            last = hs == t[n+1] - tn
+
+            H_stages = H_stack(tn + _DOPRI5_C[1:]*hs)
+            for i in range(1, 7):
+                dpsi = sum(a*kj for a, kj in zip(_DOPRI5_A[i], k) if a)
+                k[i] = f(H_stages[i-1], psi + hs*dpsi)
+            # the last stage is evaluated at the 5th-order solution
+            psi_new = psi + hs*dpsi
+
+            err = hs*sum(e*kj for e, kj in zip(_DOPRI5_E, k) if e)
+            scale = atol + rtol*np.maximum(np.abs(psi), np.abs(psi_new))
+            err = np.abs(err/scale).max()
+
+            if err <= 1.:
+                tn = t[n+1] if last else tn + hs
+                psi = psi_new
+                k[0] = k[6]
+                factor = 5. if err == 0 else min(5., 0.9*err**-0.2)
+                # a truncated step does not reduce the step size
+                h = max(h, hs*factor) if last else hs*factor
+            else:
+                h = hs*max(0.2, 0.9*err**-0.2)
+
+        Psi[n+1] = psi
+
+    return Psi
+
+
+@register_integrator('jit')
+def integrate_jit(H, t, psi0, H_stack=None, nsub=4, **kwargs):
+    """Classical fixed-step Runge-Kutta method of order 4 (see integrate_rk4)
+    with the stepping loop compiled to native code.
+
+    The Hamiltonians at all stage times are evaluated in a single vectorized
+    call and passed to ep.jit.rk4_kernel. Without numba or for a batch of
+    initial states, integrate_rk4 is used instead.
+    """
+
+    psi = np.asarray(psi0, dtype=complex)
+    if not jit.HAS_JIT or psi.ndim > 1:
+        return integrate_rk4(H, t, psi0, H_stack=H_stack, nsub=nsub)
+
+    H_stack = _get_H_stack(H, H_stack)
+
+    h = np.diff(t)/nsub
+    t_steps = (t[:-1, None] + np.arange(nsub)*h[:, None]).ravel()
+    h = np.repeat(h, nsub)
+
+    # stage times t, t + h/2 and t + h
+    t_stages = np.concatenate((t_steps, t_steps + 0.5*h, [t[-1]]))
+    H_stages = np.ascontiguousarray(H_stack(t_stages), dtype=complex)
+    nsteps = len(t_steps)
+    H0 = H_stages[:nsteps]
+    H1 = H_stages[nsteps:2*nsteps]
+    H2 = np.concatenate((H0[1:], H_stages[-1:]))
+
+    Psi = np.zeros((len(t), 2), dtype=complex)
+    jit.rk4_kernel(H0, H1, H2, h, nsub, psi, Psi)
+
+    return Psi
+
+
+if __name__ == '__main__':
+    pass
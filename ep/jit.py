@@ -0,0 +1,165 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import cmath
+import math
+
+import numpy as np
+
+# JIT-compiled kernels for the hot loops of the ODE integration, the 2x2
+# eigensolver and the Gaussian loss matrix elements: the kernels are compiled
+# with numba if it is importable, otherwise HAS_JIT is False and the callers
+# use their pure NumPy implementations instead
+try:
+    import numba
+    HAS_JIT = True
+except ImportError:
+    numba = None
+    HAS_JIT = False
+
+
+def jit(f):
+    """Compile f in nopython mode if numba is available, otherwise return f
+    unchanged."""
+    if numba is None:
+        return f
+    return numba.njit(cache=True)(f)
+
+
+@jit
+def rk4_kernel(H0, H1, H2, h, nsub, psi0, Psi):
+    """Fixed-step Runge-Kutta method of order 4 for i d/dt psi = H psi.
+
+        Parameters:
+        -----------
+            H0, H1, H2: (M,2,2) ndarray
+                Hamiltonians at the stage times t, t + h/2 and t + h of the
+                M steps.
+            h: (M,) ndarray
+                Step sizes.
+            nsub: int
+                Number of steps between consecutive output times.
+            psi0: (2,) ndarray
+                Initial state.
+            Psi: (M/nsub + 1,2) ndarray
+                Output array (modified in place).
+    """
+    a0 = psi0[0]
+    a1 = psi0[1]
+    Psi[0, 0] = a0
+    Psi[0, 1] = a1
+
+    for n in range(h.shape[0]):
+        hn = h[n]
+
+        # k = -1j*H*psi
+        k10 = -1j*(H0[n, 0, 0]*a0 + H0[n, 0, 1]*a1)
+        k11 = -1j*(H0[n, 1, 0]*a0 + H0[n, 1, 1]*a1)
+        b0 = a0 + 0.5*hn*k10
+        b1 = a1 + 0.5*hn*k11
+        k20 = -1j*(H1[n, 0, 0]*b0 + H1[n, 0, 1]*b1)
+        k21 = -1j*(H1[n, 1, 0]*b0 + H1[n, 1, 1]*b1)
+        b0 = a0 + 0.5*hn*k20
+        b1 = a1 + 0.5*hn*k21
+        k30 = -1j*(H1[n, 0, 0]*b0 + H1[n, 0, 1]*b1)
+        k31 = -1j*(H1[n, 1, 0]*b0 + H1[n, 1, 1]*b1)
+        b0 = a0 + hn*k30
+        b1 = a1 + hn*k31
+        k40 = -1j*(H2[n, 0, 0]*b0 + H2[n, 0, 1]*b1)
+        k41 = -1j*(H2[n, 1, 0]*b0 + H2[n, 1, 1]*b1)
+
+        a0 = a0 + hn/6.*(k10 + 2.*k20 + 2.*k30 + k40)
+        a1 = a1 + hn/6.*(k11 + 2.*k21 + 2.*k31 + k41)
+
+        if (n + 1) % nsub == 0:
+            Psi[(n + 1)//nsub, 0] = a0
+            Psi[(n + 1)//nsub, 1] = a1
+
+
+@jit
+def eig_kernel(H, eVals, eVecs_l, eVecs_r):
+    """Closed-form biorthogonal eigensystem of a stack of 2x2 matrices (see
+    ep.helpers.c_eig).
+
+        Parameters:
+        -----------
+            H: (M,2,2) ndarray
+            eVals: (M,2) ndarray
+            eVecs_l, eVecs_r: (M,2,2) ndarray
+                Output arrays (modified in place).
+    """
+    for i in range(H.shape[0]):
+        a = H[i, 0, 0]
+        b = H[i, 0, 1]
+        c = H[i, 1, 0]
+        d = H[i, 1, 1]
+
+        m = 0.5*(a + d)
+        s = cmath.sqrt((0.5*(a - d))**2 + b*c)
+        eVals[i, 0] = m + s
+        eVals[i, 1] = m - s
+
+        for j in range(2):
+            E = eVals[i, j]
+            # (H - E)|v> = 0 is solved by (b, E - a) and (E - d, c)
+            n1 = math.sqrt(abs(b)**2 + abs(E - a)**2)
+            n2 = math.sqrt(abs(E - d)**2 + abs(c)**2)
+            if n1 >= n2 and n1 > 0:
+                eVecs_r[i, 0, j] = b/n1
+                eVecs_r[i, 1, j] = (E - a)/n1
+            elif n2 > 0:
+                eVecs_r[i, 0, j] = (E - d)/n2
+                eVecs_r[i, 1, j] = c/n2
+            else:
+                eVecs_r[i, 0, j] = 1. if j == 0 else 0.
+                eVecs_r[i, 1, j] = 0. if j == 0 else 1.
+
+        # left eigenvectors are the columns of inv(X_R).T
+        r00 = eVecs_r[i, 0, 0]
+        r01 = eVecs_r[i, 0, 1]
+        r10 = eVecs_r[i, 1, 0]
+        r11 = eVecs_r[i, 1, 1]
+        det = r00*r11 - r01*r10
+        if det == 0:
+            # exceptional point: the left eigenvectors diverge
+            eVecs_l[i, :, :] = np.nan
+            continue
+        eVecs_l[i, 0, 0] = r11/det
+        eVecs_l[i, 1, 0] = -r01/det
+        eVecs_l[i, 0, 1] = -r10/det
+        eVecs_l[i, 1, 1] = r00/det
+
+
+@jit
+def gamma_gauss_kernel(kn, km, n, m, x0, y0, sigmax, sigmay, W, out):
+    """Integrals Ix*Iy of the Gaussian loss matrix elements over R^2 (see
+    ep.dissipation.Gamma_Gauss.get_matrix_element with integrate_R2=True).
+
+        Parameters:
+        -----------
+            kn, km: float
+                Wavenumbers k(n) and k(m).
+            n, m: int
+                Mode indices.
+            x0, y0: (M,) ndarray
+                Positions of the Gaussian loss profiles.
+            sigmax, sigmay: float
+                Widths of the Gaussian loss profiles.
+            W: float
+                Waveguide width.
+            out: (M,) ndarray
+                Output array (modified in place).
+    """
+    pi = math.pi
+    for i in range(x0.shape[0]):
+        Ix = cmath.exp(0.5*(km - kn)*(2j*x0[i] + sigmax**2*(kn - km)))
+        Iy = 0.25*cmath.exp(-0.5/W**2*(m + n)*pi*((m + n)*pi*sigmay**2 +
+                                                   2j*W*y0[i]))
+        Iy *= (-1. - cmath.exp(2j/W*(m + n)*pi*y0[i]) +
+               cmath.exp(2./W**2*n*pi*(m*pi*sigmay**2 + 1j*W*y0[i])) +
+               cmath.exp(2./W**2*m*pi*(n*pi*sigmay**2 + 1j*W*y0[i])))
+        out[i] = Ix*Iy
+
+
+if __name__ == '__main__':
+    pass
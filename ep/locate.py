@@ -0,0 +1,219 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+
+def get_discriminant(model, x, y, t=0.0):
+    """Return the discriminant D = (H11 - H22)^2 + 4*H12*H21 of the 2x2
+    Hamiltonian at the parameters (x, y).
+
+    The eigenvalues are E = tr(H)/2 +- sqrt(D)/2, i.e., exceptional points
+    are the roots of D.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y).
+            x, y: float or ndarray
+                Parameters (x, y) of broadcastable shapes.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+
+        Returns:
+        --------
+            D: complex or ndarray
+    """
+
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(y, dtype=float))
+    H = model.H_stack(np.full(x.shape, t), x, y)
+
+    return (H[..., 0, 0] - H[..., 1, 1])**2 + 4.*H[..., 0, 1]*H[..., 1, 0]
+
+
+def _get_jacobian(model, x, y, t, h):
+    """Return D(x, y) and the 2x2 real Jacobian of (Re D, Im D) with respect
+    to (x, y) from central differences."""
+
+    dx = [(0, 0), (h, 0), (-h, 0), (0, h), (0, -h)]
+    X = np.stack([x + a for a, _ in dx])
+    Y = np.stack([y + b for _, b in dx])
+    D = get_discriminant(model, X, Y, t)
+
+    D_x = (D[1] - D[2])/(2.*h)
+    D_y = (D[3] - D[4])/(2.*h)
+    J = np.stack((np.stack((D_x.real, D_y.real), axis=-1),
+                  np.stack((D_x.imag, D_y.imag), axis=-1)), axis=-2)
+
+    return D[0], J
+
+
+def get_winding_number(model, x, y, radius, t=0.0, n=32):
+    """Return the winding number of the phase of the discriminant along
+    circles of the given radius around the points (x, y).
+
+    An isolated exceptional point has winding number +-1 (the eigenvalues
+    are interchanged along the circle), a degeneracy at which the
+    eigenvalues are not interchanged has an even winding number.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+            x, y: float or ndarray
+                Centers of the circles.
+            radius: float or ndarray
+                Radii of the circles.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+            n: int
+                Number of points on each circle.
+
+        Returns:
+        --------
+            w: int or ndarray
+    """
+
+    phi = np.linspace(0, 2.*np.pi, n + 1)
+    x, y, radius = [np.asarray(u, dtype=float)[..., None]
+                    for u in (x, y, radius)]
+    D = get_discriminant(model, x + radius*np.cos(phi),
+                         y + radius*np.sin(phi), t)
+    dphase = np.angle(D[..., 1:]/D[..., :-1])
+
+    return np.rint(dphase.sum(axis=-1)/(2.*np.pi)).astype(int)
+
+
+def locate_EPs(model, x0, y0, t=0.0, h=1e-7, maxiter=50, tol=1e-13,
+               unique_tol=1e-8, radius=1e-4, certify=True):
+    """Locate exceptional points as the roots of the discriminant
+    D(x, y) = (H11 - H22)^2 + 4*H12*H21 (see get_discriminant).
+
+    All seeds are refined simultaneously by a damped Newton iteration of
+    (Re D, Im D) = 0, where the Jacobian is obtained from central
+    differences and the step is halved until |D| decreases. The converged
+    roots are deduplicated and certified by the winding number of the
+    discriminant (see get_winding_number).
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y), e.g., DirichletReduced.
+            x0, y0: float or ndarray
+                Seeds of broadcastable shapes.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+            h: float
+                Step of the finite differences.
+            maxiter: int
+                Maximum number of Newton iterations.
+            tol: float
+                Relative tolerance of the Newton steps.
+            unique_tol: float
+                Roots closer than unique_tol are considered identical.
+            radius: float
+                Radius of the circle for the certification.
+            certify: bool
+                Whether to discard roots which are not certified as EPs.
+
+        Returns:
+        --------
+            x_EP, y_EP: (K,) ndarray
+                Coordinates of the K distinct roots.
+            residual: (K,) ndarray
+                |D| at the roots.
+            winding: (K,) ndarray
+                Winding numbers of D around the roots (+-1 for EPs).
+    """
+
+    x, y = [np.array(u, dtype=float).ravel()
+            for u in np.broadcast_arrays(x0, y0)]
+    active = np.ones(x.shape, dtype=bool)
+    converged = np.zeros(x.shape, dtype=bool)
+
+    for n in range(maxiter):
+        if not active.any():
+            break
+        D, J = _get_jacobian(model, x[active], y[active], t, h)
+        F = np.stack((D.real, D.imag), axis=-1)
+
+        with np.errstate(invalid='ignore'):
+            det = J[..., 0, 0]*J[..., 1, 1] - J[..., 0, 1]*J[..., 1, 0]
+            dx = -(J[..., 1, 1]*F[..., 0] - J[..., 0, 1]*F[..., 1])/det
+            dy = -(J[..., 0, 0]*F[..., 1] - J[..., 1, 0]*F[..., 0])/det
+        singular = ~np.isfinite(dx) | ~np.isfinite(dy)
+        dx[singular], dy[singular] = 0., 0.
+
+        # backtracking: halve the step until |D| decreases
+        lam = np.ones(dx.shape)
+        xa, ya = x[active], y[active]
+        for k in range(20):
+            D_new = get_discriminant(model, xa + lam*dx, ya + lam*dy, t)
+            worse = ~(np.abs(D_new) <= np.abs(D)) & (lam > 1e-6)
+            if not worse.any():
+                break
+            lam[worse] *= 0.5
+
+        x[active], y[active] = xa + lam*dx, ya + lam*dy
+
+        step = lam*np.hypot(dx, dy)
+        done = (step <= tol*(1. + np.hypot(xa, ya))) | (D == 0)
+        idx = np.flatnonzero(active)
+        converged[idx[done & ~singular]] = True
+        active[idx[done | singular]] = False
+
+    x, y = x[converged], y[converged]
+    if not len(x):
+        return x, y, np.zeros(0), np.zeros(0, dtype=int)
+
+    # deduplicate the roots
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    keep = np.ones(x.shape, dtype=bool)
+    for i in range(len(x)):
+        if keep[i]:
+            close = np.hypot(x[i+1:] - x[i], y[i+1:] - y[i]) < unique_tol
+            keep[i+1:][close] = False
+    x, y = x[keep], y[keep]
+
+    residual = np.abs(get_discriminant(model, x, y, t))
+    winding = get_winding_number(model, x, y, radius, t)
+
+    if certify:
+        ep = np.abs(winding) % 2 == 1
+        x, y, residual, winding = [u[ep] for u in x, y, residual, winding]
+
+    return x, y, residual, winding
+
+
+def locate_EP(model, x0=None, y0=None, **kwargs):
+    """Return the exceptional point (x_EP, y_EP) closest to the seed (x0, y0)
+    (see locate_EPs); (nan, nan) is returned if no EP is found.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+            x0, y0: float, optional
+                Seed; defaults to the model attributes x_EP, y_EP.
+
+        Returns:
+        --------
+            x_EP, y_EP: float
+    """
+
+    if x0 is None:
+        x0 = model.x_EP
+    if y0 is None:
+        y0 = model.y_EP
+
+    x, y, _, _ = locate_EPs(model, x0, y0, **kwargs)
+    if not len(x):
+        return np.nan, np.nan
+
+    n = np.argmin(np.hypot(x - x0, y - y0))
+
+    return x[n], y[n]
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,293 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+from numpy import pi
+from scipy.optimize import linear_sum_assignment
+
+from ep.helpers import c_eig, c_trapz
+from ep.waveguide import Dirichlet, Waveguide
+
+
+class MultiModeWaveguide(Waveguide):
+    """M-mode waveguide class."""
+
+    _vectorized_H = True
+
+    def __init__(self, M=2, boundary='Dirichlet', **waveguide_kwargs):
+        """Exceptional Point (EP) waveguide class with M coupled modes.
+
+        Generalizes the two-mode truncations of the Dirichlet (modes 1, 2)
+        and Neumann (modes 0, 1) classes to the M lowest transverse modes
+        n_j, j = 0,...,M-1. In the frame co-moving with the boundary
+        modulation exp(1j*(kr + delta)*x), where kr = k(n_0) - k(n_1), mode j
+        is shifted by j quanta of the modulation and the Hamiltonian reads
+
+            H_jj = -k(n_j) - j*(kr + delta) - 1j*eta/2*kF/k(n_j),
+            H_j,j+1 = B_j*eps,  H_j+1,j = B_j.conj()*eps,
+
+        with the boundary couplings B_j = B(n_j, n_j+1). Couplings between
+        modes which differ by more than one quantum oscillate with
+        frequencies of order kr and are dropped (rotating wave
+        approximation). For M=2, H is identical to Dirichlet.H and
+        Neumann.H.
+
+            Parameters:
+            -----------
+                M: int
+                    Number of coupled modes.
+                boundary: str ('Dirichlet'|'Neumann')
+                    Boundary conditions at the waveguide walls.
+        """
+        Waveguide.__init__(self, **waveguide_kwargs)
+
+        if boundary not in ('Dirichlet', 'Neumann'):
+            raise Exception(("Error: boundary {0} "
+                             "does not exist!").format(boundary))
+        if M < 2:
+            raise Exception("Error: at least two modes required!")
+
+        self.M = M
+        self._n_states = M
+        self.boundary = boundary
+
+        if boundary == 'Dirichlet':
+            self.modes = np.arange(1, M + 1)
+        else:
+            self.modes = np.arange(M)
+
+        if self.modes[-1] >= self.N:
+            raise Exception(("Error: modes {0} are not all "
+                             "open!").format(self.modes))
+
+        self.kn = self.k(self.modes)
+        self.k0, self.k1 = self.kn[:2]
+        self.kr = self.k0 - self.k1
+        self.Bn = self.get_coupling(self.modes[:-1], self.modes[1:])
+        self.B0 = self.Bn[0]
+
+        # EP of the two lowest modes
+        self.x_EP, self.y_EP = self._get_EP_coordinates()
+
+        if self.x_R0 is None or self.y_R0 is None:
+            self.x_R0, self.y_R0 = self.x_EP, self.y_EP
+
+    def _get_EP_coordinates(self):
+        """Calculate and return the EP coordinates (x_EP, y_EP) of the two
+        lowest modes."""
+
+        dG = 0.5*self.eta*self.kF*abs(1./self.k0 - 1./self.k1)
+        x_EP = 0.5*dG/abs(self.B0)
+        y_EP = 0.0
+
+        return x_EP, y_EP
+
+    def get_coupling(self, n, m):
+        """Return the boundary coupling B(n, m) of the modes n and m.
+
+        The coupling is obtained from the matrix element of the boundary
+        modulation between the transverse modes, normalized with the
+        longitudinal flux 1/sqrt(k(n)*k(m)):
+
+            Dirichlet: B = -1j*(1 - (-1)^(n+m)*exp(1j*theta)) *
+                               n*m*pi^2/(2*W^3*sqrt(k(n)*k(m))),
+            Neumann:   B = -1j*(1 - (-1)^(n+m)*exp(1j*theta)) *
+                               (kF^2 - k(n)*k(m) - q_n*q_m)*nu_n*nu_m /
+                               (2*sqrt(k(n)*k(m))),
+
+        with q_n = n*pi/W, nu_0 = 1/sqrt(2) and nu_n = 1 otherwise.
+
+            Parameters:
+            -----------
+                n, m: int or ndarray
+                    Mode indices.
+
+            Returns:
+            --------
+                B: complex or ndarray
+        """
+
+        n, m = np.asarray(n), np.asarray(m)
+        W = self.W
+        kn, km = self.k(n), self.k(m)
+
+        phase = 1. - (-1.)**(n + m)*np.exp(1j*self.theta)
+
+        if self.boundary == 'Dirichlet':
+            B = n*m*pi**2/(2.*W**3*np.sqrt(kn*km))
+        else:
+            qn, qm = n*pi/W, m*pi/W
+            nu_n, nu_m = [np.where(l == 0, 1./np.sqrt(2.), 1.) for l in n, m]
+            B = (self.kF**2 - kn*km - qn*qm)*nu_n*nu_m/(2.*np.sqrt(kn*km))
+
+        return -1j*phase*B
+
+    def H(self, t, x=None, y=None):
+        """Return the M-mode Hamiltonian.
+
+            Parameters:
+            ----------
+                t: float or ndarray
+                    Time at which to evaluate the Hamiltonian.
+                x, y: float or ndarray (optional)
+                    Parameters for (eps, delta). If None, (eps, delta) are
+                    obtained from the get_cycle_parameters method at time t.
+
+            Returns:
+            --------
+                H: (M,M) ndarray or (...,M,M) ndarray for array arguments
+        """
+        if x is None and y is None:
+            eps, delta = self.get_cycle_parameters(t)
+        else:
+            eps, delta = x, y
+
+        eps, delta = np.broadcast_arrays(eps, delta)
+        j = np.arange(self.M)
+
+        H = np.zeros(eps.shape + (self.M, self.M), dtype=complex)
+        H[..., j, j] = (-self.kn - j*(self.kr + delta[..., None]) -
+                        1j*self.eta/2.*self.kF/self.kn)
+        H[..., j[:-1], j[1:]] = self.Bn*eps[..., None]
+        H[..., j[1:], j[:-1]] = self.Bn.conj()*eps[..., None]
+
+        return H
+
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the analytic derivatives (dH/deps, dH/ddelta) (see
+        Base.dH)."""
+
+        if x is None and y is None:
+            eps, delta = self.get_cycle_parameters(t)
+        else:
+            eps, delta = x, y
+
+        shape = np.broadcast(t, eps, delta).shape + (self.M, self.M)
+        j = np.arange(self.M)
+
+        H_x = np.zeros(shape, dtype=complex)
+        H_x[..., j[:-1], j[1:]] = self.Bn
+        H_x[..., j[1:], j[:-1]] = self.Bn.conj()
+        H_y = np.zeros(shape, dtype=complex)
+        H_y[..., j, j] = -j
+
+        return H_x, H_y
+
+    def _calc_c_eigensystem(self, H=None):
+        """Calculate the instantaneous eigenvalues and eigenvectors for all
+        times t=0,...,T in a single batched call and follow the branches
+        along t (see track_branches)."""
+
+        if H is None:
+            H = self.H_stack(self.t)
+
+        eVals, eVecs_l, eVecs_r = c_eig(H, left=True)
+
+        return track_branches(eVals, eVecs_l, eVecs_r)
+
+    def sort_c_eigensystem(self, eVals, eVecs_l, eVecs_r):
+        """Return the eigensystem sorted according to the init_state_method:
+        by decreasing imag(int_0,T E_n dt) ('gain') or by increasing Re(E_n)
+        at t=0 ('energy').
+
+        Note that for a degenerate gain criterion the ordering of
+        Base.sort_c_eigensystem is determined by roundoff and may differ.
+        """
+
+        if self.init_state_method == 'gain':
+            intE = np.asarray([c_trapz(eVals[:, n], dx=self.dt)
+                               for n in range(self.M)]).imag
+            # for symmetric loops the gain criterion can be degenerate, in
+            # which case the states are sorted by energy
+            scale = 1e-10*np.abs(intE).max()
+            gain = np.round(intE/scale) if scale > 0 else intE
+            order = np.lexsort((eVals[0].real, -gain))
+        elif self.init_state_method == 'energy':
+            order = np.argsort(eVals[0].real, kind='mergesort')
+        else:
+            order = np.arange(self.M)
+
+        return eVals[..., order], eVecs_l[..., order], eVecs_r[..., order]
+
+    def _get_wavefunction_modes(self, evecs=False):
+        """Return the expansion of the wavefunction in the modes n_j in the
+        laboratory frame (see Waveguide._get_wavefunction_modes)."""
+
+        j = np.arange(self.M)
+        nu = np.where(self.modes == 0, 1., np.sqrt(2.))
+
+        c = self.Psi*np.sqrt(self.k0/self.kn)
+        if self.boundary == 'Neumann':
+            c = c*nu
+        q = self.modes*pi/self.W
+        kx = j*self.kr
+        sine = np.repeat(self.boundary == 'Dirichlet', self.M)
+
+        return c, q, kx, sine
+
+    def _get_wavefunction_y(self, ny=None):
+        """Return the default transverse grid of the wavefunction (see
+        Dirichlet._get_wavefunction_y and Neumann.wavefunction)."""
+
+        if self.boundary == 'Dirichlet':
+            return Dirichlet.__dict__['_get_wavefunction_y'](self, ny)
+
+        return Waveguide._get_wavefunction_y(self, ny)
+
+    def wavefunction(self, with_boundary=False):
+        """Return the wavefunction Psi(x,y) in the laboratory frame (see
+        also iter_wavefunction and write_wavefunction)."""
+
+        x = self.t
+        y = self._get_wavefunction_y()
+
+        shift = np.zeros_like(x)
+        if with_boundary:
+            # greens_code counts from top
+            shift = -self.get_boundary(x=x)[0]
+
+        PHI = self._synthesize_wavefunction(
+            x, y, *self._get_wavefunction_modes(), shift=shift)
+        X, Y = np.meshgrid(x, y)
+
+        return X, Y, PHI
+
+
+def track_branches(eVals, eVecs_l, eVecs_r):
+    """Reorder the eigensystem of a stack of MxM matrices along the first
+    axis such that the eigenvalues change continuously.
+
+    At each step, every eigenvalue is assigned to its nearest predecessor.
+    If this assignment is not a permutation, e.g., close to exceptional
+    points or crossings, the assignment which minimizes the summed distances
+    is used instead (scipy.optimize.linear_sum_assignment).
+
+        Parameters:
+        -----------
+            eVals: (N,M) ndarray
+            eVecs_l, eVecs_r: (N,M,M) ndarray
+
+        Returns:
+        --------
+            eVals: (N,M) ndarray
+            eVecs_l, eVecs_r: (N,M,M) ndarray
+    """
+
+    eVals, eVecs_l, eVecs_r = [np.array(e) for e in eVals, eVecs_l, eVecs_r]
+    M = eVals.shape[-1]
+
+    for k in range(1, eVals.shape[0]):
+        D = np.abs(eVals[k-1][:, None] - eVals[k][None, :])
+        order = D.argmin(axis=-1)
+        if len(np.unique(order)) < M:
+            order = linear_sum_assignment(D)[1]
+        if np.any(order != np.arange(M)):
+            eVals[k] = eVals[k, order]
+            eVecs_l[k] = eVecs_l[k][:, order]
+            eVecs_r[k] = eVecs_r[k][:, order]
+
+    return eVals, eVecs_l, eVecs_r
+
+
+if __name__ == '__main__':
+    pass
@@ -4,12 +4,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from ep.base import Base
-from ep.helpers import c_gradient
+from ep.helpers import c_gradient, c_matrix
 
 
 class OptoMech(Base):
     """OptoMech class."""
 
+    _vectorized_H = True
+
     def __init__(self, R=0.05, gamma=2.0, **kwargs):
         """Exceptional Points (EP) optomechanics class.
 
@@ -37,14 +39,14 @@ class OptoMech(Base):
 
             Parameters:
             -----------
-                t: float
+                t: float or ndarray
                     Time variable.
-                x, y: float
+                x, y: float or ndarray
                     Parameters in omega-g space.
 
             Returns:
             --------
-                H: (2,2) ndarray
+                H: (2,2) ndarray or (...,2,2) ndarray for array arguments
         """
 
         if x is None and y is None:
@@ -57,10 +59,25 @@ class OptoMech(Base):
         H21 = H12
         H22 = -H11
 
-        H = np.array([[H11, H12],
-                      [H21, H22]], dtype=complex)
+        H = c_matrix(H11, H12, H21, H22)
         return H
 
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the analytic derivatives (dH/domega, dH/dg) (see
+        Base.dH)."""
+
+        if x is None and y is None:
+            omega, g = self.get_cycle_parameters(t)
+        else:
+            omega, g = x, y
+
+        zero = np.zeros(np.broadcast(t, omega, g).shape)
+
+        H_x = c_matrix(zero - 1., zero, zero, zero + 1.)
+        H_y = c_matrix(zero, zero + 1., zero + 1., zero)
+
+        return H_x, H_y
+
     def get_cycle_parameters(self, t):
         """Return path around the EP at (omega, g) = (0, gamma/2) parametrized
         via time t.
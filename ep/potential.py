@@ -159,11 +159,14 @@ class Potential(object):
             if self.with_boundary:
                 ynodes += -self.WG.get_boundary(xnodes)[0]
 
-            for (xn, yn) in zip(xnodes, ynodes):
-                if np.isfinite(xn) and np.isfinite(yn):
-                    # greens_code counts from top to bottom: yn -> W - yn
-                    # imag += gauss(X, xn, self.sigmax)*gauss(Y, self.WG.W - yn, self.sigmay)
-                    imag += gauss(X, xn, self.sigmax)*gauss(Y, yn, self.sigmay)
+            # sum of separable Gaussians at all valid nodes,
+            # imag(y,x) = sum_n gauss(y, yn)*gauss(x, xn)
+            valid = np.isfinite(xnodes) & np.isfinite(ynodes)
+            # greens_code counts from top to bottom: yn -> W - yn
+            # gy = gauss(Y[:, :1], self.WG.W - ynodes[valid], self.sigmay)
+            gy = gauss(Y[:, :1], ynodes[valid], self.sigmay)
+            gx = gauss(X[:1, :].T, xnodes[valid], self.sigmax)
+            imag += gy.dot(gx.T)
             self.xnodes = xnodes
             self.ynodes = ynodes
         else:
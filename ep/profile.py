@@ -9,7 +9,8 @@ import shutil
 import subprocess
 import sys
 
-from ep.waveguide import Neumann, Dirichlet, DirichletPositionDependentLoss
+from ep.waveguide import (Neumann, Dirichlet, DirichletPositionDependentLoss,
+                          get_boundaries)
 import helper_functions
 
 
@@ -121,93 +122,139 @@ class Generate_Profiles(object):
             eta_range = [self.eta[0]]
         print "eta_range", eta_range
 
-        for Ln in L_range:
-            for eta_n in eta_range:
-                params = {'L': Ln,
-                          'eta': eta_n}
-                print "Warning: check length values in the .xml and .profile files!"
-                self.L = Ln
-                self.eta = eta_n
-                self.waveguide_kwargs.update(**params)
-                self._length()
+        print "Warning: check length values in the .xml and .profile files!"
+        self._length([{'L': Ln, 'eta': eta_n}
+                      for Ln in L_range for eta_n in eta_range])
 
-    def _length(self):
-        """Generate length-dependent input-files for VSC runs."""
+    def _get_waveguide(self):
+        """Return the waveguide of the current waveguide_kwargs with x_R0 and
+        y_EP shifted according to eps, eps_factor and delta."""
 
-        # calculate the waveguide data
         if self.neumann:
             WG = Neumann(**self.waveguide_kwargs)
         else:
             WG = Dirichlet(**self.waveguide_kwargs)
-        self.WG = WG
 
         if self.eps:
-            self.WG.x_R0 = self.eps
+            WG.x_R0 = self.eps
         else:
-            self.WG.x_R0 = self.WG.x_EP * self.eps_factor
-        self.WG.y_EP += self.delta
-
-        if self.use_variable_length:
-            lambda0 = np.abs(pi/(self.WG.kr + self.delta))
-            L_range = np.arange(lambda0, self.L, 2*lambda0)
-        else:
-            L_range = np.linspace(1, self.L, self.L)
-
-        if not self.full_evolution:
-            L_range = L_range[-1:]
-
-        for Ln in L_range:
-            self.Ln = Ln
+            WG.x_R0 = WG.x_EP * self.eps_factor
+        WG.y_EP += self.delta
+
+        return WG
+
+    def _length(self, configurations=None):
+        """Generate length-dependent input-files for VSC runs.
+
+        The boundary profiles of all configurations and lengths are
+        evaluated in a single call of ep.waveguide.get_boundaries.
+
+            Parameters:
+            -----------
+                configurations: list of dicts, optional
+                    Parameters which update waveguide_kwargs, one dict per
+                    configuration (defaults to waveguide_kwargs only).
+        """
+
+        if configurations is None:
+            configurations = [{}]
+
+        # calculate the waveguide data and the grids of all profiles
+        profiles = []
+        for params in configurations:
+            self.waveguide_kwargs.update(**params)
+            self.__dict__.update(params)
+            WG = self._get_waveguide()
+            kwargs = dict(self.waveguide_kwargs)
+
+            if self.use_variable_length:
+                lambda0 = np.abs(pi/(WG.kr + self.delta))
+                L_range = np.arange(lambda0, self.L, 2*lambda0)
+            else:
+                L_range = np.linspace(1, self.L, self.L)
 
-            ID_params = {'Ln': Ln}
-            ID_params.update(**self.waveguide_kwargs)
-            ID = ("N_{N}_t_{loop_type}_phase_{init_phase:.3f}_L_{L}_Ln_{Ln:.3f}"
-                  "_eta_{eta}_direction_{loop_direction}").format(**ID_params)
-            self.filename = ID
+            if not self.full_evolution:
+                L_range = L_range[-1:]
 
-            if self.custom_directory:
-                self.directory = os.path.abspath(self.custom_directory)
-            else:
-                self.directory = os.path.abspath(ID)
-
-            if not os.path.exists(self.directory):
-                os.makedirs(self.directory)
-
-            os.chdir(self.directory)
-
-            # print profile properties to file
-            with open("EP_SETTINGS.cfg", "w") as f:
-                d = {key: value for key, value in vars(self.WG).items()
-                        if not (isinstance(value, np.ndarray) or
-                                isinstance(value, complex) or
-                                isinstance(value, type(lambda x: 1)))}
-                data = json.dumps(d, sort_keys=True, indent=4)
-                f.write(data)
-
-            # print epsilon/delta values
-            try:
-                x_eps, y_delta = self.WG.get_cycle_parameters(self.WG.t)
-                # save some disk space
-                x_eps, y_delta = [ x[::25] for x in x_eps, y_delta ]
-                np.savetxt(self.filename + ".eps_delta", zip(x_eps, y_delta))
-            except:
-                print "Warning: cannot write .eps_delta file"
-
-            # print profile
             # make sure that N_file = r_nx
             nyout = self.N*self.pphw
             dx = 1./(nyout + 1.)
-            self.r_nx = int(Ln/dx)
-            x = np.linspace(0, Ln, self.r_nx)
-            print "r_nx:", self.r_nx
-
-            xi_lower, xi_upper = self.WG.get_boundary(x=x, smearing=self.smearing)
-            np.savetxt(self.filename + ".upper_profile", zip(x, xi_upper))
-            np.savetxt(self.filename + ".lower_profile", zip(x, xi_lower))
-            
-            # write to xml and return to cwd
-            self._copy_and_replace(self.xml)
-            os.chdir(self.cwd)
+            for Ln in L_range:
+                x = np.linspace(0, Ln, int(Ln/dx))
+                profiles.append((kwargs, WG, Ln, x))
+
+        # evaluate all profiles at once; the grids are padded with their last
+        # value to a common length
+        nx = max(len(p[-1]) for p in profiles)
+        x = np.array([np.pad(p[-1], (0, nx - len(p[-1])), 'edge')
+                      for p in profiles])
+        eps, delta = np.array([p[1].get_cycle_parameters(xn)
+                               for p, xn in zip(profiles, x)]).swapaxes(0, 1)
+        L, W, kr, theta = [np.array([[getattr(p[1], k)] for p in profiles])
+                           for k in 'L', 'W', 'kr', 'theta']
+
+        # the loop direction is common to all configurations
+        xi_lower, xi_upper = get_boundaries(x, eps, delta, L, W, kr,
+                                            theta=theta,
+                                            loop_direction=WG.loop_direction,
+                                            smearing=self.smearing)
+
+        for n, (kwargs, WG, Ln, xn) in enumerate(profiles):
+            self.waveguide_kwargs.update(**kwargs)
+            self.__dict__.update(kwargs)
+            self.WG = WG
+            r_nx = len(xn)
+            self._write(Ln, xn, xi_lower[n, :r_nx], xi_upper[n, :r_nx])
+
+    def _write(self, Ln, x, xi_lower, xi_upper):
+        """Write the input-files of the profile with length Ln."""
+
+        self.Ln = Ln
+
+        ID_params = {'Ln': Ln}
+        ID_params.update(**self.waveguide_kwargs)
+        ID = ("N_{N}_t_{loop_type}_phase_{init_phase:.3f}_L_{L}_Ln_{Ln:.3f}"
+              "_eta_{eta}_direction_{loop_direction}").format(**ID_params)
+        self.filename = ID
+
+        if self.custom_directory:
+            self.directory = os.path.abspath(self.custom_directory)
+        else:
+            self.directory = os.path.abspath(ID)
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        os.chdir(self.directory)
+
+        # print profile properties to file
+        with open("EP_SETTINGS.cfg", "w") as f:
+            d = {key: value for key, value in vars(self.WG).items()
+                    if not (isinstance(value, np.ndarray) or
+                            isinstance(value, complex) or
+                            isinstance(value, type(lambda x: 1)))}
+            data = json.dumps(d, sort_keys=True, indent=4)
+            f.write(data)
+
+        # print epsilon/delta values
+        try:
+            x_eps, y_delta = self.WG.get_cycle_parameters(self.WG.t)
+            # save some disk space
+            x_eps, y_delta = [ z[::25] for z in x_eps, y_delta ]
+            np.savetxt(self.filename + ".eps_delta", zip(x_eps, y_delta))
+        except:
+            print "Warning: cannot write .eps_delta file"
+
+        # print profile
+        self.r_nx = len(x)
+        print "r_nx:", self.r_nx
+
+        np.savetxt(self.filename + ".upper_profile", zip(x, xi_upper))
+        np.savetxt(self.filename + ".lower_profile", zip(x, xi_lower))
+        
+        # write to xml and return to cwd
+        self._copy_and_replace(self.xml)
+        os.chdir(self.cwd)
 
     def _copy_and_replace(self, infile):
         """Copy the input file and write to output file with replaced
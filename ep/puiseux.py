@@ -0,0 +1,190 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.locate import locate_EP
+from ep.sampling import get_eigenvalues
+
+
+class PuiseuxSurrogate(object):
+    """Local surrogate of the two eigenvalue sheets around an EP."""
+
+    def __init__(self, model, radius, x_EP=None, y_EP=None, degree=4,
+                 t=0.0):
+        """Fit the local Puiseux expansion of the eigenvalues of a 2x2 model
+        around the EP (x_EP, y_EP).
+
+        The eigenvalues E = m +- sqrt(D)/2 follow from the mean m = tr(H)/2
+        and the discriminant D (see ep.locate.get_discriminant), which are
+        both analytic in (x, y). m and D are fitted by polynomials of the
+        given degree in (x - x_EP, y - y_EP) from exact evaluations on
+        circles of radius <= radius, where D(x_EP, y_EP) = 0 is imposed
+        exactly. The square root then reproduces the Puiseux series of the
+        two sheets, i.e., the branch point and the branch cut.
+
+        The fit residuals on separate validation circles determine the
+        error bounds of m and D in the neighborhood (see get_error_bound).
+
+            Parameters:
+            -----------
+                model: Base subclass instance
+                    2x2 model exposing H(t, x, y).
+                radius: float
+                    Radius of the neighborhood.
+                x_EP, y_EP: float, optional
+                    Seed of the EP (defaults to the model attributes x_EP,
+                    y_EP), which is refined by ep.locate.locate_EP.
+                degree: int
+                    Polynomial degree of the fits.
+                t: float
+                    Time at which to evaluate the Hamiltonian.
+        """
+
+        if model._n_states != 2:
+            raise Exception("Error: Puiseux surrogate requires a 2x2 model!")
+
+        x_EP, y_EP = locate_EP(model, x_EP, y_EP, t=t)
+        if np.isnan(x_EP):
+            raise Exception("Error: no EP found!")
+
+        self.model = model
+        self.x_EP, self.y_EP = x_EP, y_EP
+        self.radius = radius
+        self.degree = degree
+        self.t = t
+        self.powers = [(i, n - i) for n in range(degree + 1)
+                       for i in range(n + 1)]
+
+        # fit on rings at Chebyshev radii, 2x oversampled
+        n_coeffs = len(self.powers)
+        n_rings = degree + 1
+        n_phi = 2*int(np.ceil(2.*n_coeffs/n_rings))
+        r = radius*np.cos(0.5*np.pi*(np.arange(n_rings) + 0.5)/n_rings)
+        phi = 2.*np.pi*np.arange(n_phi)/n_phi
+        u = (r[:, None]*np.cos(phi)).ravel()
+        v = (r[:, None]*np.sin(phi)).ravel()
+
+        m, D = self._get_exact(u, v)
+        A = self._get_vandermonde(u, v)
+        self.c_m = np.linalg.lstsq(A, m, rcond=None)[0]
+        self.c_D = np.append(0., np.linalg.lstsq(A[:, 1:], D, rcond=None)[0])
+
+        # validation on rings between the fitting rings: the least-squares
+        # residuals are spread over the disk, hence the bounds are taken
+        # as the maximum residual (with a safety factor of 2)
+        r = radius*np.linspace(1., 0.2, 5)
+        phi = phi + np.pi/n_phi
+        u = (r[:, None]*np.cos(phi)).ravel()
+        v = (r[:, None]*np.sin(phi)).ravel()
+        m, D = self._get_exact(u, v)
+        m_fit, D_fit = self._get_fit(u, v)
+
+        eps = np.finfo(float).eps
+        self.dm = 2.*np.abs(m - m_fit).max() + 10.*eps*np.abs(m).max()
+        self.dD = 2.*np.abs(D - D_fit).max() + 10.*eps*np.abs(D).max()
+
+    def _get_exact(self, u, v):
+        """Return the exact mean and discriminant at the offsets (u, v) from
+        the EP."""
+
+        x, y = self.x_EP + u, self.y_EP + v
+        H = self.model.H_stack(np.full(np.shape(x), self.t), x, y)
+        m = 0.5*(H[..., 0, 0] + H[..., 1, 1])
+        D = (H[..., 0, 0] - H[..., 1, 1])**2 + 4.*H[..., 0, 1]*H[..., 1, 0]
+
+        return m, D
+
+    def _get_vandermonde(self, u, v):
+        """Return the monomials (u/radius)^i*(v/radius)^j with shape
+        (...,coefficients)."""
+
+        u, v = [np.asarray(w)[..., None]/self.radius for w in u, v]
+        i, j = np.array(self.powers).T
+
+        return u**i*v**j
+
+    def _get_fit(self, u, v):
+        """Return the fitted mean and discriminant at the offsets (u, v)."""
+
+        A = self._get_vandermonde(u, v)
+
+        return A.dot(self.c_m), A.dot(self.c_D)
+
+    def get_error_bound(self, x, y):
+        """Return the error bound of the surrogate eigenvalues at (x, y),
+
+            |dE| <= dm + 1/2*min(sqrt(dD), dD/|sqrt(D)|),
+
+        with the (a posteriori) error bounds dm and dD of the fitted mean and
+        discriminant. The bound applies to the pair of eigenvalues (the
+        sheets may be interchanged close to the branch cut); it is infinite
+        outside of the neighborhood.
+
+            Parameters:
+            -----------
+                x, y: float or ndarray
+
+            Returns:
+            --------
+                bound: float or ndarray
+        """
+
+        u, v = np.asarray(x) - self.x_EP, np.asarray(y) - self.y_EP
+        _, D = self._get_fit(u, v)
+
+        with np.errstate(divide='ignore'):
+            dsqrt = np.minimum(np.sqrt(self.dD), self.dD/np.sqrt(np.abs(D)))
+        bound = self.dm + 0.5*dsqrt
+
+        return np.where(np.hypot(u, v) <= self.radius, bound, np.inf)
+
+    def __call__(self, x, y, tol=None, return_bound=False):
+        """Return the eigenvalues at (x, y), sorted by decreasing real part
+        (see ep.sampling.get_eigenvalues).
+
+        The surrogate is evaluated in O(1) per point. Points outside of the
+        neighborhood and points with an error bound larger than tol are
+        evaluated exactly (in a single batched call).
+
+            Parameters:
+            -----------
+                x, y: float or ndarray
+                    Parameters of broadcastable shapes.
+                tol: float, optional
+                    Maximum error bound; if None, only points outside of the
+                    neighborhood are evaluated exactly.
+                return_bound: bool
+                    Whether to return the error bound as well (0 for exact
+                    evaluations).
+
+            Returns:
+            --------
+                E: (...,2) ndarray
+                bound: ndarray (optional)
+        """
+
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                   np.asarray(y, dtype=float))
+
+        m, D = self._get_fit(x - self.x_EP, y - self.y_EP)
+        sqrtD = np.sqrt(D)
+        E = np.stack((m + 0.5*sqrtD, m - 0.5*sqrtD), axis=-1)
+
+        bound = self.get_error_bound(x, y)
+        if tol is None:
+            exact = np.isinf(bound)
+        else:
+            exact = ~(bound <= tol)
+        if exact.any():
+            E[exact] = get_eigenvalues(self.model, x[exact], y[exact], self.t)
+            bound = np.where(exact, 0., bound)
+
+        if return_bound:
+            return E, bound
+        else:
+            return E
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,181 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.helpers import c_cumtrapz, map_trajectory
+
+
+def _cached(f):
+    """Decorator for lazily evaluated, cached SolveResult properties."""
+    name = f.__name__
+
+    def wrapper(self):
+        cache = self._cache
+        if name not in cache:
+            cache[name] = _readonly(f(self))
+        return cache[name]
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = f.__doc__
+
+    return property(wrapper)
+
+
+def _readonly(a):
+    """Return a read-only view of the array a."""
+    if isinstance(a, np.ndarray):
+        a = a.view()
+        a.flags.writeable = False
+    return a
+
+
+class SolveResult(object):
+    """Immutable result of the time evolution of a 2-level system.
+
+    Only the time grid, the wavefunction and the instantaneous eigensystem
+    are stored; derived quantities such as the projections onto the
+    eigenstates or the adiabatic predictions are evaluated lazily on first
+    access and cached. The cache is not pickled.
+    """
+
+    __slots__ = ('_t', '_Psi', '_eVals', '_eVecs_l', '_eVecs_r',
+                 '_init_state', '_loop_direction', '_integrator_info',
+                 '_cache')
+
+    def __init__(self, t, Psi, eVals, eVecs_l, eVecs_r, init_state=None,
+                 loop_direction=None, integrator_info=None):
+        """Parameters:
+           -----------
+                t: (N,) ndarray
+                    Time array.
+                Psi: (N,2) ndarray
+                    Wavefunction |Psi(t)>.
+                eVals: (N,2) ndarray
+                    Instantaneous eigenvalues E_a, E_b.
+                eVecs_l, eVecs_r: (N,2,2) ndarray
+                    Left and right instantaneous eigenvectors.
+                init_state: str, optional
+                    Initial state ('a'|'b'|'c'|'d').
+                loop_direction: str, optional
+                    Direction of evolution around the EP ('-'|'+').
+                integrator_info: dict, optional
+                    Integrator backend and tolerances used.
+        """
+        setattr_ = object.__setattr__
+        for name, value in (('_t', t), ('_Psi', Psi), ('_eVals', eVals),
+                            ('_eVecs_l', eVecs_l), ('_eVecs_r', eVecs_r)):
+            setattr_(self, name, _readonly(np.asarray(value)))
+        setattr_(self, '_init_state', init_state)
+        setattr_(self, '_loop_direction', loop_direction)
+        setattr_(self, '_integrator_info', integrator_info)
+        setattr_(self, '_cache', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Error: SolveResult is immutable!")
+
+    def __getstate__(self):
+        return (self._t, self._Psi, self._eVals, self._eVecs_l,
+                self._eVecs_r, self._init_state, self._loop_direction,
+                self._integrator_info)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return ("SolveResult(init_state={0!r}, loop_direction={1!r}, "
+                "N={2})").format(self._init_state, self._loop_direction,
+                                 len(self._t))
+
+    t = property(lambda self: self._t, doc="Time array.")
+    Psi = property(lambda self: self._Psi, doc="Wavefunction |Psi(t)>.")
+    eVals = property(lambda self: self._eVals,
+                     doc="Instantaneous eigenvalues.")
+    eVecs_l = property(lambda self: self._eVecs_l,
+                       doc="Left instantaneous eigenvectors.")
+    eVecs_r = property(lambda self: self._eVecs_r,
+                       doc="Right instantaneous eigenvectors.")
+    init_state = property(lambda self: self._init_state)
+    loop_direction = property(lambda self: self._loop_direction)
+    integrator_info = property(lambda self: self._integrator_info)
+
+    @property
+    def dt(self):
+        """Time step."""
+        return self._t[1] - self._t[0]
+
+    @_cached
+    def projection(self):
+        """Overlaps <phi_a|psi> and <phi_b|psi>, (N,2) ndarray."""
+        return np.einsum('ijk,ij -> ik', self._eVecs_l, self._Psi)
+
+    @property
+    def phi_a(self):
+        """Overlap <phi_a|psi>."""
+        return self.projection[:, 0]
+
+    @property
+    def phi_b(self):
+        """Overlap <phi_b|psi>."""
+        return self.projection[:, 1]
+
+    @_cached
+    def theta_adiabatic(self):
+        """Adiabatic phases theta_n = -int_0^t E_n dt'."""
+        theta = np.zeros_like(self._eVals)
+        for n in range(theta.shape[-1]):
+            theta[:, n] = -c_cumtrapz(self._eVals[:, n], dx=self.dt)
+        return theta
+
+    @_cached
+    def Psi_adiabatic(self):
+        """Adiabatic predictions exp(1j*theta_n)."""
+        return np.exp(1j*self.theta_adiabatic)
+
+    @_cached
+    def flip_error(self):
+        """Flip-error R = abs(phi_a/phi_b) at the end of the loop."""
+        return abs(self.phi_a[-1]/self.phi_b[-1])
+
+    def map_trajectory(self, part=np.real):
+        """Return the trajectory mapped onto the energy surfaces (see
+        ep.helpers.map_trajectory).
+
+            Parameters:
+            -----------
+                part: function (np.real|np.imag)
+                    Part of the eigenvalues.
+
+            Returns:
+            --------
+                mapped trajectory: (N,) ndarray
+        """
+        key = ('map_trajectory', part.__name__)
+        if key not in self._cache:
+            E = part(self._eVals)
+            self._cache[key] = _readonly(map_trajectory(self.phi_a,
+                                                        self.phi_b,
+                                                        E[:, 0], E[:, 1]))
+        return self._cache[key]
+
+
+def get_diodicity(result_minus, result_plus):
+    """Return the flip-errors (R0, R1) of the two loop directions and the
+    diodicity R0/R1.
+
+        Parameters:
+        -----------
+            result_minus, result_plus: SolveResult
+                Solutions for loop_direction '-' and '+'.
+
+        Returns:
+        --------
+            R0, R1, D: float
+    """
+    R0, R1 = result_minus.flip_error, result_plus.flip_error
+
+    return R0, R1, R0/R1
+
+
+if __name__ == '__main__':
+    pass
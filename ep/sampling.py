@@ -0,0 +1,216 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import Delaunay
+
+from ep.helpers import c_eig
+
+
+def get_eigenvalues(model, x, y, t=0.0):
+    """Return the eigenvalues of the Hamiltonian at the parameters (x, y),
+    sorted by decreasing real part.
+
+    For 2x2 Hamiltonians, the sorting corresponds to the Riemann sheets
+    E = tr(H)/2 +- sqrt(D)/2 with the principal branch of the square root,
+    i.e., the sheets are interchanged on the branch cut Re(sqrt(D)) = 0.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y).
+            x, y: ndarray
+                Parameters (x, y) of broadcastable shapes.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+
+        Returns:
+        --------
+            E: (...,M) ndarray
+    """
+
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(y, dtype=float))
+    E = c_eig(model.H_stack(np.full(x.shape, t), x, y))[0]
+    order = np.argsort(-E.real, axis=-1, kind='mergesort')
+
+    return np.take_along_axis(E, order, axis=-1)
+
+
+def adaptive_sample_H(model, xmin, xmax, ymin, ymax, xN=9, yN=9,
+                      max_level=6, rtol=1e-3, atol=0.0, max_points=None,
+                      t=0.0):
+    """Sample the eigenvalues of the Hamiltonian on an adaptively refined
+    quadtree in (x, y).
+
+    Starting from a regular grid of (xN-1)x(yN-1) cells, a cell is divided
+    into four if
+
+        - the eigenvalues or their differences at the center of the cell
+          deviate from the (bilinear) interpolation of the corner values by
+          more than atol + rtol*scale, with scale the range of the
+          eigenvalues on the initial grid, or
+        - the sheet assignment (see get_eigenvalues) along one of its edges
+          differs from the continuous continuation, i.e., the cell is
+          crossed by a branch cut or contains an EP,
+
+    until max_level refinements are reached. Since the corners are shared
+    between neighboring cells, each point is evaluated only once, and all
+    new points of a refinement level are evaluated in one call of H_stack.
+
+        Parameters:
+        -----------
+            model: Base subclass instance
+                Model exposing H(t, x, y).
+            xmin, xmax, ymin, ymax: float
+                Sampling domain.
+            xN, yN: int
+                Number of points of the initial grid.
+            max_level: int
+                Maximum number of refinements.
+            rtol, atol: float
+                Relative and absolute tolerance of the eigenvalue variation.
+            max_points: int, optional
+                Maximum number of points; refinement stops when the next
+                level would exceed it.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+
+        Returns:
+        --------
+            x, y: (P,) ndarray
+                Sampling points.
+            Z: (P,M) ndarray
+                Eigenvalues at the sampling points.
+            triangles: (T,3) ndarray
+                Delaunay triangulation of the sampling points (e.g., for
+                matplotlib.tri or mlab.triangular_mesh).
+    """
+
+    # corners of the cells are stored on an integer lattice with the
+    # spacing of the finest level
+    n = 2**max_level
+    dx = (xmax - xmin)/((xN - 1)*n)
+    dy = (ymax - ymin)/((yN - 1)*n)
+
+    values = {}
+
+    def evaluate(I, J):
+        keys = set(zip(I.tolist(), J.tolist())).difference(values)
+        if keys:
+            I_new, J_new = np.array(sorted(keys)).T
+            Z_new = get_eigenvalues(model, xmin + I_new*dx, ymin + J_new*dy,
+                                    t)
+            values.update(zip(zip(I_new.tolist(), J_new.tolist()), Z_new))
+        return np.array([values[k] for k in zip(I.tolist(), J.tolist())])
+
+    I, J = np.meshgrid(np.arange(xN - 1)*n, np.arange(yN - 1)*n,
+                       indexing='ij')
+    I, J = I.ravel(), J.ravel()
+    evaluate(*[u.ravel() for u in np.meshgrid(np.arange(xN)*n,
+                                              np.arange(yN)*n)])
+    Z0 = np.array(values.values())
+    scale = max(np.ptp(Z0.real), np.ptp(Z0.imag))
+    tol = atol + rtol*scale
+
+    for level in range(max_level + 1):
+        size = n // 2**level
+
+        # eigenvalues at the corners, shape (cells,4,M) in the order
+        # (0,0), (1,0), (1,1), (0,1)
+        corners = [(0, 0), (size, 0), (size, size), (0, size)]
+        Z = np.stack([evaluate(I + a, J + b) for a, b in corners], axis=1)
+
+        if level == max_level:
+            break
+
+        half = size // 2
+        Z_center = evaluate(I + half, J + half)
+
+        refine = _get_interpolation_error(Z, Z_center) > tol
+        refine |= _get_sheet_change(Z)
+
+        if not refine.any():
+            break
+        if (max_points is not None and
+                len(values) + 5*refine.sum() > max_points):
+            break
+
+        # divide the cells into four
+        I, J = I[refine], J[refine]
+        I = np.concatenate((I, I + half, I, I + half))
+        J = np.concatenate((J, J, J + half, J + half))
+
+    IJ = np.array(values.keys())
+    Z = np.array(values.values())
+    x, y = xmin + IJ[:, 0]*dx, ymin + IJ[:, 1]*dy
+    triangles = Delaunay(np.column_stack((x, y))).simplices
+
+    return x, y, Z, triangles
+
+
+def _get_interpolation_error(Z, Z_center):
+    """Return the deviation of the eigenvalues and of their differences at
+    the cell centers from the mean of the corner values, for Z with shape
+    (cells,4,M) and Z_center with shape (cells,M)."""
+
+    def get_differences(Z):
+        dZ = Z[..., :, None] - Z[..., None, :]
+        return np.concatenate((Z, dZ.reshape(Z.shape[:-1] + (-1,))), axis=-1)
+
+    Z, Z_center = get_differences(Z), get_differences(Z_center)
+
+    return np.abs(Z.mean(axis=1) - Z_center).max(axis=-1)
+
+
+def _get_sheet_change(Z):
+    """Return True for cells in which, along one of the edges, the sheet
+    assignment differs from the continuous continuation, i.e., a
+    permutation of the eigenvalues at the end corner is closer to the
+    eigenvalues at the start corner."""
+
+    change = np.zeros(Z.shape[0], dtype=bool)
+    for k in range(4):
+        Za, Zb = Z[:, k], Z[:, (k + 1) % 4]
+        identity = np.abs(Za - Zb).sum(axis=-1)
+        nearest = np.abs(Za[:, :, None] - Zb[:, None, :]).argmin(axis=-1)
+        change |= (nearest != np.arange(Z.shape[-1])).any(axis=-1) & (
+            np.abs(Za - np.take_along_axis(Zb, nearest, axis=-1)).sum(axis=-1)
+            < identity)
+
+    return change
+
+
+def resample_on_grid(x, y, Z, xmin, xmax, xN, ymin, ymax, yN):
+    """Interpolate adaptively sampled eigenvalues linearly onto a regular
+    grid (see adaptive_sample_H and Base.sample_H).
+
+        Parameters:
+        -----------
+            x, y: (P,) ndarray
+                Sampling points.
+            Z: (P,M) ndarray
+                Eigenvalues at the sampling points.
+            xmin, xmax, ymin, ymax: float
+                Dimensions of the grid.
+            xN, yN: int
+                Number of grid points in x and y direction.
+
+        Returns:
+        --------
+            X, Y: (xN,yN) ndarray
+                Spatial (mesh)grids.
+            Z: (xN,yN,M) ndarray
+                Eigenvalues on the X/Y grid.
+    """
+
+    X, Y = np.meshgrid(np.linspace(xmin, xmax, xN),
+                       np.linspace(ymin, ymax, yN), indexing='ij')
+    f = LinearNDInterpolator(np.column_stack((x, y)), Z)
+
+    return X, Y, f(X, Y)
+
+
+if __name__ == '__main__':
+    pass
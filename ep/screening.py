@@ -0,0 +1,293 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+from numpy import pi
+
+from ep.helpers import c_eig
+
+
+# model attributes which may be swept; all other model quantities (except the
+# coupling B0 of theta) are derived once in the constructor from the first
+# parameter set
+SWEEP_PARAMETERS = ('eta', 'eta0', 'L', 'x_R0', 'y_R0', 'init_phase',
+                    'theta')
+
+
+def screen_flip_errors(model_class, n=500, **kwargs):
+    """Approximate the final state of the adiabatic evolution for many
+    parameter sets at once.
+
+    The wavefunction is expanded in the instantaneous (biorthogonal)
+    eigenbasis, |psi> = sum_m a_m(t) |phi_m(t)>, where the eigenvectors are
+    transported parallel along the trajectory. Starting in state |n>, the
+    zeroth order is the adiabatic prediction
+
+        a_n(t) = exp(-1j*int_0^t E_n dt'),
+
+    and the first-order non-adiabatic correction to the amplitude ratio reads
+
+        a_m(t)/a_n(t) = -int_0^t K_mn(t') exp(-1j*int_t'^t (E_m - E_n)) dt',
+
+    with the coupling K_mn = <phi_m|dH/dt|phi_n>/(E_n - E_m). The relative
+    change of the flip error by the next (second- and third-order) terms
+    serves as an error estimate; it becomes large if the final flip error
+    results from a strong cancellation of the non-adiabatic amplitude.
+
+    All parameter sets are evaluated in a single vectorized call on a
+    normalized time grid s = t/T in [0, 1], which requires a vectorized
+    Hamiltonian (model_class._vectorized_H).
+
+        Parameters:
+        -----------
+            model_class: Base subclass
+                Model to be screened, e.g., ep.waveguide.Dirichlet.
+            n: int
+                Number of points of the normalized time grid.
+            kwargs:
+                Model parameters. Parameters listed in SWEEP_PARAMETERS may be
+                arrays of broadcastable shapes, all other parameters are
+                passed to the model constructor.
+
+        Returns:
+        --------
+            phi_a, phi_b: (...) ndarray
+                Approximate overlaps <phi_a|psi(T)> and <phi_b|psi(T)>.
+            R: (...) ndarray
+                Approximate flip error |a_m(T)/a_n(T)|.
+            R_err: (...) ndarray
+                Estimated relative error of the first-order prediction.
+    """
+
+    if not model_class._vectorized_H:
+        raise Exception(("Error: screening requires a vectorized "
+                         "Hamiltonian ({0}).").format(model_class.__name__))
+
+    model, s, t, T = _get_model(model_class, n, **kwargs)
+
+    init_state = model.init_state
+    if init_state not in ('a', 'b'):
+        raise Exception(("Error: init_state {0} not supported "
+                         "in screening mode!").format(init_state))
+
+    # eigensystem on the trajectory, shape (...,n,2) and (...,n,2,2)
+    H = model.H_stack(t)
+    eVals, eVecs_l, eVecs_r = _get_c_eigensystem(H)
+    eVals, eVecs_l, eVecs_r = _sort_c_eigensystem(eVals, eVecs_l, eVecs_r,
+                                                  model.init_state_method,
+                                                  T, s)
+    i, j = (0, 1) if init_state == 'a' else (1, 0)
+
+    # parallel transport gauge |phi_m(t_k+1)> -> |phi_m(t_k+1)>*g_m(t_k+1)
+    # with <phi_m(t_k)|phi_m(t_k+1)> = 1
+    overlap = np.einsum('...km,...km -> ...m',
+                        eVecs_l[..., :-1, :, :], eVecs_r[..., 1:, :, :])
+    g = np.ones_like(eVals)
+    g[..., 1:, :] = np.cumprod(1./overlap, axis=-2)
+
+    # couplings K_ji and K_ij along the trajectory
+    ds = s[1] - s[0]
+    H_dot = np.gradient(H, ds, axis=-3) / T[..., None, None, None]
+    H_dot_ji = np.einsum('...k,...kl,...l -> ...', eVecs_l[..., j],
+                         H_dot, eVecs_r[..., i])
+    H_dot_ij = np.einsum('...k,...kl,...l -> ...', eVecs_l[..., i],
+                         H_dot, eVecs_r[..., j])
+    dE = eVals[..., i] - eVals[..., j]
+    K_ji = g[..., i]/g[..., j] * H_dot_ji/dE
+    K_ij = g[..., j]/g[..., i] * H_dot_ij/(-dE)
+
+    # first-order amplitude ratio Q = -a_j/a_i along the trajectory
+    Q = _exponential_convolution(K_ji, dE, ds*T)
+
+    # the error is estimated from the next order: the second-order
+    # back-coupling c_ii onto |i> feeds the third-order correction dQ to |j>
+    c_ii = _cumtrapz(K_ij*Q, ds*T)
+    dQ = _exponential_convolution(K_ji*c_ii, dE, ds*T)[..., -1]
+    R_err = np.abs((Q[..., -1] + dQ)/(1. + c_ii[..., -1])/Q[..., -1] - 1.)
+
+    # norm of the adiabatic state
+    theta_i = -_trapz(eVals[..., i], ds*T)
+    a_i = g[..., -1, i] * np.exp(1j*theta_i)
+    a_j = -Q[..., -1] * a_i
+
+    phi = [None, None]
+    phi[i] = a_i
+    phi[j] = a_j * g[..., -1, j]/g[..., -1, i]
+    phi_a, phi_b = phi
+
+    R = np.abs(phi[j]/phi[i])
+
+    return phi_a, phi_b, R, R_err
+
+
+def get_refinement_mask(R, R_err, R_min=None, R_max=None, rtol=0.1):
+    """Select the parameter sets which have to be recalculated with the exact
+    ODE solver.
+
+        Parameters:
+        -----------
+            R, R_err: ndarray
+                Approximate flip errors and error estimates returned by
+                screen_flip_errors.
+            R_min, R_max: float, optional
+                Flip error window of interest; parameter sets within the
+                window are refined as well (if neither is given, only the
+                error estimate is used).
+            rtol: float
+                Maximum tolerated relative error of the screening result.
+
+        Returns:
+        --------
+            mask: ndarray of bool
+    """
+
+    mask = R_err > rtol
+
+    if R_min is not None or R_max is not None:
+        if R_min is None:
+            R_min = 0.
+        if R_max is None:
+            R_max = np.inf
+        mask |= (R >= R_min) & (R <= R_max)
+
+    return mask
+
+
+def _get_model(model_class, n, **kwargs):
+    """Return a model instance with the swept parameters as arrays of shape
+    (...,1), the normalized time grid s and the absolute times t."""
+
+    sweep = dict((k, np.asarray(kwargs.pop(k)))
+                 for k in SWEEP_PARAMETERS if np.ndim(kwargs.get(k)) > 0)
+    sweep_shape = np.broadcast(*sweep.values()).shape if sweep else ()
+
+    # construct the model with the first parameter set; the time grid of the
+    # model is not used
+    kwargs.update((k, v.flat[0]) for k, v in sweep.items())
+    kwargs.setdefault('tN', 1)
+    model = model_class(**kwargs)
+
+    for k, v in sweep.items():
+        v = np.broadcast_to(v, sweep_shape)[..., None]
+        if k == 'L':
+            model.L = model.T = v
+            model.w = np.sign(model.w)*2.*pi/v
+        elif k == 'theta':
+            # the coupling B0 is obtained from one model per distinct theta
+            thetas, inverse = np.unique(v, return_inverse=True)
+            B0 = [model_class(**dict(kwargs, theta=th)).B0 for th in thetas]
+            model.theta = v
+            model.B0 = np.asarray(B0)[inverse].reshape(v.shape)
+        else:
+            setattr(model, k, v)
+
+    T = np.broadcast_to(np.asarray(model.T, dtype=float),
+                        sweep_shape + (1,))[..., 0]
+    s = np.linspace(0, 1, n)
+    t = T[..., None] * s
+
+    return model, s, t, T
+
+
+def _get_c_eigensystem(H):
+    """Calculate the eigensystem of a stack of Hamiltonians H with shape
+    (...,n,2,2) and remove eigenvalue crossings along the time axis."""
+
+    eVals, eVecs_l, eVecs_r = c_eig(H, left=True)
+
+    # follow the branches by choosing at each step the assignment which
+    # minimizes the change of the eigenvalues
+    for k in range(1, eVals.shape[-2]):
+        E0, E1 = eVals[..., k-1, 0], eVals[..., k-1, 1]
+        F0, F1 = eVals[..., k, 0], eVals[..., k, 1]
+        swap = (np.abs(F0 - E1) + np.abs(F1 - E0) <
+                np.abs(F0 - E0) + np.abs(F1 - E1))
+        for e in eVals[..., k, :], eVecs_l[..., k, :, :], eVecs_r[..., k, :, :]:
+            e[swap] = e[swap][..., ::-1]
+
+    return eVals, eVecs_l, eVecs_r
+
+
+def _sort_c_eigensystem(eVals, eVecs_l, eVecs_r, method, T, s):
+    """Sort the eigensystem such that the first state is the gain state
+    ('gain') or the state with lower energy at t=0 ('energy').
+
+    Note that for a degenerate gain criterion the ordering of
+    Base._find_gain_state is determined by roundoff and may differ.
+    """
+
+    if method == 'gain':
+        ds = s[1] - s[0]
+        intE = _trapz(eVals.swapaxes(-1, -2), ds*T[..., None]).imag
+        swap = intE[..., 0] < intE[..., 1]
+        # for symmetric loops the gain criterion can be degenerate, in which
+        # case the states are sorted by energy
+        tie = np.abs(intE[..., 0] - intE[..., 1]) <= 1e-10*np.abs(intE).max(axis=-1)
+        swap = np.where(tie, eVals[..., 0, 0].real > eVals[..., 0, 1].real,
+                        swap)
+    elif method == 'energy':
+        swap = eVals[..., 0, 0].real > eVals[..., 0, 1].real
+    else:
+        raise Exception(("Error: init_state_method {0} "
+                         "does not exist!").format(method))
+
+    for e in eVals, eVecs_l, eVecs_r:
+        e[swap] = e[swap][..., ::-1]
+
+    return eVals, eVecs_l, eVecs_r
+
+
+def _trapz(f, dx):
+    """Trapezoidal rule along the last axis with (broadcastable) step dx."""
+
+    return dx*(f.sum(axis=-1) - 0.5*(f[..., 0] + f[..., -1]))
+
+
+def _cumtrapz(f, dx):
+    """Cumulative trapezoidal rule along the last axis (starting at 0)."""
+
+    F = np.zeros_like(f)
+    F[..., 1:] = np.cumsum(0.5*(f[..., 1:] + f[..., :-1]), axis=-1)
+
+    return np.asarray(dx)[..., None]*F
+
+
+def _phi(z, order):
+    """Exponential integrator functions phi_1(z) = (e^z - 1)/z and
+    phi_2(z) = (e^z - 1 - z)/z^2 (with series expansions for small z)."""
+
+    small = np.abs(z) < 1e-3
+    zs = np.where(small, 1., z)
+    if order == 1:
+        f = np.expm1(zs)/zs
+        f_series = 1. + z/2. + z**2/6. + z**3/24.
+    else:
+        f = (np.expm1(zs) - zs)/zs**2
+        f_series = 0.5 + z/6. + z**2/24. + z**3/120.
+
+    return np.where(small, f_series, f)
+
+
+def _exponential_convolution(K, dE, dt):
+    """Return Q(t) = int_0^t K(t') exp(1j*int_t'^t dE dt'') dt' along the
+    last axis.
+
+    Q is evaluated recursively with K interpolated linearly and dE constant
+    in each step, which is exact for the oscillating phase factor and avoids
+    the overflow of the separate exponentials exp(+-1j*int dE).
+    """
+
+    dt = np.asarray(dt)
+    Q = np.zeros_like(K)
+
+    for k in range(K.shape[-1] - 1):
+        z = 0.5j*(dE[..., k] + dE[..., k+1])*dt
+        Q[..., k+1] = (np.exp(z)*Q[..., k] +
+                       dt*(K[..., k]*_phi(z, 1) +
+                           (K[..., k+1] - K[..., k])*_phi(z, 2)))
+
+    return Q
+
+
+if __name__ == '__main__':
+    pass
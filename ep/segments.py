@@ -0,0 +1,218 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+from collections import OrderedDict
+
+import numpy as np
+
+from ep.helpers import c_expm
+from ep.integrators import get_magnus4_propagators
+
+
+# least recently used cache of segment propagators, keyed by the segment
+# parameters (see Segment.propagator); a size of 0 disables it
+SEGMENT_CACHE = OrderedDict()
+SEGMENT_CACHE_SIZE = 256
+
+
+def clear_segment_cache():
+    """Remove all entries from the segment cache."""
+    SEGMENT_CACHE.clear()
+
+
+def multiply_propagators(U):
+    """Return the ordered product U[n-1]...U[1] U[0] of a stack of
+    propagators, evaluated by pairwise (vectorized) multiplication in
+    log2(n) sweeps.
+
+        Parameters:
+        -----------
+            U: (n,...,M,M) ndarray
+
+        Returns:
+        --------
+            U: (...,M,M) ndarray
+    """
+
+    U = np.asarray(U)
+    while len(U) > 1:
+        if len(U) % 2:
+            U = np.concatenate((np.matmul(U[1:-1:2], U[:-1:2]), U[-1:]))
+        else:
+            U = np.matmul(U[1::2], U[::2])
+
+    return U[0]
+
+
+def _get_key(value):
+    """Return a hashable representation of a parameter value."""
+
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(np.asarray(value).tolist())
+
+
+class _Element(object):
+    """Segment algebra: a + b is the device which traverses a and then b,
+    n*a the device which traverses a n times."""
+
+    def __add__(self, other):
+        return Cascade([self, other])
+
+    def __mul__(self, n):
+        return Cascade([self], repeat=n)
+
+    __rmul__ = __mul__
+
+    def propagate(self, psi0):
+        """Return the state psi(end) = U psi(start) for the initial state(s)
+        psi0 with shape (...,M)."""
+
+        return np.einsum('...ij,...j->...i', self.propagator(), psi0)
+
+
+class Segment(_Element):
+    """Waveguide segment with a cached transfer propagator."""
+
+    def __init__(self, model_class, start=0.0, end=None, nsteps=200,
+                 x=None, y=None, **model_kwargs):
+        """Segment of the model model_class(**model_kwargs) between the
+        positions (times) start and end.
+
+        The propagator U with psi(end) = U psi(start) is obtained from
+        nsteps fourth-order Magnus steps (see
+        ep.integrators.get_magnus4_propagators) or, for constant parameters
+        (x, y), exactly from U = exp(-1j*(end - start)*H(x, y)). It is
+        computed on first use and cached by the segment parameters (see
+        SEGMENT_CACHE), such that identical segments of a device and devices
+        which share segments reuse it.
+
+            Parameters:
+            -----------
+                model_class: Base subclass
+                    Model exposing H(t, x, y), e.g., DirichletReduced.
+                start, end: float
+                    Positions of the segment boundaries (end defaults to the
+                    model length T).
+                nsteps: int
+                    Number of Magnus steps.
+                x, y: float, optional
+                    Constant parameters of the Hamiltonian, e.g., for
+                    constant-loss regions; if None, the model path
+                    get_cycle_parameters(t) is used.
+                model_kwargs:
+                    Model parameters.
+        """
+
+        self.model_class = model_class
+        self.model_kwargs = model_kwargs
+        self.model = model_class(**model_kwargs)
+        self.start = start
+        self.end = self.model.T if end is None else end
+        self.nsteps = nsteps
+        self.x, self.y = x, y
+
+    @property
+    def length(self):
+        return self.end - self.start
+
+    def get_key(self):
+        """Return a hashable key of the segment parameters."""
+
+        params = tuple(sorted((k, _get_key(v))
+                              for k, v in self.model_kwargs.items()))
+
+        return (self.model_class, params, self.start, self.end,
+                self.nsteps, self.x, self.y)
+
+    def _calc_propagator(self):
+        """Calculate the propagator of the segment."""
+
+        model = self.model
+
+        if self.x is not None and self.y is not None:
+            H = model.H_stack(np.asarray(self.start), self.x, self.y)
+            return c_expm(-1j*self.length*H)
+
+        t = np.linspace(self.start, self.end, self.nsteps + 1)
+
+        return multiply_propagators(get_magnus4_propagators(model.H_stack, t))
+
+    def propagator(self):
+        """Return the (cached) propagator of the segment.
+
+            Returns:
+            --------
+                U: (M,M) ndarray
+        """
+
+        if SEGMENT_CACHE_SIZE <= 0:
+            return self._calc_propagator()
+
+        key = self.get_key()
+        if key in SEGMENT_CACHE:
+            SEGMENT_CACHE[key] = SEGMENT_CACHE.pop(key)
+        else:
+            SEGMENT_CACHE[key] = self._calc_propagator()
+            while len(SEGMENT_CACHE) > SEGMENT_CACHE_SIZE:
+                SEGMENT_CACHE.popitem(last=False)
+
+        return np.array(SEGMENT_CACHE[key])
+
+
+class Cascade(_Element):
+    """Device composed of segments."""
+
+    def __init__(self, parts, repeat=1):
+        """Concatenation of segments (or cascades) which are traversed in
+        the given order, repeated repeat times.
+
+        The propagator is the product of the (cached) propagators of the
+        parts, i.e., replacing a part only recomputes that part, and the
+        repetition of identical cells is evaluated by repeated squaring in
+        O(log(repeat)) matrix products.
+
+            Parameters:
+            -----------
+                parts: list of Segment or Cascade
+                    Parts in propagation order (at least one).
+                repeat: int
+                    Number of repetitions.
+        """
+
+        if repeat < 0 or int(repeat) != repeat:
+            raise Exception(("Error: number of repetitions {0} is not a "
+                             "non-negative integer!").format(repeat))
+        if not len(parts):
+            raise Exception("Error: cascade without parts!")
+
+        self.parts = []
+        for part in parts:
+            # flatten plain concatenations
+            if isinstance(part, Cascade) and part.repeat == 1:
+                self.parts.extend(part.parts)
+            else:
+                self.parts.append(part)
+        self.repeat = int(repeat)
+
+    @property
+    def length(self):
+        return self.repeat*sum(part.length for part in self.parts)
+
+    def propagator(self):
+        """Return the propagator of the device.
+
+            Returns:
+            --------
+                U: (M,M) ndarray
+        """
+
+        U = multiply_propagators([part.propagator() for part in self.parts])
+
+        return np.linalg.matrix_power(U, self.repeat)
+
+
+if __name__ == '__main__':
+    pass
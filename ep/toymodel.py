@@ -8,6 +8,8 @@ from ep.base import Base
 
 class Toymodel(Base):
     """Toymodel class."""
+
+    _vectorized_H = True
     
     def __init__(self, **kwargs):
         """Copy methods and variables from Base class."""
@@ -18,16 +20,16 @@ class Toymodel(Base):
         
             Parameters:
             -----------
-                t: float
+                t: float or ndarray
                     Time.
-                c1: float
+                c1: float or ndarray
                     Parameter 1.
-                c2: float
+                c2: float or ndarray
                     Parameter 2.
                 
             Returns:
             --------
-                H: (2,2) ndarray
+                H: (2,2) ndarray or (...,2,2) ndarray for array arguments
                 
         """
         
@@ -43,8 +45,25 @@ class Toymodel(Base):
         if c1 is None and c2 is None:
             c1, c2 = self.get_cycle_parameters(t)
         
+        c1, c2 = [np.asarray(c)[..., None, None] for c in c1, c2]
+
         return H_0 + c1*sigma_x + c2*sigma_z
 
+    def dH(self, t, c1=None, c2=None, h=1e-6):
+        """Return the derivatives (dH/dc1, dH/dc2) = (sigma_x, sigma_z) (see
+        Base.dH)."""
+
+        if c1 is None and c2 is None:
+            c1, c2 = self.get_cycle_parameters(t)
+
+        shape = np.broadcast(t, c1, c2).shape + (2, 2)
+        sigma_x = np.array([[0,1],
+                            [1,0]], dtype=complex)
+        sigma_z = np.array([[1,0],
+                            [0,-1]], dtype=complex)
+
+        return np.broadcast_to(sigma_x, shape), np.broadcast_to(sigma_z, shape)
+
     def get_cycle_parameters(self, t):
         """Return the loop parameters at time t.
         
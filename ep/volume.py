@@ -0,0 +1,240 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+from itertools import product
+import multiprocessing
+import os
+
+import numpy as np
+
+from ep.sampling import get_eigenvalues
+
+
+def get_tiles(shape, tile_shape):
+    """Return the slices of the tiles which cover an array of the given
+    shape.
+
+        Parameters:
+        -----------
+            shape: tuple of int
+                Shape of the array.
+            tile_shape: tuple of int
+                Maximum shape of a tile.
+
+        Returns:
+        --------
+            tiles: list of tuple of slice
+    """
+
+    ranges = [[slice(n, min(n + m, N)) for n in range(0, N, m)]
+              for N, m in zip(shape, tile_shape)]
+
+    return list(product(*ranges))
+
+
+def get_eigenvalue_discriminant(E):
+    """Return the discriminant prod_(i<j) (E_i - E_j)^2 of the
+    characteristic polynomial from the eigenvalues E with shape (...,M).
+
+    For 2x2 Hamiltonians, this is D = (H11 - H22)^2 + 4*H12*H21 (see
+    ep.locate.get_discriminant), i.e., exceptional lines and surfaces are
+    the zeros of D in the sampled volume.
+    """
+
+    M = E.shape[-1]
+    D = np.ones(E.shape[:-1], dtype=complex)
+    for i in range(M):
+        for j in range(i + 1, M):
+            D *= (E[..., i] - E[..., j])**2
+
+    return D
+
+
+def _sample_tile(args):
+    """Evaluate the eigenvalues and the discriminant on one tile and write
+    them into the memory-mapped output (see sample_volume)."""
+
+    (n, tile, model_class, model_kwargs, z_name,
+     x, y, z, t, directory) = args
+
+    E = np.load(os.path.join(directory, "E.npy"), mmap_mode='r+')
+    D = np.load(os.path.join(directory, "D.npy"), mmap_mode='r+')
+
+    X, Y = np.meshgrid(x[tile[0]], y[tile[1]], indexing='ij')
+    for k, zk in zip(range(tile[2].start, tile[2].stop), z[tile[2]]):
+        kwargs = dict(model_kwargs)
+        kwargs[z_name] = zk
+        Ek = get_eigenvalues(model_class(**kwargs), X, Y, t)
+        E[tile[0], tile[1], k] = Ek
+        D[tile[0], tile[1], k] = get_eigenvalue_discriminant(Ek)
+
+    E.flush()
+    D.flush()
+    del E, D
+
+    return n
+
+
+def _get_model_id(model_class, model_kwargs):
+    """Return a string which identifies the model class and its fixed
+    parameters."""
+
+    kwargs = ", ".join("{0}={1!r}".format(k, v)
+                       for k, v in sorted(model_kwargs.items()))
+
+    return "{0}({1})".format(model_class.__name__, kwargs)
+
+
+def sample_volume(directory, model_class, x, y, z, z_name, t=0.0,
+                  tile_shape=(64, 64, 4), processes=None, verbose=False,
+                  **model_kwargs):
+    """Sample the eigenvalues and the discriminant of the Hamiltonian on
+    the volume spanned by the parameters (x, y) and the model parameter z,
+    e.g., (eps, delta, eta) or (eps, delta, theta).
+
+    The volume is split into tiles which are evaluated in a process pool;
+    each tile is computed with batched eigenvalue solves per z-slice (see
+    ep.sampling.get_eigenvalues) and written directly into .npy files which
+    are memory-mapped, such that the volume does not need to fit into the
+    memory. Finished tiles are recorded in done.npy, and calling
+    sample_volume again with the same arguments resumes the sampling with
+    the remaining tiles; an existing volume sampled with different axes,
+    model parameters or time raises an exception.
+
+    The directory contains
+
+        axes.npz: the axes x, y, z, z_name, tile_shape, the time t and the
+                  model (class name and model_kwargs),
+        E.npy:    (xN,yN,zN,M) eigenvalues, sorted by decreasing real part,
+        D.npy:    (xN,yN,zN) discriminant (see get_eigenvalue_discriminant),
+        done.npy: (tiles,) bool, finished tiles.
+
+        Parameters:
+        -----------
+            directory: str
+                Output directory.
+            model_class: Base subclass
+                Model exposing H(t, x, y), e.g., DirichletReduced.
+            x, y: (xN,), (yN,) ndarray
+                Axes of the parameters (x, y) of H.
+            z: (zN,) ndarray
+                Axis of the model parameter z_name.
+            z_name: str
+                Name of the model parameter, e.g., 'eta' or 'theta'.
+            t: float
+                Time at which to evaluate the Hamiltonian.
+            tile_shape: (3,) tuple of int
+                Maximum shape of a tile.
+            processes: int, optional
+                Number of worker processes (defaults to the number of
+                CPUs); for processes=1 the tiles are evaluated serially.
+            verbose: bool
+                Whether to print the progress.
+            model_kwargs:
+                Fixed model parameters.
+
+        Returns:
+        --------
+            x, y, z: ndarray
+                Axes of the volume.
+            E: (xN,yN,zN,M) memmap
+            D: (xN,yN,zN) memmap
+    """
+
+    x, y, z = [np.asarray(u, dtype=float) for u in x, y, z]
+    shape = (len(x), len(y), len(z))
+    tiles = get_tiles(shape, tile_shape)
+
+    M = model_class(**dict(model_kwargs, **{z_name: z[0]}))._n_states
+
+    paths = dict((name, os.path.join(directory, name + ".npy"))
+                 for name in ("E", "D", "done"))
+    axes = os.path.join(directory, "axes.npz")
+
+    model = _get_model_id(model_class, model_kwargs)
+
+    if os.path.exists(axes):
+        previous = np.load(axes)
+        same = (all(k in previous.files for k in ("model", "t")) and
+                str(previous['model']) == model and
+                float(previous['t']) == t and
+                str(previous['z_name']) == z_name and
+                np.array_equal(previous['tile_shape'], tile_shape) and
+                all(np.array_equal(previous[k], u)
+                    for k, u in zip("xyz", (x, y, z))))
+        done = np.load(paths['done'])
+        if not same:
+            raise Exception(("Error: {0} contains a different "
+                             "volume!").format(directory))
+    else:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        open_memmap = np.lib.format.open_memmap
+        for name, s in (("E", shape + (M,)), ("D", shape)):
+            a = open_memmap(paths[name], mode='w+', dtype=complex, shape=s)
+            a[:] = np.nan
+            del a
+        done = np.zeros(len(tiles), dtype=bool)
+        np.save(paths['done'], done)
+        # written last: the volume is initialized
+        np.savez(axes, x=x, y=y, z=z, z_name=z_name, tile_shape=tile_shape,
+                 model=model, t=t)
+
+    todo = [(n, tile, model_class, model_kwargs, z_name, x, y, z, t,
+             directory) for n, tile in enumerate(tiles) if not done[n]]
+
+    if processes == 1:
+        results = (_sample_tile(args) for args in todo)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_sample_tile, todo)
+
+    try:
+        for count, n in enumerate(results, 1):
+            done[n] = True
+            np.save(paths['done'], done)
+            if verbose:
+                print "tile {0}/{1} ({2} remaining)".format(
+                    n + 1, len(tiles), len(todo) - count)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return load_volume(directory)
+
+
+def load_volume(directory, mode='r'):
+    """Return the axes and the memory-mapped data of a volume written by
+    sample_volume.
+
+        Parameters:
+        -----------
+            directory: str
+                Output directory of sample_volume.
+            mode: str
+                Memory-map mode (e.g., 'r' or 'r+').
+
+        Returns:
+        --------
+            x, y, z: ndarray
+                Axes of the volume.
+            E: (xN,yN,zN,M) memmap
+            D: (xN,yN,zN) memmap
+    """
+
+    axes = np.load(os.path.join(directory, "axes.npz"))
+    done = np.load(os.path.join(directory, "done.npy"))
+    if not done.all():
+        print "Warning: {0}/{1} tiles of {2} are missing!".format(
+            (~done).sum(), len(done), directory)
+
+    E, D = [np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+            for name in ("E", "D")]
+
+    return axes['x'], axes['y'], axes['z'], E, D
+
+
+if __name__ == '__main__':
+    pass
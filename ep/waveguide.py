@@ -4,10 +4,11 @@ import numpy as np
 from numpy import pi
 from scipy import interpolate, integrate
 from scipy.integrate import cumtrapz
+from scipy.interpolate import CubicSpline
 
 from ep.base import Base
 from ep.dissipation import Gamma_Gauss
-from ep.helpers import c_eig
+from ep.helpers import c_eig, c_matrix
 
 
 class Waveguide(Base):
@@ -37,6 +38,7 @@ class Waveguide(Base):
         self.N = N
         self.eta = eta
         self.theta = theta
+        self.linearized = False
 
         self.k = lambda n: np.sqrt(N**2 - n**2)*np.pi/W
         self.kF = N*np.pi/W
@@ -145,35 +147,163 @@ class Waveguide(Base):
         if boundary_phase is None:
             boundary_phase = 0.0
 
-        # reverse x-coordinate for backward propagation
-        # corresponds to x -> L - x
-        if self.loop_direction == '+':
-            x = L - x
-
         if self.linearized:
             print "Phase linearized!"
-            phi = cumtrapz(self.kr + delta,
-                           x=self.t, dx=self.dt, initial=0.0)
-            xi_lower = eps*np.sin(phi - theta/2.)
-            xi_upper = W + eps*np.sin(phi + theta/2.)
-        else:
-            xi_lower = eps*np.sin((kr + delta)*x + boundary_phase)
-            xi_upper = W + eps*np.sin((kr + delta)*x + theta + boundary_phase)
-
-        if smearing:
-            def fermi(x, sigma):
-                return 1./(1. + np.exp(-x/sigma))
-            s = 0.500
-            # pre = fermi(x-3.*s, s)*fermi(L-x-3.*s, s)
-            pre = fermi(x-4.*s, s)*fermi(L-x-4.*s, s)
-            xi_lower *= pre
-            xi_upper = pre*(xi_upper - W) + W
 
-        return xi_lower, xi_upper
+        return get_boundaries(x, eps, delta, L, W, kr, theta=theta,
+                              boundary_phase=boundary_phase,
+                              loop_direction=self.loop_direction,
+                              smearing=smearing, linearized=self.linearized,
+                              t=self.t if self.linearized else None)
 
     def wavefunction(self):
         pass
 
+    def _get_wavefunction_modes(self, evecs=False):
+        """Return the expansion of the wavefunction in transverse modes,
+
+            PHI(x,y) = sum_j c_j(x) * exp(-1j*kx_j*x) * chi_j(y),
+
+        with chi_j(y) = sin(q_j*y) or cos(q_j*y). Overwritten by inheriting
+        classes.
+
+            Returns:
+            --------
+                c: (N,J) ndarray
+                    Mode coefficients on the time grid self.t.
+                q, kx: (J,) ndarray
+                    Transverse and longitudinal wavenumbers.
+                sine: (J,) ndarray of bool
+                    Whether chi_j is a sine (or a cosine) profile.
+        """
+        raise Exception(("Error: wavefunction not implemented "
+                         "for {0}!").format(self.__class__.__name__))
+
+    def _get_wavefunction_y(self, ny=None):
+        """Return the default transverse grid of the wavefunction."""
+
+        if ny is None:
+            ny = int(len(self.t)/self.L)
+
+        return np.linspace(0, self.W, ny)
+
+    def _synthesize_wavefunction(self, x, y, c, q, kx, sine, shift,
+                                 intensity=False):
+        """Evaluate the mode expansion of _get_wavefunction_modes on the grid
+        (x, y) with the transverse profiles shifted by shift(x).
+
+        Since sin(q*(y - s)) and cos(q*(y - s)) decompose into products of
+        sin(q*y), cos(q*y) and functions of s(x), PHI is the sum of two
+        outer products and no meshgrid temporaries are needed. Points
+        outside the waveguide are set to NaN.
+
+            Returns:
+            --------
+                PHI: (ny,nx) ndarray
+                    PHI or abs(PHI)**2 (intensity=True).
+        """
+
+        coef = c*np.exp(-1j*kx*x[:, None])
+        qs = q*shift[:, None]
+        cos_qs, sin_qs = np.cos(qs), np.sin(qs)
+
+        qy = q*y[:, None]
+        sin_qy, cos_qy = np.sin(qy), np.cos(qy)
+
+        PHI = (sin_qy.dot((coef*np.where(sine, cos_qs, sin_qs)).T) +
+               cos_qy.dot((coef*np.where(sine, -sin_qs, cos_qs)).T))
+
+        if intensity:
+            PHI = PHI.real**2 + PHI.imag**2
+
+        ys = y[:, None] - shift
+        PHI[(ys < 0) | (ys > self.W)] = np.nan
+
+        return PHI
+
+    def iter_wavefunction(self, evecs=False, with_boundary=False,
+                          intensity=False, x_step=1, ny=None, y=None,
+                          tile_size=2048):
+        """Yield the wavefunction PHI(x,y) in tiles along x.
+
+        Only the mode coefficients on the (decimated) time grid are kept in
+        memory; each tile has the shape (ny, tile_size).
+
+            Parameters:
+            -----------
+                evecs: bool or str
+                    Coefficients of the mode expansion (see wavefunction).
+                with_boundary: bool
+                    Whether to follow the modulated boundary.
+                intensity: bool
+                    Whether to return abs(PHI)**2 instead of PHI.
+                x_step: int
+                    Decimation of the time grid self.t.
+                ny: int, optional
+                    Number of points of the default transverse grid.
+                y: ndarray, optional
+                    Transverse grid.
+                tile_size: int
+                    Number of x-points per tile.
+
+            Yields:
+            -------
+                x: (nx,) ndarray
+                y: (ny,) ndarray
+                PHI: (ny,nx) ndarray
+        """
+
+        c, q, kx, sine = self._get_wavefunction_modes(evecs)
+        x = self.t[::x_step]
+        c = np.asarray(c[::x_step], dtype=complex)
+        if y is None:
+            y = self._get_wavefunction_y(ny)
+
+        if with_boundary:
+            # greens_code counts from top
+            shift = -self.get_boundary(x=x)[0]
+        else:
+            shift = np.zeros_like(x)
+
+        for n in range(0, len(x), tile_size):
+            tile = slice(n, n + tile_size)
+            PHI = self._synthesize_wavefunction(x[tile], y, c[tile], q, kx,
+                                                sine, shift[tile],
+                                                intensity=intensity)
+            yield x[tile], y, PHI
+
+    def write_wavefunction(self, filename, evecs=False, with_boundary=False,
+                           intensity=True, x_step=1, ny=None, y=None,
+                           tile_size=2048):
+        """Write the wavefunction PHI(x,y) tile by tile into a
+        memory-mapped .npy file (see iter_wavefunction for the parameters).
+
+            Returns:
+            --------
+                x: (nx,) ndarray
+                y: (ny,) ndarray
+                PHI: (ny,nx) memmap
+                    PHI (complex) or abs(PHI)**2 (float, intensity=True).
+        """
+
+        if y is None:
+            y = self._get_wavefunction_y(ny)
+        x = self.t[::x_step]
+
+        dtype = float if intensity else complex
+        PHI = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype,
+                                        shape=(len(y), len(x)))
+
+        n = 0
+        for x_tile, _, PHI_tile in self.iter_wavefunction(
+                evecs=evecs, with_boundary=with_boundary, intensity=intensity,
+                x_step=x_step, y=y, tile_size=tile_size):
+            PHI[:, n:n + len(x_tile)] = PHI_tile
+            n += len(x_tile)
+        PHI.flush()
+
+        return x, y, PHI
+
     def get_boundary_contour(self, X, Y):
         """Get the boundary contour."""
 
@@ -185,9 +315,146 @@ class Waveguide(Base):
         return X, Y, Z
 
 
-class Dirichlet(Waveguide):
+class _DirichletMixin:
+    """Hamiltonian matrix and Bloch-mode nodes shared by Dirichlet,
+    DirichletReduced and DirichletSpec, which provide the attributes k, kF,
+    k0, k1, kr, W, theta and B0."""
+
+    # whether the Hamiltonian is the one of DirichletReduced
+    reduced = False
+
+    def _get_coupling(self):
+        """Return the coupling B0 of the modes n = 1, 2."""
+
+        return (-1j * (np.exp(1j*self.theta) + 1) * np.pi**2 /
+                self.W**3 / np.sqrt(self.k0*self.k1))
+
+    def _get_matrix(self, eps, delta, eta):
+        """Return the Hamiltonian of Dirichlet (or DirichletReduced) at the
+        parameters (eps, delta) and the dissipation coefficient eta."""
+
+        loss0 = 1j*eta/2.*self.kF/self.k0
+        loss1 = 1j*eta/2.*self.kF/self.k1
+
+        if self.reduced:
+            H11 = delta - loss0
+            H12 = np.abs(self.B0)*eps
+            H21 = H12
+            H22 = -loss1
+        else:
+            B = self.B0
+            H11 = -self.k0 - loss0
+            H12 = B*eps
+            H21 = B.conj()*eps
+            H22 = -self.k0 - delta - loss1
+
+        return c_matrix(H11, H12, H21, H22)
+
+    def get_nodes(self, x=None, y=None, return_evecs=False):
+        """Return the nodes of the Bloch-eigenvector in the unit cell."""
+
+        if not self.loop_type == 'Constant':
+            raise Exception("Error: loop_type not 'Constant'!")
+
+        k = self.k
+        kr = self.kr
+        W = self.W
+
+        evals, evecs = c_eig(self.H(0, x, y))
+
+        j0 = 0
+        j1 = 1
+        b1, b2 = [evecs[i, j0] for i in (0, 1)]
+        # if b1.imag > 0 or b2.imag < 0:
+        if y <= 0:
+            b1, b2 = [evecs[i, j1] for i in (0, 1)]
+            evecs[:, 0], evecs[:, 1] = evecs[:, 1], evecs[:, 0].copy()
+            evals[0], evals[1] = evals[1], evals[0]
+
+        # # write eigensystem to file
+        # with open("evecs_{}_{}.dat".format(self.loop_direction,
+        #                                    self.init_state), "a") as f:
+        #     ev = evals
+        #     e = evecs
+        #     data = (ev[0].real, ev[0].imag, ev[1].real, ev[1].imag,
+        #             e[0,0].real, e[0,0].imag, e[1,0].real, e[1,0].imag,
+        #             e[0,1].real, e[0,1].imag, e[1,1].real, e[1,1].imag)
+        #     np.savetxt(f, data, newline="  ", fmt='%.5e')
+        #     f.write("\n")
+
+        xn, yn = get_nodes(b1, b2, k, kr, W)
+
+        # # write coordinates to file
+        # with open("coords_{}_{}.dat".format(self.loop_direction,
+        #                                     self.init_state), "a") as f:
+        #     data = (xn[0], yn[0], xn[1], yn[1])
+        #     np.savetxt(f, data, newline="  ", fmt='%.5e')
+        #     f.write("\n")
+
+        # mark invalid node coordinates with np.nan
+        # -> caught in DirichletPositionDependentLoss._get_EP_coordinates where
+        # G is set to zero for invalid points
+        # if np.any(xn < 0.) or np.any(xn > 2.*pi/kr) :
+        #     xn *= np.nan
+        # if np.any(yn < 0.) or np.any(yn > W):
+        #     yn *= np.nan
+
+        if self.verbose:
+            print "evec_x =", b1
+            print "evec_y =", b2
+            print "node xn", xn
+            print "node yn", yn
+
+        if not return_evecs:
+            return np.asarray(zip(xn, yn))
+        else:
+            return evecs
+
+    def get_nodes_stack(self, x, y):
+        """Vectorized version of get_nodes for arrays of parameters (x, y),
+        e.g., for all unit cells of a waveguide.
+
+        The eigenvector is selected as in get_nodes: by the larger real part
+        of the eigenvalue (see _get_node_eigenvector_index), and by
+        scipy.linalg.eig where the selection of get_nodes depends on the
+        LAPACK ordering of the eigenvalues (see _is_lapack_ordered).
+
+            Parameters:
+            -----------
+                x, y: float or ndarray
+                    Parameters (eps, delta).
+
+            Returns:
+            --------
+                xn, yn: (...,2) ndarray
+                    Node coordinates in the unit cell (NaN for invalid
+                    nodes).
+        """
+
+        if not self.loop_type == 'Constant':
+            raise Exception("Error: loop_type not 'Constant'!")
+
+        H = self.H(0, x, y)
+        eVals, eVecs = c_eig(H)
+        j = _get_node_eigenvector_index(eVals)[..., None, None]
+        b = np.take_along_axis(eVecs, j, axis=-1)[..., 0]
+
+        # where the selection of get_nodes depends on the LAPACK ordering,
+        # use scipy.linalg.eig as in get_nodes
+        x, y = np.broadcast_arrays(x, y)
+        scalar = _is_lapack_ordered(H, self.H(0, x, np.zeros_like(y)), eVals)
+        if scalar.any():
+            b[scalar] = [c_eig(Hn)[1][:, 1 if yn <= 0 else 0]
+                         for Hn, yn in zip(H[scalar], y[scalar])]
+
+        return get_nodes(b[..., 0], b[..., 1], self.k, self.kr, self.W)
+
+
+class Dirichlet(Waveguide, _DirichletMixin):
     """Dirichlet class."""
 
+    _vectorized_H = True
+
     def __init__(self, tqd=False, linearized=False, switch_losses_on_off=False,
                  eta0=0.0, **waveguide_kwargs):
         """Exceptional Point (EP) waveguide class with Dirichlet boundary
@@ -219,9 +486,7 @@ class Dirichlet(Waveguide):
         kr = k0 - k1
         self.kr = kr
 
-        B = (-1j * (np.exp(1j*self.theta) + 1) * np.pi**2 /
-             self.W**3 / np.sqrt(self.k0*self.k1))
-        self.B0 = B
+        self.B0 = self._get_coupling()
 
         self.x_EP, self.y_EP = self._get_EP_coordinates()
 
@@ -260,11 +525,15 @@ class Dirichlet(Waveguide):
 
             Parameters:
             ----------
-                t: float
+                t: float or ndarray
                     Time at which to evaluate the Hamiltonian.
-                x, y: float (optional)
+                x, y: float or ndarray (optional)
                     Parameters for (eps, delta). If None, (eps, delta) are
                     obtained from the get_cycle_parameters method at time t.
+
+            Returns:
+            --------
+                H: (2,2) ndarray or (...,2,2) ndarray for array arguments
         """
         if x is None and y is None:
             eps, delta = self.get_cycle_parameters(t)
@@ -275,7 +544,7 @@ class Dirichlet(Waveguide):
             if not self._tqd_already_calculated:
                 self.tqd_arrays = self.get_quantum_driving_parameters()
                 self._tqd_already_calculated = True
-            idx = (np.abs(self.t - t)).argmin()
+            idx = (np.abs(self.t - np.asarray(t)[..., None])).argmin(axis=-1)
             eps, delta, theta = [a[idx] for a in self.tqd_arrays]
         else:
             theta = self.theta
@@ -287,16 +556,28 @@ class Dirichlet(Waveguide):
         else:
             eta = self.eta
 
+        return self._get_matrix(eps, delta, eta)
+
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the analytic derivatives (dH/deps, dH/ddelta) (see
+        Base.dH); for tqd and switch_losses_on_off, central differences are
+        used."""
+
+        if self.tqd or self.switch_losses_on_off:
+            return Base.dH(self, t, x, y, h=h)
+
+        if x is None and y is None:
+            eps, delta = self.get_cycle_parameters(t)
+        else:
+            eps, delta = x, y
+
+        zero = np.zeros(np.broadcast(t, eps, delta).shape)
         B = self.B0
 
-        H11 = -self.k0 - 1j*eta/2.*self.kF/self.k0
-        H12 = B*eps
-        H21 = B.conj()*eps
-        H22 = -self.k0 - delta - 1j*eta/2.*self.kF/self.k1
+        H_x = c_matrix(zero, B + zero, B.conj() + zero, zero)
+        H_y = c_matrix(zero, zero, zero, zero - 1.)
 
-        H = np.array([[H11, H12],
-                      [H21, H22]], dtype=complex)
-        return H
+        return H_x, H_y
 
     def get_quantum_driving_parameters(self):
         """Return the adapted parameters (eps_prime, delta, theta_prime) to
@@ -330,90 +611,16 @@ class Dirichlet(Waveguide):
 
         return eps_prime, delta, theta_prime
 
-    def get_nodes(self, x=None, y=None, return_evecs=False):
-        """Return the nodes of the Bloch-eigenvector in the unit cell."""
-
-        if not self.loop_type == 'Constant':
-            raise Exception("Error: loop_type not 'Constant'!")
-
-        k = self.k
-        kr = self.kr
-        W = self.W
-
-        evals, evecs = c_eig(self.H(0, x, y))
+    def _get_wavefunction_modes(self, evecs=False):
+        """Return the expansion of the wavefunction in the modes n = 1, 2
+        (see Waveguide._get_wavefunction_modes)."""
 
-        j0 = 0
-        j1 = 1
-        b1, b2 = [evecs[i, j0] for i in (0, 1)]
-        # if b1.imag > 0 or b2.imag < 0:
-        if y <= 0:
-            b1, b2 = [evecs[i, j1] for i in (0, 1)]
-            evecs[:, 0], evecs[:, 1] = evecs[:, 1], evecs[:, 0]
-            evals[0], evals[1] = evals[1], evals[0]
-
-        # # write eigensystem to file
-        # with open("evecs_{}_{}.dat".format(self.loop_direction,
-        #                                    self.init_state), "a") as f:
-        #     ev = evals
-        #     e = evecs
-        #     data = (ev[0].real, ev[0].imag, ev[1].real, ev[1].imag,
-        #             e[0,0].real, e[0,0].imag, e[1,0].real, e[1,0].imag,
-        #             e[0,1].real, e[0,1].imag, e[1,1].real, e[1,1].imag)
-        #     np.savetxt(f, data, newline="  ", fmt='%.5e')
-        #     f.write("\n")
-
-        def x0(s):
-            """Return x-coordinates in unit cell.  Only valid for boundary
-            phase parameter vartheta = 0."""
-            return (2.*pi/kr * (1+s)/2 - 1j/kr *
-                    np.log(-s*np.exp(-1j*np.pi/2)*b1*b2.conj() / (abs(b1)*abs(b2))))
-
-        # def x0(s):
-        #     """Return x-coordinates in unit cell.  Only valid for boundary
-        #     phase parameter vartheta = 0."""
-        #     return s*np.pi/(2.*kr) + (1.-s)/2. * 2.*pi/kr
-
-        def y0(s):
-            """Return y-coordinates in unit cell."""
-            return W/pi*np.arccos(s*0.5*np.sqrt(k(2)/k(1))*abs(b1/b2))
-
-        xn = np.asarray([x0(n) for n in (+1, -1)])
-        yn = np.asarray([y0(n) for n in (-1, +1)])
-
-        # # write coordinates to file
-        # with open("coords_{}_{}.dat".format(self.loop_direction,
-        #                                     self.init_state), "a") as f:
-        #     data = (xn[0], yn[0], xn[1], yn[1])
-        #     np.savetxt(f, data, newline="  ", fmt='%.5e')
-        #     f.write("\n")
-
-        # mark invalid node coordinates with np.nan
-        # -> caught in DirichletPositionDependentLoss._get_EP_coordinates where
-        # G is set to zero for invalid points
-        # if np.any(xn < 0.) or np.any(xn > 2.*pi/kr) :
-        #     xn *= np.nan
-        # if np.any(yn < 0.) or np.any(yn > W):
-        #     yn *= np.nan
-
-        if self.verbose:
-            print "evec_x =", b1
-            print "evec_y =", b2
-            print "node xn", xn
-            print "node yn", yn
-
-        if not return_evecs:
-            return np.asarray(zip(xn, yn))
-        else:
-            return evecs
-
-    def wavefunction(self, evecs=False, with_boundary=False):
-        """Return the wavefunction Psi(x,y)."""
         if evecs == 'a':
             b0, b1 = [self.eVecs_r[:, n, 0] for n in (0, 1)]
         elif evecs == 'b':
             b0, b1 = [self.eVecs_r[:, n, 1] for n in (0, 1)]
         elif evecs == 'c':
-            b0, b1 = [self.eVecs_r[:, n, 0] for n in (0, 1)]
+            b0, b1 = [np.array(self.eVecs_r[:, n, 0]) for n in (0, 1)]
             b2, b3 = [self.eVecs_r[:, n, 1] for n in (0, 1)]
 
             mask = np.logical_or(b0.imag > 0, b1.imag <= 0)
@@ -421,28 +628,47 @@ class Dirichlet(Waveguide):
         else:
             b0, b1 = self.phi_a, self.phi_b
 
+        c = np.stack((b0, b1*np.sqrt(self.k0/self.k1)), axis=-1)
+        q = np.array([1., 2.])*pi/self.W
+        kx = np.array([0., self.kr])
+        sine = np.array([True, True])
+
+        return c, q, kx, sine
+
+    def _get_wavefunction_y(self, ny=None):
+        """Return the default transverse grid of the wavefunction."""
+
+        if ny is None:
+            ny = int(len(self.t)/self.L)
+
+        return np.linspace(-2.*self.x_R0, self.W + 2*self.x_R0, ny)
+
+    def wavefunction(self, evecs=False, with_boundary=False):
+        """Return the wavefunction Psi(x,y).
+
+        For long waveguides, see iter_wavefunction and write_wavefunction,
+        which avoid the (x,y) meshgrids.
+        """
+
         x = self.t
-        y = np.linspace(-2.*self.x_R0, self.W + 2*self.x_R0, len(x)/self.L)
+        y = self._get_wavefunction_y()
 
+        shift = np.zeros_like(x)
+        if with_boundary:
+            # greens_code counts from top
+            shift = -self.get_boundary(x=x)[0]
+
+        PHI = self._synthesize_wavefunction(
+            x, y, *self._get_wavefunction_modes(evecs), shift=shift)
         X, Y = np.meshgrid(x, y)
 
-        xi_lower, xi_upper = self.get_boundary(x=X)
-        xi_lower *= -1  # greens_code counts from top
-        xi_upper = self.W + xi_lower  # greens_code counts from top
-        if with_boundary:
-            Y -= xi_lower
-        PHI = (b0 * np.sin(pi/self.W*Y) +
-               b1 * np.sqrt(self.k0/self.k1) *
-               np.sin(2*np.pi/self.W*Y)*np.exp(-1j*self.kr*X))
-        if with_boundary:
-            Y += xi_lower
-            PHI[np.logical_or(Y > xi_upper, Y < xi_lower)] = np.nan
-        else:
-            PHI[np.logical_or(Y > self.W, Y < 0)] = np.nan
         return X, Y, PHI
 
 
 class DirichletReduced(Dirichlet):
+
+    reduced = True
+
     def __init__(self, **dirichlet_kwargs):
         Dirichlet.__init__(self, **dirichlet_kwargs)
 
@@ -457,21 +683,90 @@ class DirichletReduced(Dirichlet):
         else:
             eta = self.eta
 
-        H11 = delta - 1j*eta/2. * self.kF/self.k0
-        H12 = np.abs(self.B0)*eps
-        H21 = H12
-        H22 = -1j*eta/2. * self.kF/self.k1
+        return self._get_matrix(eps, delta, eta)
 
-        H = np.array([[H11, H12],
-                      [H21, H22]], dtype=complex)
-        return H
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the analytic derivatives (dH/deps, dH/ddelta) (see
+        Base.dH); for tqd and switch_losses_on_off, central differences are
+        used."""
+
+        if self.tqd or self.switch_losses_on_off:
+            return Base.dH(self, t, x, y, h=h)
+
+        if x is None and y is None:
+            eps, delta = self.get_cycle_parameters(t)
+        else:
+            eps, delta = x, y
+
+        zero = np.zeros(np.broadcast(t, eps, delta).shape)
+        B = np.abs(self.B0)
+
+        H_x = c_matrix(zero, B + zero, B + zero, zero)
+        H_y = c_matrix(zero + 1., zero, zero, zero)
+
+        return H_x, H_y
+
+
+class DirichletSpec(_DirichletMixin):
+    """Constant-parameter Dirichlet Hamiltonian.
+
+    Lightweight replacement of a Dirichlet or DirichletReduced instance with
+    loop_type 'Constant' which is only used to evaluate H(t, x, y) and the
+    nodes at given parameters (x, y): no time grid or buffers are
+    allocated.
+    """
+
+    loop_type = 'Constant'
+
+    def __init__(self, N=2.5, W=1.0, theta=0.0, eta=0.0, reduced=False,
+                 verbose=False):
+        """Parameters:
+           -----------
+                N: float
+                    Number of open modes.
+                W: float
+                    Waveguide width.
+                theta: float
+                    Phase difference between upper and lower boundary.
+                eta: float
+                    Dissipation coefficient.
+                reduced: bool
+                    Whether to use the Hamiltonian of DirichletReduced.
+                verbose: bool
+                    Whether to return additional output.
+        """
+        self.N = N
+        self.W = W
+        self.theta = theta
+        self.eta = eta
+        self.reduced = reduced
+        self.verbose = verbose
+
+        self.kF = N*np.pi/W
+        self.k0, self.k1 = [self.k(n) for n in 1, 2]
+        self.kr = self.k0 - self.k1
+        self.B0 = self._get_coupling()
+
+    def k(self, n):
+        return np.sqrt(self.N**2 - n**2)*np.pi/self.W
+
+    def H(self, t, x, y):
+        """Return the Hamiltonian of Dirichlet (or DirichletReduced) at the
+        parameters (x, y) = (eps, delta); t is ignored."""
+
+        return self._get_matrix(x, y, self.eta)
 
 
 class DirichletPositionDependentLoss(Dirichlet):
     """Dirichlet class with position dependent loss."""
 
+    _vectorized_H = False
+
+    # maximum number of refinements of the loss matrix table
+    _loss_table_max_refinements = 10
+
     def __init__(self, eta0=0.0, sigma=1e-2, switch_losses_on_off=False,
-                 **waveguide_kwargs):
+                 loss_table=True, loss_table_rtol=1e-10, **waveguide_kwargs):
         """Exceptional Point (EP) waveguide class with Dirichlet boundary
         conditons and position dependent losses.
 
@@ -483,25 +778,43 @@ class DirichletPositionDependentLoss(Dirichlet):
                     Constant loss strength.
                 sigma: float
                     Standard deviation of the Gaussian loss potential.
+                loss_table: bool
+                    Whether to tabulate the loss matrix on the trajectory
+                    once and interpolate it in H(t) instead of evaluating it
+                    at every call.
+                loss_table_rtol: float
+                    Maximum interpolation error of the tabulated loss matrix
+                    relative to its largest element.
         """
         Dirichlet.__init__(self, **waveguide_kwargs)
-        dirichlet_kwargs = waveguide_kwargs.copy()
 
         self.eta0 = eta0
         self.sigma = sigma
         self.switch_losses_on_off = switch_losses_on_off
-        dirichlet_kwargs.update({'loop_type': 'Constant',
-                                 'eta': 0.0})
-        self.Dirichlet = Dirichlet(**dirichlet_kwargs)
+        self.loss_table = loss_table
+        self.loss_table_rtol = loss_table_rtol
+        self._loss_table = {}
+        self.Dirichlet = DirichletSpec(N=self.N, W=self.W, theta=self.theta,
+                                       verbose=self.verbose)
         self._get_EP_coordinates()
 
+    def _get_gamma(self):
+        """Return the Gamma_Gauss instance for the current loss width (the
+        mode tables are only computed once)."""
+        Gamma = getattr(self, '_gamma', None)
+        if Gamma is None or Gamma.sigmax != self.sigma:
+            Gamma = self._gamma = Gamma_Gauss(k=self.k, kF=self.kF,
+                                              kr=self.kr, W=self.W,
+                                              sigmax=self.sigma,
+                                              sigmay=self.sigma)
+        return Gamma
+
     def _get_loss_matrix(self, x=None, y=None):
-        Gamma = Gamma_Gauss(k=self.k, kF=self.kF, kr=self.kr, W=self.W,
-                            sigmax=self.sigma, sigmay=self.sigma)
+        Gamma = self._get_gamma()
         self.nodes = self.Dirichlet.get_nodes(x=x, y=y)
 
         if np.any(np.isnan(self.nodes)):
-            G = np.zeros((2, 2))
+            G = np.zeros((2, 2), dtype=complex)
         else:
             G1, G2 = [Gamma.get_matrix(x0, y0) for (x0, y0) in self.nodes]
             G = G1 + G2
@@ -522,6 +835,130 @@ class DirichletPositionDependentLoss(Dirichlet):
 
         return G
 
+    def _get_loss_matrix_stack(self, x, y):
+        """Vectorized version of _get_loss_matrix for arrays x, y.
+
+            Returns:
+            --------
+                G: (...,2,2) ndarray
+        """
+
+        Gamma = self._get_gamma()
+        xn, yn = self.Dirichlet.get_nodes_stack(x, y)
+
+        G = sum(Gamma.get_matrix(xn[..., n], yn[..., n]) for n in (0, 1))
+
+        invalid = np.any(np.isnan(xn) | np.isnan(yn), axis=-1)
+        G[invalid] = 0.
+
+        return G
+
+    def _build_loss_table(self):
+        """Tabulate the loss matrix on the trajectory.
+
+        The loss matrix is evaluated on the time grid self.t and represented
+        by piecewise cubic splines; the grid is refined locally until the
+        interpolation error at the interval midpoints is below
+        loss_table_rtol (relative to the largest matrix element). Between
+        invalid node configurations, where the loss matrix vanishes, and
+        valid ones the loss matrix is discontinuous: such intervals, and
+        intervals where the refinement does not converge, are not
+        interpolated but evaluated exactly.
+
+        The vectorized evaluation is checked against _get_loss_matrix at a
+        few points; if they disagree, the table is built from
+        _get_loss_matrix.
+        """
+
+        t = np.asarray(self.t, dtype=float)
+
+        def get_loss_matrix(t):
+            x, y = self.get_cycle_parameters(t)
+            return self._get_loss_matrix_stack(x, y)
+
+        # check the vectorized evaluation
+        t_check = t[np.linspace(0, len(t) - 1, 7).astype(int)]
+        G_check = [self._get_loss_matrix(*self.get_cycle_parameters(tn))
+                   for tn in t_check]
+        if not np.allclose(get_loss_matrix(t_check), G_check,
+                           rtol=self.loss_table_rtol, atol=1e-14):
+            def get_loss_matrix(t):
+                return np.asarray([
+                    self._get_loss_matrix(*self.get_cycle_parameters(tn))
+                    for tn in t])
+
+        G = get_loss_matrix(t)
+        for npass in range(self._loss_table_max_refinements + 1):
+            valid = np.any(G != 0., axis=(-1, -2))
+            # label the segments of consecutive valid points
+            segment = np.cumsum(np.append(True, valid[1:] != valid[:-1]))
+            splines = {}
+            for n in np.unique(segment[valid]):
+                idx = segment == n
+                if idx.sum() > 1:
+                    splines[n] = CubicSpline(t[idx], G[idx], axis=0)
+
+            # intervals which are evaluated exactly
+            exact = valid[1:] != valid[:-1]
+            interpolated = np.flatnonzero(valid[1:] & valid[:-1])
+            if not len(interpolated):
+                break
+
+            t_mid = 0.5*(t[interpolated] + t[interpolated + 1])
+            G_mid = get_loss_matrix(t_mid)
+            G_int = np.empty_like(G_mid)
+            for n, spline in splines.items():
+                idx = segment[interpolated] == n
+                G_int[idx] = spline(t_mid[idx])
+
+            scale = np.abs(G).max()
+            err = np.abs(G_int - G_mid).max(axis=(-1, -2))
+            refine = err > self.loss_table_rtol*scale
+            if not np.any(refine):
+                break
+            elif npass == self._loss_table_max_refinements:
+                # no convergence, e.g., close to a singularity of the nodes
+                exact[interpolated[refine]] = True
+                break
+
+            t = np.append(t, t_mid[refine])
+            G = np.concatenate((G, G_mid[refine]))
+            order = np.argsort(t)
+            t, G = t[order], G[order]
+
+        return {'key': self._get_loss_table_key(),
+                't': t,
+                'valid': valid,
+                'exact': exact,
+                'segment': segment,
+                'splines': splines}
+
+    def _get_loss_table_key(self):
+        """Return the parameters the tabulated loss matrix depends on."""
+        return tuple(getattr(self, k, None)
+                     for k in ('loop_type', 'loop_direction', 'x_R0', 'y_R0',
+                               'init_phase', 'L', 'T', 'w', 'W', 'N',
+                               'sigma', 'tN'))
+
+    def _interpolate_loss_matrix(self, t):
+        """Return the loss matrix at time t from the tabulated values."""
+
+        table = self._loss_table
+        if not table or table['key'] != self._get_loss_table_key():
+            table = self._loss_table = self._build_loss_table()
+
+        t_grid = table['t']
+        n = np.searchsorted(t_grid, t, side='right') - 1
+        n = min(n, len(t_grid) - 2)
+
+        if t < t_grid[0] or t > t_grid[-1] or table['exact'][n]:
+            # outside of the table, discontinuities and singularities
+            return self._get_loss_matrix(*self.get_cycle_parameters(t))
+        elif not table['valid'][n]:
+            return np.zeros((2, 2), dtype=complex)
+        else:
+            return table['splines'][table['segment'][n]](t)
+
     # def _get_EP_coordinates(self, x=None, y=None):
     #     return x, y
         # merge with DirichletNumericPotential?
@@ -546,7 +983,10 @@ class DirichletPositionDependentLoss(Dirichlet):
         else:
             eps, delta = x, y
 
-        Gamma_matrix = self._get_loss_matrix(x=eps, y=delta)
+        if x is None and y is None and self.loss_table and not self.verbose:
+            Gamma_matrix = self._interpolate_loss_matrix(t)
+        else:
+            Gamma_matrix = self._get_loss_matrix(x=eps, y=delta)
 
         # damping coefficient
         # eps0 = 0.25*self.x_R0
@@ -586,6 +1026,13 @@ class DirichletPositionDependentLoss(Dirichlet):
 
         return H
 
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the derivatives (dH/deps, dH/ddelta) by central
+        differences (see Base.dH), since the loss matrix depends on (eps,
+        delta)."""
+
+        return Base.dH(self, t, x, y, h=h)
+
     def get_nodes_waveguide(self, x=None):
         """Return the nodes of the Bloch-eigenvector in the full waveguide."""
 
@@ -597,24 +1044,15 @@ class DirichletPositionDependentLoss(Dirichlet):
         L_sum = L #np.cumsum(L)
         # L_sum -= L_sum[0]
 
-        xnodes, ynodes = [], []
-        for epsn, deltan, xn, Ln_sum in zip(eps, delta, x, L_sum):
-            print "epsn, deltan, xn, Ln_sum", epsn, deltan, xn, Ln_sum
-            Ln = 2.*np.pi/np.abs(self.kr + deltan)
-            wgn_kwargs = {'N': self.N,
-                          'loop_direction': self.loop_direction,
-                          'loop_type': 'Constant',
-                          'init_state': self.init_state,
-                          'eta': 0.0,
-                          'L': Ln,
-                          'x_R0': epsn,
-                          'y_R0': deltan}
-            WGn = Dirichlet(**wgn_kwargs)
-            nodes = WGn.get_nodes(x=epsn, y=deltan)
-            xnodes.append(nodes[:, 0] + Ln_sum)
-            ynodes.append(nodes[:, 1])
-
-        xnodes, ynodes = [np.asarray(v).flatten() for v in xnodes, ynodes]
+        # the nodes of each unit cell are those of a lossless Dirichlet
+        # waveguide (of default width and boundary phase) with constant
+        # parameters (eps, delta), independent of the Hamiltonian of the
+        # model itself
+        WG = DirichletSpec(N=self.N)
+        xnodes, ynodes = WG.get_nodes_stack(eps, delta)
+        xnodes += L_sum[:, None]
+
+        xnodes, ynodes = [v.flatten() for v in xnodes, ynodes]
 
         return xnodes, ynodes
 
@@ -623,16 +1061,16 @@ class DirichletPositionDependentLossReduced(DirichletPositionDependentLoss):
     """Dirichlet class with position dependent loss."""
 
     def __init__(self, eta0=0.0, sigma=1e-2, switch_losses_on_off=False,
-                 **waveguide_kwargs):
-        DirichletPositionDependentLoss.__init__(self, **waveguide_kwargs)
-        dirichlet_kwargs = waveguide_kwargs.copy()
+                 loss_table=True, loss_table_rtol=1e-10, **waveguide_kwargs):
+        DirichletPositionDependentLoss.__init__(
+            self, loss_table=loss_table, loss_table_rtol=loss_table_rtol,
+            **waveguide_kwargs)
 
         self.eta0 = eta0
         self.sigma = sigma
         self.switch_losses_on_off = switch_losses_on_off
-        dirichlet_kwargs.update({'loop_type': 'Constant',
-                                 'eta': 0.0})
-        self.Dirichlet = DirichletReduced(**dirichlet_kwargs)
+        self.Dirichlet = DirichletSpec(N=self.N, W=self.W, theta=self.theta,
+                                       reduced=True, verbose=self.verbose)
         self._get_EP_coordinates()
 
     def H(self, t, x=None, y=None):
@@ -651,7 +1089,11 @@ class DirichletPositionDependentLossReduced(DirichletPositionDependentLoss):
 
         Gamma_matrix_const = np.array([[self.kF/self.k0, 0.0],
                                        [0.0, self.kF/self.k1]], dtype=complex)
-        Gamma_matrix = self._get_loss_matrix(x=eps, y=delta)
+        if x is None and y is None and self.loss_table and not self.verbose:
+            Gamma_matrix = self._interpolate_loss_matrix(t)
+        else:
+            Gamma_matrix = self._get_loss_matrix(x=eps, y=delta)
+        Gamma_matrix = np.array(Gamma_matrix, dtype=complex)
         Gamma_matrix[0,1] *= np.exp(+1j*np.pi/2.)
         Gamma_matrix[1,0] *= np.exp(-1j*np.pi/2.)
 
@@ -703,6 +1145,31 @@ class DirichletDyadicReduced(DirichletPositionDependentLossReduced):
 
         return G
 
+    def _get_loss_matrix_stack(self, x, y):
+        """Vectorized version of _get_loss_matrix for arrays x, y.
+
+        The eigenvector with the smaller real part of the eigenvalue is the
+        one selected by _get_loss_matrix, except where the selection of
+        _get_loss_matrix depends on the LAPACK ordering of the eigenvalues
+        (see _is_lapack_ordered); there, _get_loss_matrix is evaluated
+        instead.
+        """
+
+        H = self.Dirichlet.H(0, x, y)
+        eVals, eVecs = c_eig(H)
+        j = np.argmin(eVals.real, axis=-1)[..., None, None]
+        v = np.take_along_axis(eVecs, j, axis=-1)[..., 0]
+        G = v[..., :, None] * v[..., None, :].conj()
+
+        x, y = np.broadcast_arrays(x, y)
+        H0 = self.Dirichlet.H(0, x, np.zeros_like(y))
+        scalar = _is_lapack_ordered(H, H0, eVals)
+        if scalar.any():
+            G[scalar] = [self._get_loss_matrix(xn, yn)
+                         for xn, yn in zip(x[scalar], y[scalar])]
+
+        return G
+
 
 
 
@@ -722,11 +1189,9 @@ class DirichletNumericPotential(Dirichlet):
                         grid
 
         """
-        dirichlet_kwargs = waveguide_kwargs.copy()
-        dirichlet_kwargs.update({'loop_type': 'Constant',
-                                 'eta': 0.0})
-        self.Dirichlet = Dirichlet(**dirichlet_kwargs)
         Dirichlet.__init__(self, **waveguide_kwargs)
+        self.Dirichlet = DirichletSpec(N=self.N, W=self.W, theta=self.theta,
+                                       verbose=self.verbose)
 
         self.potential_file = potential_file
 
@@ -736,33 +1201,59 @@ class DirichletNumericPotential(Dirichlet):
         xgrid, ygrid, pgrid = [F[s].T for s in 'X', 'Y', 'P']
         x, y = [np.unique(i) for i in xgrid, ygrid]
 
+        if pgrid.ndim == 1:
+            # potential vector of ep.potential.write_potential, i.e., the
+            # (y,x) mesh flattened in Fortran order
+            pgrid = pgrid.reshape((len(y), len(x)), order='F').T
+
         return xgrid, ygrid, interpolate.RectBivariateSpline(x, y, pgrid)
 
-    def _get_EP_position(self, tn):
-        prefactor = lambda n, m: (1./(2.*pi*self.W) * self.kF * self.kr / np.sqrt(self.k(n)*self.k(m)))
-
-        def Gamma(y, x, n, m, part=np.real):
-            G = self.numeric_potential(x, y)
-            G *= prefactor(n, m)*np.sin(n*pi/self.W*y)*np.sin(m*pi/self.W*y)
-            G *= np.exp(1j*(self.k(n)-self.k(m)*x))
-            return part(G)
-
-        G = lambda n, m: (integrate.quad(Gamma, 0, self.W, args=(tn, n, m, np.real))[0] +
-                           1j*integrate.quad(Gamma, 0, self.W, args=(tn, n, m, np.imag))[0])
-
-        eps_EP = np.sqrt((G(0, 0) - G(1, 1))**2 + 4.*G(0, 1)*G(1, 0))
-        eps_EP /= (2.*np.sqrt(abs(self.B0)**2 + (self.B0.conj()*G(0, 1) +
-                    self.B0 * G(1, 0))**2 / (G(0, 0) - G(1, 1)**2)))
-        delta_EP = - 2. * (self.B0.conj()*G(0, 1) + self.B0 * G(1, 0)) * eps_EP
-        delta_EP /= (G(0, 0) - G(1, 1))
-        print "tn", tn, "eps_EP", eps_EP, "delta_EP", delta_EP
-        print "G_00", G(0, 0)
-        print "G_01", G(0, 1)
-        print "G_10", G(1, 0)
-        print "G_11", G(1, 1)
+    def _get_EP_positions(self, t, n_quad=64):
+        """Return the EP positions (eps_EP, delta_EP) at times t.
+
+        The matrix elements G(n, m) of the numeric potential are integrated
+        over y with Gauss-Legendre quadrature of order n_quad for all t at
+        once.
+        """
+
+        W = self.W
+        k = self.k
+        t = np.asarray(t, dtype=float)
+
+        s, w = np.polynomial.legendre.leggauss(n_quad)
+        y, w = 0.5*W*(s + 1.), 0.5*W*w
+
+        # potential on the (t, y) grid
+        P = self.numeric_potential.ev(t[..., None], y)
+
+        def get_G(n, m):
+            prefactor = (1./(2.*pi*W) * self.kF * self.kr /
+                         np.sqrt(k(n)*k(m)))
+            Iy = np.sum(w*P*np.sin(n*pi/W*y)*np.sin(m*pi/W*y), axis=-1)
+            return prefactor*Iy*np.exp(1j*(k(n) - k(m))*t)
+
+        G11, G12, G21, G22 = [get_G(n, m) for n in (1, 2) for m in (1, 2)]
+        B0 = self.B0
+
+        eps_EP = np.sqrt((G11 - G22)**2 + 4.*G12*G21)
+        eps_EP /= (2.*np.sqrt(abs(B0)**2 + (B0.conj()*G12 + B0*G21)**2 /
+                              (G11 - G22)**2))
+        delta_EP = -2.*(B0.conj()*G12 + B0*G21) * eps_EP
+        delta_EP /= (G11 - G22)
+
+        if self.verbose:
+            print "t", t, "eps_EP", eps_EP, "delta_EP", delta_EP
+            print "G_11", G11
+            print "G_12", G12
+            print "G_21", G21
+            print "G_22", G22
+
         return eps_EP, delta_EP
 
-    def get_EP_positions(self):
+    def _get_EP_position(self, tn):
+        return self._get_EP_positions(tn)
+
+    def get_EP_positions(self, n_quad=64):
         xgrid, ygrid, self.numeric_potential = self._get_potential_interpolating_function()
         # print "xgrid", xgrid.min(), xgrid.max()
         # print "ygrid", ygrid.min(), ygrid.max()
@@ -776,7 +1267,7 @@ class DirichletNumericPotential(Dirichlet):
         # zz = self.numeric_potential.ev(xgrid, ygrid)
         # plt.pcolormesh(xgrid, ygrid, zz)
         # plt.show()
-        eps_EP, delta_EP = np.asarray([self._get_EP_position(tN) for tN in self.t]).T
+        eps_EP, delta_EP = self._get_EP_positions(self.t, n_quad=n_quad)
 
         return eps_EP, delta_EP
 
@@ -784,6 +1275,8 @@ class DirichletNumericPotential(Dirichlet):
 class Neumann(Waveguide):
     """Neumann class."""
 
+    _vectorized_H = True
+
     def __init__(self, **waveguide_kwargs):
         """Exceptional Point (EP) waveguide class with Neumann boundary
         conditons.
@@ -828,21 +1321,200 @@ class Neumann(Waveguide):
         H21 = B.conj()*eps
         H22 = -self.k0 - delta - 1j*self.eta*self.k0/(2.*self.k1)
 
-        H = np.array([[H11, H12],
-                      [H21, H22]], dtype=complex)
+        H = c_matrix(H11, H12, H21, H22)
         return H
 
+    def dH(self, t, x=None, y=None, h=1e-6):
+        """Return the analytic derivatives (dH/deps, dH/ddelta) (see
+        Base.dH)."""
+
+        if x is None and y is None:
+            eps, delta = self.get_cycle_parameters(t)
+        else:
+            eps, delta = x, y
+
+        zero = np.zeros(np.broadcast(t, eps, delta).shape)
+        B = self.B0
+
+        H_x = c_matrix(zero, B + zero, B.conj() + zero, zero)
+        H_y = c_matrix(zero, zero, zero, zero - 1.)
+
+        return H_x, H_y
+
+    def _get_wavefunction_modes(self, evecs=False):
+        """Return the expansion of the wavefunction in the modes n = 0, 1
+        (see Waveguide._get_wavefunction_modes)."""
+
+        b0, b1 = self.phi_a, self.phi_b
+
+        c = np.stack((b0, b1*np.sqrt(2.*self.k0/self.k1)), axis=-1)
+        q = np.array([0., pi/self.W])
+        kx = np.array([0., self.kr])
+        sine = np.array([False, False])
+
+        return c, q, kx, sine
+
     def wavefunction(self):
-        x, b0, b1 = self.t, self.phi_a, self.phi_b
-        y = np.linspace(0, self.W, len(x)/self.L)
+        """Return the wavefunction Psi(x,y)."""
 
+        x = self.t
+        y = self._get_wavefunction_y()
+
+        PHI = self._synthesize_wavefunction(
+            x, y, *self._get_wavefunction_modes(), shift=np.zeros_like(x))
         X, Y = np.meshgrid(x, y)
 
-        PHI = b0 + b1 * (np.sqrt(2.*self.k0/self.k1) *
-                         np.cos(pi*Y)*np.exp(-1j*self.kr*X))
         return X, Y, PHI
 
 
+def _get_node_eigenvector_index(eVals):
+    """Return the index of the eigenvector whose nodes are returned by
+    get_nodes_stack off the line delta = 0, i.e., of the eigenvalue with the
+    larger real part.
+
+    For the Dirichlet Hamiltonians and delta != 0, this is the eigenvector
+    selected by get_nodes (second eigenvector of scipy.linalg.eig for
+    delta < 0, first one otherwise), independent of the ordering of the
+    eigenvalues.
+    """
+
+    return np.argmax(np.asarray(eVals).real, axis=-1)
+
+
+def _is_lapack_ordered(H, H0, eVals):
+    """Return where the eigenvector selection of get_nodes (and of
+    DirichletDyadicReduced._get_loss_matrix) by the sign of delta is
+    determined by the LAPACK ordering of the eigenvalues: where the real
+    parts of the eigenvalues are degenerate, or where H equals the
+    Hamiltonian H0 at delta = 0, i.e., on the line delta = 0 itself or if
+    delta is below machine precision.
+
+        Parameters:
+        -----------
+            H, H0: (...,2,2) ndarray
+                Hamiltonians at (eps, delta) and (eps, 0).
+            eVals: (...,2) ndarray
+                Eigenvalues of H.
+
+        Returns:
+        --------
+            mask: (...) ndarray of bool
+    """
+
+    degenerate = (np.abs(eVals[..., 0].real - eVals[..., 1].real) <=
+                  1e-12*np.abs(eVals).max(axis=-1))
+
+    return degenerate | np.all(H == H0, axis=(-1, -2))
+
+
+def get_nodes(b1, b2, k, kr, W):
+    """Return the nodes of the Bloch-eigenvectors (b1, b2) in the unit cell.
+    Only valid for boundary phase parameter vartheta = 0.
+
+        Parameters:
+        -----------
+            b1, b2: complex or ndarray
+                Components of the eigenvectors.
+            k: function
+                Wavenumber k(n) of mode n.
+            kr: float
+                Wavenumber k(1) - k(2).
+            W: float
+                Waveguide width.
+
+        Returns:
+        --------
+            xn, yn: (...,2) ndarray
+                x- and y-coordinates of the two nodes (NaN for invalid
+                nodes).
+    """
+
+    b1, b2 = [np.asarray(b)[..., None] for b in (b1, b2)]
+    s = np.array([+1, -1])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # the logarithm of the phase is imaginary
+        phase = b1*b2.conj()/(abs(b1)*abs(b2))
+        xn = (2.*pi/kr * (1+s)/2 -
+              1j/kr * np.log(-s*np.exp(-1j*np.pi/2)*phase)).real
+        yn = W/pi*np.arccos(-s*0.5*np.sqrt(k(2)/k(1))*abs(b1/b2))
+
+    return xn, yn
+
+
+def get_boundaries(x, eps, delta, L, W, kr, theta=0.0, boundary_phase=0.0,
+                   loop_direction='-', smearing=False, linearized=False,
+                   t=None):
+    """Return the boundary functions xi of many waveguide configurations in
+    a single vectorized call (see Waveguide.get_boundary).
+
+    All parameters are broadcast against each other, e.g., eps and delta of
+    shape (K,nx) with L, theta or boundary_phase of shape (K,1) and a common
+    grid x of shape (nx,) yield K stacked profiles of shape (K,nx).
+
+        Parameters:
+        -----------
+            x: ndarray
+                Spatial/temporal coordinate.
+            eps, delta: float or ndarray
+                Boundary roughness strength and frequency detuning.
+            L, W: float or ndarray
+                Waveguide length and width.
+            kr: float or ndarray
+                Boundary modulation frequency.
+            theta: float or ndarray
+                Phase difference between lower and upper boundary.
+            boundary_phase: float or ndarray
+                Additional phase of upper and lower boundary.
+            loop_direction: str ('-'|'+')
+                For '+', the x-coordinate is reversed, x -> L - x.
+            smearing: bool
+                Return profiles which are smeared out at the edges.
+            linearized: bool
+                Whether to use the cumulative phase int_0^t (kr + delta) dt'
+                along the last axis instead of (kr + delta)*x.
+            t: ndarray, optional
+                Grid of the cumulative phase (defaults to x).
+
+        Returns:
+        --------
+            xi_lower, xi_upper: ndarray
+                Lower and upper boundary functions.
+    """
+
+    x = np.asarray(x, dtype=float)
+    if t is None:
+        t = x
+
+    # reverse x-coordinate for backward propagation
+    # corresponds to x -> L - x
+    if loop_direction == '+':
+        x = L - x
+
+    if linearized:
+        phi = cumtrapz(kr + np.asarray(delta), x=t, axis=-1, initial=0.0)
+        xi_lower = eps*np.sin(phi - theta/2.)
+        xi_upper = W + eps*np.sin(phi + theta/2.)
+    else:
+        phi = (kr + delta)*x + boundary_phase
+        xi_lower = eps*np.sin(phi)
+        xi_upper = W + eps*np.sin(phi + theta)
+
+    if smearing:
+        def fermi(x, sigma):
+            return 1./(1. + np.exp(-x/sigma))
+        s = 0.500
+        pre = fermi(x-4.*s, s)*fermi(L-x-4.*s, s)
+        xi_lower = xi_lower*pre
+        xi_upper = pre*(xi_upper - W) + W
+
+    shape = np.broadcast(xi_lower, xi_upper).shape
+    xi_lower, xi_upper = [xi + np.zeros(shape) if np.shape(xi) != shape else xi
+                          for xi in (xi_lower, xi_upper)]
+
+    return xi_lower, xi_upper
+
+
 def plot_figures(show=False, L=100., eta=0.1, N=1.05, phase=-0.1,
                  direction="-", x_EP=0.05):
 
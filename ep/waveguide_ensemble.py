@@ -0,0 +1,183 @@
+#!/usr/bin/env python2.7
+
+from __future__ import division
+import numpy as np
+
+from ep.integrators import get_integrator, integrate
+from ep.screening import (SWEEP_PARAMETERS, _get_model, _get_c_eigensystem,
+                          _sort_c_eigensystem)
+
+
+class WaveguideEnsemble(object):
+    """Ensemble of waveguides which differ only in scalar parameters."""
+
+    def __init__(self, model_class, n=500, **kwargs):
+        """Struct-of-arrays representation of K parameter sets of a model
+        with a vectorized Hamiltonian (model_class._vectorized_H), e.g., of
+        a sweep over (eta, theta) or (x_R0, y_R0) for a fixed loop shape.
+
+        The swept parameters are stored as arrays on a single model instance
+        (see SWEEP_PARAMETERS), such that the Hamiltonians of all members are
+        evaluated as a (K,2,2) stack per time. All members are propagated
+        together on the normalized time s = t/T in [0, 1], where the
+        Schroedinger equation reads i d/ds psi = T*H(s*T) psi.
+
+            Parameters:
+            -----------
+                model_class: Base subclass
+                    Model with a vectorized Hamiltonian, e.g.,
+                    ep.waveguide.Dirichlet.
+                n: int
+                    Number of points of the normalized time grid.
+                kwargs:
+                    Model parameters. Parameters listed in SWEEP_PARAMETERS
+                    may be arrays of broadcastable shapes, all other
+                    parameters are passed to the model constructor.
+        """
+
+        if not model_class._vectorized_H:
+            raise Exception(("Error: ensemble requires a vectorized "
+                             "Hamiltonian ({0}).").format(
+                                 model_class.__name__))
+
+        sweep = [k for k in SWEEP_PARAMETERS if np.ndim(kwargs.get(k)) > 0]
+        values = np.broadcast_arrays(*[kwargs[k] for k in sweep])
+        self.shape = values[0].shape if sweep else ()
+        kwargs.update((k, v.ravel()) for k, v in zip(sweep, values))
+
+        self.model, self.s, _, T = _get_model(model_class, n, **kwargs)
+        self.T = T.ravel()
+        self.K = len(self.T)
+
+    def H(self, s):
+        """Return the Hamiltonians of all members at the normalized time s.
+
+            Parameters:
+            -----------
+                s: float
+
+            Returns:
+            --------
+                H: (K,2,2) ndarray
+        """
+
+        return self.H_stack(np.array([s]))[0]
+
+    def H_stack(self, s):
+        """Return the Hamiltonians of all members at the normalized times s.
+
+            Parameters:
+            -----------
+                s: (N,) ndarray
+
+            Returns:
+            --------
+                H: (N,K,2,2) ndarray
+        """
+
+        t = self.T[:, None]*np.asarray(s)
+        return self.model.H_stack(t).swapaxes(0, 1)
+
+    def calc_c_eigensystem(self):
+        """Calculate the eigensystems of all members on the normalized time
+        grid s, with continuous branches and sorted according to the
+        init_state_method of the model (see ep.screening).
+
+            Returns:
+            --------
+                eVals: (K,n,2) ndarray
+                eVecs_l, eVecs_r: (K,n,2,2) ndarray
+        """
+
+        H = self.model.H_stack(self.T[:, None]*self.s)
+        eVals, eVecs_l, eVecs_r = _get_c_eigensystem(H)
+
+        return _sort_c_eigensystem(eVals, eVecs_l, eVecs_r,
+                                   self.model.init_state_method, self.T,
+                                   self.s)
+
+    def propagate(self, psi0, integrator='rk45', chunk_size=16, **kwargs):
+        """Propagate the states psi0 of all members from s = 0 to s = 1.
+
+        The grid s is traversed in chunks of chunk_size steps, each of which
+        is integrated with a batched backend of ep.integrators, i.e., the
+        Hamiltonians of all members are evaluated in one call per chunk
+        ('rk4', 'magnus4', 'expm') or per step ('rk45', with a common
+        adaptive step size).
+
+            Parameters:
+            -----------
+                psi0: (K,2) ndarray
+                    Initial states.
+                integrator: str
+                    Batched backend ('rk45'|'rk4'|'magnus4'|'expm').
+                chunk_size: int
+                    Number of time steps evaluated at once.
+                kwargs:
+                    Backend options (e.g., rtol, atol, nsub).
+
+            Returns:
+            --------
+                psi: (K,2) ndarray
+                    Final states.
+        """
+
+        info = get_integrator(integrator, **kwargs)
+        if info['backend'] in ('dopri5', 'dop853', 'bdf'):
+            raise Exception(("Error: integrator {0} does not support "
+                             "batched states!").format(integrator))
+
+        def H_stack(s):
+            return self.T[:, None, None]*self.H_stack(s)
+
+        s = self.s
+        psi = np.asarray(psi0, dtype=complex)
+        for n in range(0, len(s) - 1, chunk_size):
+            Psi, _ = integrate(None, s[n:n + chunk_size + 1], psi,
+                               integrator=integrator, H_stack=H_stack,
+                               **kwargs)
+            psi = Psi[-1]
+
+        return psi
+
+    def solve(self, init_state=None, integrator='rk45', chunk_size=16,
+              **kwargs):
+        """Solve the Schroedinger equation of all members and return the
+        projections onto the final eigenstates (see SolveResult).
+
+            Parameters:
+            -----------
+                init_state: str or int, optional
+                    Initial state ('a'|'b' or eigenstate index); defaults to
+                    the init_state attribute of the model.
+                integrator, chunk_size, kwargs:
+                    Integration options (see propagate).
+
+            Returns:
+            --------
+                phi_a, phi_b: (...) ndarray
+                    Overlaps <phi_a|psi(T)> and <phi_b|psi(T)>, with the
+                    shape of the swept parameters.
+                R: (...) ndarray
+                    Flip errors |phi_a/phi_b| (see SolveResult.flip_error).
+        """
+
+        if init_state is None:
+            init_state = self.model.init_state
+        if init_state not in ('a', 'b', 0, 1):
+            raise Exception(("Error: init_state {0} not supported "
+                             "in ensemble mode!").format(init_state))
+        i = 0 if init_state in ('a', 0) else 1
+
+        eVals, eVecs_l, eVecs_r = self.calc_c_eigensystem()
+        psi = self.propagate(eVecs_r[:, 0, :, i], integrator=integrator,
+                             chunk_size=chunk_size, **kwargs)
+
+        projection = np.einsum('...in,...i -> ...n', eVecs_l[:, -1], psi)
+        phi_a, phi_b = [p.reshape(self.shape) for p in projection.T]
+
+        return phi_a, phi_b, np.abs(phi_a/phi_b)
+
+
+if __name__ == '__main__':
+    pass